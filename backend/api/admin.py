@@ -0,0 +1,54 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from bson import ObjectId
+from bson.errors import InvalidId
+from typing import Optional
+from recruiter_agent.web_health import web_health
+from utils.admission import admission
+from utils.task_events import task_events
+from utils.retention import load_archived_run, run_retention
+
+router = APIRouter(prefix="/admin")
+
+
+@router.get("/web-health")
+async def get_web_health():
+    """Circuit breaker state per domain and the URLs currently in the negative cache"""
+    return web_health.snapshot()
+
+
+@router.post("/web-health/reset")
+async def reset_web_health(domain: Optional[str] = Query(None, description="Only reset this domain")):
+    """Close circuit breakers and clear failed URLs, for one domain or all of them"""
+    web_health.reset(domain)
+    return web_health.snapshot()
+
+
+@router.get("/queue")
+async def get_queue():
+    """Running and queued analyses, the admission limits and how many requests were turned away"""
+    return admission.snapshot()
+
+
+@router.get("/task-events")
+async def get_task_events():
+    """Whether task updates come from the change stream or this process, and how many clients are waiting"""
+    return task_events.snapshot()
+
+
+@router.post("/retention/run")
+async def run_retention_now():
+    """Run a retention pass now instead of waiting for the periodic one"""
+    return await run_retention()
+
+
+@router.get("/runs/{run_id}/archived")
+async def get_archived_run(run_id: str):
+    """Full copy of an agent run archived to the cold collection"""
+    try:
+        document = await load_archived_run(run_id)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail=f"Invalid run ID {run_id}")
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"No archived run with ID {run_id}")
+    return jsonable_encoder(document, custom_encoder={ObjectId: str})
@@ -1,48 +1,418 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Query, BackgroundTasks, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException, Query, BackgroundTasks, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+import asyncio
+import hashlib
+import json
 import tempfile
 import shutil
-from typing import Union, Any, Dict, Optional
-from recruiter_agent.graph import run_recruiting_assistant, extract_text_from_file
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Union, Any, Dict, List, Optional, Tuple
+from beanie import PydanticObjectId
+from pydantic import BaseModel, Field
+from sse_starlette.sse import EventSourceResponse
+from recruiter_agent.graph import run_recruiting_assistant, resume_recruiting_assistant, extract_text_from_file
+from recruiter_agent.checkpoint import clear_checkpoints
+from recruiter_agent.nodes import parse_jd_node, parse_resume_node, web_research_node, fit_score_node, research_complete
+from recruiter_agent.normalize import normalize_text
+from recruiter_agent.utils import fit_rank_key, text_hash
 from models.run_history import AgentRun, AgentRunInput, AgentRunOutput
-from models.task import Task, TaskStatus
+from models.task import Task, TaskStatus, TaskPriority, TaskStatusView, TERMINAL_STATUSES
 from utils.task_manager import TaskManager
+from utils.admission import admission, AdmissionRejected, Ticket
+from utils.candidate_index import candidate_index
+from utils.duplicate_index import duplicate_index
+from utils.task_events import task_events, Subscription
+from config import settings
 
 router = APIRouter()
 
+# Serializes the in-flight lookup and task creation of /run-agent/ so that two identical
+# submissions arriving together (a double click) cannot both start a run
+submit_lock = asyncio.Lock()
+
+
+class CandidateSearchRequest(BaseModel):
+    job_description: str = Field(..., description="Raw job description text")
+    top_k: int = Field(10, ge=1, le=100, description="Number of candidates to return")
+
+
+class RunIdView(BaseModel):
+    id: PydanticObjectId = Field(alias="_id")
+
+
+class TaskStatusRequest(BaseModel):
+    task_ids: Optional[List[str]] = Field(None, description="Tasks to report on")
+    batch_id: Optional[str] = Field(None, description="Report on every task of this batch instead")
+
+
+class RescoreRequest(BaseModel):
+    job_description: str = Field(..., description="New or edited job description text")
+    run_ids: Optional[List[str]] = Field(None, description="Agent runs to re-score")
+    since: Optional[datetime] = Field(None, description="Filter: only runs created after this time")
+    fit_scores: Optional[List[str]] = Field(None, description="Filter: only runs with these fit scores")
+    limit: int = Field(100, ge=1, le=1000, description="Maximum runs selected by the filter")
+    priority: TaskPriority = Field(TaskPriority.BULK, description="Scheduling class of the re-scoring task")
+    batch_id: Optional[str] = Field(None, description="Bulk tasks with the same batch_id share one fair-share slot")
+    cache: bool = Field(True, description="Serve identical LLM calls from the response cache (false to bypass)")
+
+
+async def save_agent_run(
+    result: Dict[str, Any],
+    candidate_name: str,
+    resume_text: str,
+    job_description_text: str,
+    dedupe_key: Optional[str] = None
+) -> Dict[str, Any]:
+    """Store a finished graph run in MongoDB and add its ID to the result"""
+    resume_signature = None
+    if settings.DUPLICATE_DETECTION_ENABLED and result.get("resume_structured"):
+        resume_signature = duplicate_index.signature(normalize_text(resume_text)[0])
+    agent_run = AgentRun(
+        resume_signature=resume_signature,
+        input=AgentRunInput(
+            candidate_name=candidate_name,
+            resume_text=resume_text,
+            job_description=job_description_text,
+            job_description_hash=text_hash(job_description_text),
+            dedupe_key=dedupe_key
+        ),
+        output=AgentRunOutput(
+            jd_structured=result.get("jd_structured"),
+            resume_structured=result.get("resume_structured"),
+            web_structured=result.get("web_structured"),
+            fit_assessment=result.get("fit_assessment"),
+            formatted_output=result.get("formatted_output"),  # Include the formatted markdown output
+            triage=result.get("triage"),
+            deadline_ms=result.get("deadline_ms"),
+            degraded_steps=result.get("degraded_steps"),
+            metrics=result.get("metrics")
+        )
+    )
+    await agent_run.insert()
+
+    # Make the candidate searchable for future job descriptions
+    if agent_run.output.resume_structured:
+        candidate_index.add(str(agent_run.id), candidate_name, agent_run.output.resume_structured)
+    if resume_signature:
+        duplicate_index.add(str(agent_run.id), candidate_name, resume_signature)
+
+    # Add the agent run ID to the result
+    result["agent_run_id"] = str(agent_run.id)
+    return result
+
+
+async def forget_checkpoints(task_id: str) -> None:
+    """Delete a stored run's checkpoints; the run is already saved, so a failure here only leaves them behind"""
+    try:
+        await asyncio.to_thread(clear_checkpoints, task_id)
+    except Exception as e:
+        print(f"Warning: Could not clear checkpoints of task {task_id}: {str(e)}")
+
+
 async def process_agent_run(
     candidate_name: str,
     resume_text: str,
     job_description_text: str,
-    task_id: str
+    task_id: str,
+    triage_threshold: Optional[float] = None,
+    deadline_ms: Optional[int] = None,
+    use_cache: bool = True,
+    dedupe_key: Optional[str] = None,
+    duplicates: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """Process the agent run in the background"""
+    reuse = None
+    if duplicates and duplicates.get("reused_from"):
+        source = await AgentRun.get(PydanticObjectId(duplicates["reused_from"]))
+        if source:
+            # Research that was cut short or failed is redone, as it is never cached either
+            web_structured = source.output.web_structured \
+                if research_complete(source.output.web_structured, source.output.degraded_steps) else None
+            reuse = {"agent_run_id": str(source.id), "resume_structured": source.output.resume_structured,
+                     "web_structured": web_structured}
+
+    # Run the recruiting agent, checkpointed under the task ID so failures can be retried.
+    # The graph is synchronous, a worker thread keeps the event loop free for other requests
+    result = await asyncio.to_thread(run_recruiting_assistant, candidate_name, resume_text, job_description_text,
+                                     triage_threshold=triage_threshold, task_id=task_id,
+                                     deadline_ms=deadline_ms, use_cache=use_cache, reuse=reuse)
+    if duplicates:
+        result["metrics"] = {**result.get("metrics", {}), "duplicates": duplicates}
+    saved = await save_agent_run(result, candidate_name, resume_text, job_description_text, dedupe_key)
+    # Only now is the run safe to forget: had storing it failed, a retry resumes from the checkpoints
+    await forget_checkpoints(task_id)
+    return saved
+
+
+async def process_retry(task_id: str, dedupe_key: Optional[str] = None) -> Dict[str, Any]:
+    """Resume a failed run from its last checkpoint in the background"""
+    result = await asyncio.to_thread(resume_recruiting_assistant, task_id)
+    # Store the inputs as submitted, like a first run does; the graph's resume_text and job_description
+    # are normalized (checkpoints from before the raw keys existed only have those)
+    resume_text = result.get("raw_resume_text", result["resume_text"])
+    job_description_text = result.get("raw_job_description", result["job_description"])
+    saved = await save_agent_run(result, result["candidate_name"], resume_text, job_description_text, dedupe_key)
+    await forget_checkpoints(task_id)
+    return saved
+
+
+def admit_or_429(api_key: Optional[str], priority: TaskPriority = TaskPriority.INTERACTIVE,
+                 batch_id: Optional[str] = None, batch_weight: float = 1.0) -> Ticket:
+    """Reserve a run slot, or reject the request with 429 and a Retry-After estimate"""
+    try:
+        return admission.admit(api_key, priority, batch_id, batch_weight)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                            detail=f"{e.reason}, retry in about {e.retry_after}s",
+                            headers={"Retry-After": str(e.retry_after)})
+
+
+async def create_admitted_task(api_key: Optional[str], priority: TaskPriority, batch_id: Optional[str] = None,
+                               batch_weight: float = 1.0, dedupe_key: Optional[str] = None) -> Tuple[Ticket, Task]:
+    """Admit a new run (or 429) and create its task, giving the slot back if the task cannot be stored"""
+    ticket = admit_or_429(api_key, priority, batch_id, batch_weight)
     try:
-        # Run the recruiting agent
-        result = run_recruiting_assistant(candidate_name, resume_text, job_description_text)
-        
-        # Store the run in MongoDB
+        task = await TaskManager.create_task(dedupe_key, priority, batch_id)
+    except Exception:
+        admission.release(ticket)
+        raise
+    return ticket, task
+
+
+async def run_admitted_task(ticket: Ticket, task_id: str, func, *args) -> Dict[str, Any]:
+    """Run a background task once admission control gives it a slot, recording how long it queued"""
+    async def start() -> Dict[str, Any]:
+        await TaskManager.set_queue_wait(task_id, ticket.wait_ms)
+        return await TaskManager.run_background_task(task_id, func, *args)
+
+    return await admission.run(ticket, start)
+
+
+def run_dedupe_key(candidate_name: str, resume_text: str, job_description_text: str,
+                   triage_threshold: Optional[float]) -> str:
+    """
+    Identity of a /run-agent/ submission: the normalized resume and JD, the
+    options that change the result and the pipeline version. Formatting-only
+    differences between two uploads of the same documents give the same key.
+    """
+    return text_hash("\n".join([
+        settings.PIPELINE_VERSION,
+        text_hash(normalize_text(resume_text)[0]),
+        text_hash(normalize_text(job_description_text)[0]),
+        candidate_name.strip().lower(),
+        str(triage_threshold),
+    ]))
+
+
+async def find_reusable_run(dedupe_key: str) -> Optional[AgentRun]:
+    """Most recent complete run of the same submission within RUN_REUSE_MAX_AGE_SECONDS"""
+    return await AgentRun.find(
+        {
+            "input.dedupe_key": dedupe_key,
+            "timestamp": {"$gte": datetime.utcnow() - timedelta(seconds=settings.RUN_REUSE_MAX_AGE_SECONDS)},
+            "output.fit_assessment": {"$ne": None},
+            "output.degraded_steps": {"$in": [None, []]},  # Runs cut short by a deadline are not reused
+        }
+    ).sort("-timestamp").first_or_none()
+
+
+def llm_cache_config(use_cache: bool) -> Dict[str, Any]:
+    """Config for nodes called outside the graph, carrying the per-request cache switch"""
+    return {"configurable": {"llm_cache": use_cache}}
+
+
+async def get_or_parse_jd(job_description_text: str, use_cache: bool = True) -> Tuple[Dict[str, Any], bool]:
+    """
+    Return the structured JD, reusing the parse stored with any earlier run of the same JD text.
+    The second value is True when the parse came from a stored run.
+    """
+    cached_run = await AgentRun.find(
+        {
+            "input.job_description_hash": text_hash(job_description_text),
+            "output.jd_structured": {"$ne": None},
+            "output.jd_structured.title": {"$ne": "Unknown Position"},  # parse_jd_node fallback
+        }
+    ).sort("-timestamp").first_or_none()
+    if cached_run:
+        return cached_run.output.jd_structured, True
+
+    jd_state = await asyncio.to_thread(parse_jd_node, {"job_description": normalize_text(job_description_text)[0]},
+                                       llm_cache_config(use_cache))
+    return jd_state["jd_structured"], False
+
+
+async def process_rescore(job_description_text: str, run_ids: List[PydanticObjectId],
+                          use_cache: bool = True) -> Dict[str, Any]:
+    """Re-run only the fit scoring step for stored runs against a new job description"""
+    jd_structured, _ = await get_or_parse_jd(job_description_text, use_cache)
+
+    runs = await AgentRun.find({"_id": {"$in": run_ids}}).to_list()
+    semaphore = asyncio.Semaphore(settings.RESCORE_CONCURRENCY)
+
+    async def rescore(run: AgentRun) -> Dict[str, Any]:
+        async with semaphore:
+            state = {
+                "jd_structured": jd_structured,
+                "resume_structured": run.output.resume_structured,
+                "web_structured": run.output.web_structured or {},
+            }
+            try:
+                scored = await asyncio.to_thread(fit_score_node, state, llm_cache_config(use_cache))
+            except Exception as e:
+                return {"original_run_id": str(run.id), "error": str(e)}
+
+        rescored_run = AgentRun(
+            rescored_from=str(run.id),
+            input=AgentRunInput(
+                candidate_name=run.input.candidate_name,
+                resume_text=run.input.resume_text,
+                job_description=job_description_text,
+                job_description_hash=text_hash(job_description_text)
+            ),
+            output=AgentRunOutput(
+                jd_structured=jd_structured,
+                resume_structured=run.output.resume_structured,
+                web_structured=run.output.web_structured,
+                fit_assessment=scored["fit_assessment"],
+                formatted_output=scored["formatted_output"]
+            )
+        )
+        await rescored_run.insert()
+        return {
+            "original_run_id": str(run.id),
+            "agent_run_id": str(rescored_run.id),
+            "candidate_name": run.input.candidate_name,
+            "fit_assessment": scored["fit_assessment"],
+        }
+
+    outcomes = await asyncio.gather(*(rescore(run) for run in runs))
+    rescored = sorted((o for o in outcomes if "error" not in o), key=lambda o: fit_rank_key(o["fit_assessment"]))
+
+    return {
+        "jd_structured": jd_structured,
+        "rescored": rescored,
+        "failed": [o for o in outcomes if "error" in o],
+    }
+
+
+def read_text_input(upload: Optional[UploadFile], text: Optional[str], label: str) -> str:
+    """Return text from an uploaded file or the plain-text form field, raising 400 if neither is usable"""
+    if upload and upload.filename:
+        try:
+            # Check if file has content
+            if upload.size == 0:
+                raise HTTPException(status_code=400, detail=f"{label} file is empty")
+
+            with tempfile.NamedTemporaryFile(delete=False, suffix=upload.filename[-5:]) as tmp_file:
+                shutil.copyfileobj(upload.file, tmp_file)
+                file_path = tmp_file.name
+            return extract_text_from_file(file_path)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Failed to process {label.lower()} file: {str(e)}")
+    elif text:
+        # Use the provided text directly
+        if not text.strip():
+            raise HTTPException(status_code=400, detail=f"{label} text is empty")
+        return text
+    else:
+        raise HTTPException(status_code=400, detail=f"{label} is required. Please provide either a file or text.")
+
+
+async def process_match_roles(
+    candidate_name: str,
+    resume_text: str,
+    job_description_texts: List[str],
+    use_cache: bool = True
+) -> Dict[str, Any]:
+    """Parse and research one candidate once, then score them against many job descriptions"""
+    config = llm_cache_config(use_cache)
+
+    def research_candidate() -> Dict[str, Any]:
+        state = {"candidate_name": candidate_name, "resume_text": normalize_text(resume_text)[0]}
+        state = {**state, **parse_resume_node(state, config)}
+        return {**state, **web_research_node(state, config)}
+
+    semaphore = asyncio.Semaphore(settings.MATCH_ROLES_CONCURRENCY)
+
+    async def parse_jd(job_description_text: str) -> Tuple[Dict[str, Any], bool]:
+        async with semaphore:
+            return await get_or_parse_jd(job_description_text, use_cache)
+
+    # The candidate research and the JD parses are independent, so run them together
+    candidate_state, *parsed_jds = await asyncio.gather(
+        asyncio.to_thread(research_candidate),
+        *(parse_jd(text) for text in job_description_texts)
+    )
+    resume_structured = candidate_state["resume_structured"]
+    web_structured = candidate_state["web_structured"]
+    candidate_name = candidate_state.get("candidate_name") or candidate_name
+
+    async def score_role(job_description_text: str, jd_structured: Dict[str, Any], jd_cached: bool) -> Dict[str, Any]:
+        async with semaphore:
+            state = {
+                "jd_structured": jd_structured,
+                "resume_structured": resume_structured,
+                "web_structured": web_structured,
+            }
+            try:
+                scored = await asyncio.to_thread(fit_score_node, state, config)
+            except Exception as e:
+                return {"job_title": jd_structured.get("title"), "error": str(e)}
+
         agent_run = AgentRun(
             input=AgentRunInput(
                 candidate_name=candidate_name,
                 resume_text=resume_text,
-                job_description=job_description_text
+                job_description=job_description_text,
+                job_description_hash=text_hash(job_description_text)
             ),
             output=AgentRunOutput(
-                jd_structured=result.get("jd_structured"),
-                resume_structured=result.get("resume_structured"),
-                web_structured=result.get("web_structured"),
-                fit_assessment=result.get("fit_assessment"),
-                formatted_output=result.get("formatted_output")  # Include the formatted markdown output
+                jd_structured=jd_structured,
+                resume_structured=resume_structured,
+                web_structured=web_structured,
+                fit_assessment=scored["fit_assessment"],
+                formatted_output=scored["formatted_output"]
             )
         )
-        await agent_run.insert()
-        
-        # Add the agent run ID to the result
-        result["agent_run_id"] = str(agent_run.id)
-        return result
-    except Exception as e:
-        raise e
+        return {
+            "job_title": jd_structured.get("title"),
+            "agent_run": agent_run,
+            "jd_cached": jd_cached,
+            "fit_assessment": scored["fit_assessment"],
+        }
+
+    outcomes = await asyncio.gather(*(
+        score_role(text, jd_structured, jd_cached)
+        for text, (jd_structured, jd_cached) in zip(job_description_texts, parsed_jds)
+    ))
+    roles = sorted((o for o in outcomes if "error" not in o), key=lambda o: fit_rank_key(o["fit_assessment"]))
+
+    # The best match stands for the candidate, the other role runs point at it so the
+    # search and duplicate indexes (and their startup backfills) keep one entry per candidate
+    if roles:
+        primary = roles[0]["agent_run"]
+        await primary.insert()
+        for role in roles[1:]:
+            role["agent_run"].matched_from = str(primary.id)
+        if len(roles) > 1:
+            await AgentRun.insert_many([role["agent_run"] for role in roles[1:]])
+    for rank, role in enumerate(roles, start=1):
+        role["rank"] = rank
+        role["agent_run_id"] = str(role.pop("agent_run").id)
+
+    if roles and resume_structured:
+        candidate_index.add(roles[0]["agent_run_id"], candidate_name, resume_structured)
+
+    return {
+        "candidate_name": candidate_name,
+        "resume_structured": resume_structured,
+        "web_structured": web_structured,
+        "roles": roles,
+        "failed": [o for o in outcomes if "error" in o],
+    }
+
 
 @router.post("/run-agent/", status_code=status.HTTP_202_ACCEPTED)
 async def run_agent(
@@ -52,68 +422,140 @@ async def run_agent(
     resume_text: str = Form(None),
     job_description: UploadFile = File(None),
     job_description_text: str = Form(None),
+    triage_threshold: Optional[float] = Form(None),
+    deadline_ms: Optional[int] = Form(None, ge=1000),
+    cache: bool = Form(True, description="Serve identical LLM calls from the response cache (off to bypass)"),
+    force: bool = Form(False, description="Run the pipeline even if an identical submission completed recently"),
+    reuse_duplicate: bool = Form(settings.DUPLICATE_REUSE_DEFAULT,
+                                 description="Reuse the resume parse and web research of a near-duplicate resume"),
+    priority: Optional[TaskPriority] = Form(None, description="interactive (default) or bulk (default with batch_id)"),
+    batch_id: Optional[str] = Form(None, description="Groups bulk runs of one batch for fair scheduling"),
+    batch_weight: float = Form(1.0, gt=0, description="Share of bulk capacity relative to other batches"),
+    api_key: Optional[str] = Header(None, alias="X-API-Key"),
 ):
-    
-    # Process resume input
-    if resume and resume.filename:
-        try:
-            # Check if file has content
-            if resume.size == 0:
-                raise HTTPException(status_code=400, detail="Resume file is empty")
-                
-            with tempfile.NamedTemporaryFile(delete=False, suffix=resume.filename[-5:]) as tmp_resume:
-                shutil.copyfileobj(resume.file, tmp_resume)
-                resume_path = tmp_resume.name
-            resume_text_content = extract_text_from_file(resume_path)
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Failed to process resume file: {str(e)}")
-    elif resume_text:
-        # Use the provided text directly
-        if not resume_text.strip():
-            raise HTTPException(status_code=400, detail="Resume text is empty")
-        resume_text_content = resume_text
-    else:
-        raise HTTPException(status_code=400, detail="Resume is required. Please provide either a file or text.")
+    resume_text_content = read_text_input(resume, resume_text, "Resume")
+    job_description_text_content = read_text_input(job_description, job_description_text, "Job description")
 
-    # Process job description input
-    if job_description and job_description.filename:
-        try:
-            # Check if file has content
-            if job_description.size == 0:
-                raise HTTPException(status_code=400, detail="Job description file is empty")
-                
-            with tempfile.NamedTemporaryFile(delete=False, suffix=job_description.filename[-5:]) as tmp_jd:
-                shutil.copyfileobj(job_description.file, tmp_jd)
-                jd_path = tmp_jd.name
-            job_description_text_content = extract_text_from_file(jd_path)
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Failed to process job description file: {str(e)}")
-    elif job_description_text:
-        # Use the provided text directly
-        if not job_description_text.strip():
-            raise HTTPException(status_code=400, detail="Job description text is empty")
-        job_description_text_content = job_description_text
-    else:
-        raise HTTPException(status_code=400, detail="Job description is required. Please provide either a file or text.")
+    # Triage is enabled per request by passing a threshold, or globally via settings
+    if triage_threshold is None and settings.TRIAGE_ENABLED:
+        triage_threshold = settings.TRIAGE_THRESHOLD
+
+    if deadline_ms is None:
+        deadline_ms = settings.DEFAULT_DEADLINE_MS
+
+    if priority is None:
+        priority = TaskPriority.BULK if batch_id else TaskPriority.INTERACTIVE
 
-    # Create a new task
-    task = await TaskManager.create_task()
+    dedupe_key = None
+    if settings.RUN_DEDUPE_ENABLED:
+        dedupe_key = run_dedupe_key(candidate_name, resume_text_content, job_description_text_content,
+                                    triage_threshold)
+        # cache=off asks for a fresh assessment, so it is neither answered from a stored run nor attached below
+        if cache and not force:
+            reusable_run = await find_reusable_run(dedupe_key)
+            if reusable_run:
+                # Answer with an already completed task so clients poll it like any other
+                result = {**reusable_run.output.dict(), "candidate_name": reusable_run.input.candidate_name,
+                          "agent_run_id": str(reusable_run.id), "reused_run": True}
+                task = await TaskManager.create_completed_task(result, str(reusable_run.id), dedupe_key,
+                                                               priority, batch_id)
+                print(f"♻️ Reusing agent run {reusable_run.id} for an identical submission")
+                return JSONResponse(
+                    status_code=status.HTTP_200_OK,
+                    content={"task_id": task.task_id, "status": TaskStatus.COMPLETED,
+                             "agent_run_id": str(reusable_run.id), "reused_run": True}
+                )
+
+    # Near-duplicates of the resume (edited re-applications, agency copies) are flagged and optionally reused
+    duplicates = None
+    if settings.DUPLICATE_DETECTION_ENABLED:
+        matches = duplicate_index.find_duplicates(normalize_text(resume_text_content)[0])
+        if matches:
+            duplicates = {
+                "matches": [{"agent_run_id": agent_run_id, "candidate_name": name, "similarity": round(score, 3)}
+                            for agent_run_id, name, score in matches],
+                "reused_from": matches[0][0] if reuse_duplicate else None,
+            }
+            print(f"👯 Resume is a near-duplicate of run {matches[0][0]} (similarity {matches[0][2]:.2f})")
+
+    async with submit_lock:
+        inflight = await TaskManager.find_inflight_task(dedupe_key, settings.RUN_INFLIGHT_MAX_AGE_SECONDS) \
+            if dedupe_key and cache else None
+        if inflight:
+            print(f"🔗 Attaching identical submission to in-flight task {inflight.task_id}")
+            return JSONResponse(
+                status_code=status.HTTP_202_ACCEPTED,
+                content={"task_id": inflight.task_id, "status": inflight.status, "deduplicated": True}
+            )
+
+        # Only new runs take a place in the queue, attached and reused submissions cost nothing
+        ticket, task = await create_admitted_task(api_key, priority, batch_id, batch_weight, dedupe_key)
     
-    # Start the background task
+    # Start the background task once a run slot is free
     background_tasks.add_task(
-        TaskManager.run_background_task,
+        run_admitted_task,
+        ticket,
         task.task_id,
         process_agent_run,
         candidate_name,
         resume_text_content,
         job_description_text_content,
-        task.task_id
+        task.task_id,
+        triage_threshold,
+        deadline_ms,
+        cache,
+        dedupe_key,
+        duplicates
     )
     
     # Return the task ID
+    content = {"task_id": task.task_id, "status": TaskStatus.PENDING, "queued_ahead": admission.position(ticket)}
+    if duplicates:
+        content["near_duplicates"] = duplicates["matches"]
+        content["reused_from"] = duplicates["reused_from"]
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=content)
+
+@router.post("/match-roles/", status_code=status.HTTP_202_ACCEPTED)
+async def match_roles(
+    background_tasks: BackgroundTasks,
+    candidate_name: str = Form(...),
+    resume: UploadFile = File(None),
+    resume_text: str = Form(None),
+    job_descriptions: List[UploadFile] = File(None),
+    job_description_texts: List[str] = Form(None),
+    cache: bool = Form(True, description="Serve identical LLM calls from the response cache (off to bypass)"),
+    priority: TaskPriority = Form(TaskPriority.INTERACTIVE),
+    batch_id: Optional[str] = Form(None, description="Groups bulk runs of one batch for fair scheduling"),
+    api_key: Optional[str] = Header(None, alias="X-API-Key"),
+):
+    """Rank many open roles for one candidate, parsing and researching the candidate only once"""
+    resume_text_content = read_text_input(resume, resume_text, "Resume")
+
+    job_description_contents = [
+        read_text_input(upload, None, "Job description")
+        for upload in (job_descriptions or []) if upload.filename
+    ]
+    job_description_contents += [text for text in (job_description_texts or []) if text.strip()]
+    if not job_description_contents:
+        raise HTTPException(status_code=400, detail="At least one job description is required. Please provide files or text.")
+    if len(job_description_contents) > settings.MATCH_ROLES_MAX_JDS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.MATCH_ROLES_MAX_JDS} job descriptions can be matched at once")
+
+    ticket, task = await create_admitted_task(api_key, priority, batch_id)
+    background_tasks.add_task(
+        run_admitted_task,
+        ticket,
+        task.task_id,
+        process_match_roles,
+        candidate_name,
+        resume_text_content,
+        job_description_contents,
+        cache
+    )
+
     return JSONResponse(
         status_code=status.HTTP_202_ACCEPTED,
-        content={"task_id": task.task_id, "status": TaskStatus.PENDING}
+        content={"task_id": task.task_id, "status": TaskStatus.PENDING, "role_count": len(job_description_contents)}
     )
 
 @router.get("/task/{task_id}")
@@ -128,7 +570,9 @@ async def get_task_status(task_id: str):
         "task_id": task.task_id,
         "status": task.status,
         "created_at": task.created_at,
-        "updated_at": task.updated_at
+        "updated_at": task.updated_at,
+        "priority": task.priority,
+        "queue_wait_ms": task.queue_wait_ms
     }
     
     # Include result if task is completed
@@ -145,7 +589,263 @@ async def get_task_status(task_id: str):
     
     return response
 
+def task_status_etag(tasks: List[TaskStatusView], missing: List[str]) -> str:
+    """Weak ETag over the status and last update of every task, changes whenever any task moves"""
+    parts = sorted(f"{task.task_id}:{task.status.value}:{task.updated_at.isoformat()}" for task in tasks)
+    parts += [f"{task_id}:missing" for task_id in missing]
+    return f'W/"{hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:32]}"'
+
+@router.post("/tasks/status")
+async def get_tasks_status(request: TaskStatusRequest,
+                           if_none_match: Optional[str] = Header(None, alias="If-None-Match")):
+    """
+    Status of many tasks in one indexed query, for dashboards polling a batch.
+    Results are not returned (fetch them with GET /task/{task_id}); clients
+    send back the ETag in If-None-Match and get 304 while nothing changed.
+    """
+    if bool(request.task_ids) == bool(request.batch_id):
+        raise HTTPException(status_code=400, detail="Provide either task_ids or batch_id")
+    if request.task_ids and len(request.task_ids) > settings.TASK_STATUS_MAX_IDS:
+        raise HTTPException(status_code=400,
+                            detail=f"At most {settings.TASK_STATUS_MAX_IDS} task_ids per request")
+
+    if request.task_ids:
+        task_ids = list(dict.fromkeys(request.task_ids))
+        query = {"task_id": {"$in": task_ids}}
+    else:
+        query = {"batch_id": request.batch_id}
+    # One row past the cap tells whether a batch was cut off
+    tasks = await Task.find(query).sort("created_at").limit(settings.TASK_STATUS_MAX_IDS + 1) \
+        .project(TaskStatusView).to_list()
+    truncated = len(tasks) > settings.TASK_STATUS_MAX_IDS
+    tasks = tasks[:settings.TASK_STATUS_MAX_IDS]
+
+    found = {task.task_id for task in tasks}
+    missing = [task_id for task_id in task_ids if task_id not in found] if request.task_ids else []
+    # A truncated answer gets no ETag, it could not see changes to the tasks past the cap
+    etag = None if truncated else task_status_etag(tasks, missing)
+    if etag and if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    counts: Dict[str, int] = {}
+    for task in tasks:
+        counts[task.status.value] = counts.get(task.status.value, 0) + 1
+    content = {
+        "tasks": [task.dict(exclude_none=True) for task in tasks],
+        "missing": missing,
+        "counts": counts,
+        "truncated": truncated,
+    }
+    return JSONResponse(content=jsonable_encoder(content), headers={"ETag": etag} if etag else None)
+
+def task_event(view: TaskStatusView) -> Dict[str, Any]:
+    """Server-sent event carrying a task status, its id lets a reconnecting client tell where it was"""
+    return {"event": "status", "id": view.updated_at.isoformat(),
+            "data": json.dumps(jsonable_encoder(view.dict(exclude_none=True)))}
+
+async def stream_task_events(subscription: Subscription, initial: List[TaskStatusView], stop_when_done: bool):
+    with subscription:
+        for view in initial:
+            yield task_event(view)
+        if stop_when_done and initial and initial[0].status in TERMINAL_STATUSES:
+            return
+        while True:
+            view = await subscription.get()
+            yield task_event(view)
+            if stop_when_done and view.status in TERMINAL_STATUSES:
+                return
+
+@router.get("/task/{task_id}/events")
+async def task_events_stream(task_id: str):
+    """
+    Server-sent events with the task's status, first its current one, then each
+    change until it completes or fails. Updates are pushed from the task event
+    bus, the stream itself never reads the database again.
+    """
+    subscription = task_events.subscribe(task_id=task_id)
+    view = await task_events.current(task_id)
+    if view is None:
+        task_events.unsubscribe(subscription)
+        raise HTTPException(status_code=404, detail=f"Task with ID {task_id} not found")
+    return EventSourceResponse(stream_task_events(subscription, [view], stop_when_done=True),
+                               ping=settings.TASK_EVENTS_HEARTBEAT_SECONDS)
+
+@router.get("/tasks/events")
+async def batch_events_stream(batch_id: str = Query(..., description="Stream the status changes of this batch")):
+    """Server-sent events for every status change of the batch's tasks, open until the client disconnects"""
+    subscription = task_events.subscribe(batch_id=batch_id)
+    return EventSourceResponse(stream_task_events(subscription, [], stop_when_done=False),
+                               ping=settings.TASK_EVENTS_HEARTBEAT_SECONDS)
+
+@router.get("/task/{task_id}/wait")
+async def wait_for_task(task_id: str,
+                        since: Optional[datetime] = Query(None, description="updated_at of the status the client has"),
+                        timeout: float = Query(30, gt=0, description="Seconds to wait for a change")):
+    """
+    Long-poll: answers as soon as the task has changed after `since`, or with
+    its unchanged status after `timeout` seconds.
+    """
+    with task_events.subscribe(task_id=task_id) as subscription:
+        view = await task_events.current(task_id)
+        if view is None:
+            raise HTTPException(status_code=404, detail=f"Task with ID {task_id} not found")
+        if since and since.tzinfo:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        changed = since is None or view.updated_at > since
+        if not changed and view.status not in TERMINAL_STATUSES:
+            update = await subscription.get(timeout=min(timeout, settings.TASK_EVENTS_LONG_POLL_MAX_SECONDS))
+            if update:
+                view, changed = update, True
+    return {**jsonable_encoder(view.dict(exclude_none=True)), "changed": changed}
+
+@router.post("/task/{task_id}/retry", status_code=status.HTTP_202_ACCEPTED)
+async def retry_task(task_id: str, background_tasks: BackgroundTasks,
+                     api_key: Optional[str] = Header(None, alias="X-API-Key")):
+    """Retry a failed task, resuming from the last node that completed"""
+    task = await Task.find_one({"task_id": task_id})
+    if not task:
+        raise HTTPException(status_code=404, detail=f"Task with ID {task_id} not found")
+    if task.status != TaskStatus.FAILED:
+        raise HTTPException(status_code=409, detail=f"Only failed tasks can be retried, task is {task.status.value}")
+
+    ticket = admit_or_429(api_key, task.priority, task.batch_id)
+    if not await TaskManager.reset_task(task_id):
+        # Another retry reset the task since it was read
+        admission.release(ticket)
+        raise HTTPException(status_code=409, detail="Only failed tasks can be retried, task is already being retried")
+    background_tasks.add_task(
+        run_admitted_task,
+        ticket,
+        task_id,
+        process_retry,
+        task_id,
+        task.dedupe_key
+    )
+
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"task_id": task_id, "status": TaskStatus.PENDING}
+    )
+
 @router.get("/runs/")
 async def get_latest_runs(limit: int = Query(10, ge=1, le=100)):
     runs = await AgentRun.find_all().sort("-timestamp").limit(limit).to_list()
     return [run.dict() for run in runs]
+
+
+@router.post("/runs/rescore", status_code=status.HTTP_202_ACCEPTED)
+async def rescore_runs(request: RescoreRequest, background_tasks: BackgroundTasks,
+                       api_key: Optional[str] = Header(None, alias="X-API-Key")):
+    """Re-score stored candidates against a new or edited job description without re-parsing them"""
+    if not request.job_description.strip():
+        raise HTTPException(status_code=400, detail="Job description text is empty")
+
+    query: Dict[str, Any] = {"output.resume_structured": {"$ne": None}}
+    if request.run_ids:
+        try:
+            query["_id"] = {"$in": [PydanticObjectId(run_id) for run_id in request.run_ids]}
+        except Exception:
+            raise HTTPException(status_code=400, detail="run_ids must be valid agent run IDs")
+    if request.since:
+        query["timestamp"] = {"$gte": request.since}
+    if request.fit_scores:
+        query["output.fit_assessment.fit_score"] = {"$in": request.fit_scores}
+
+    runs = await AgentRun.find(query).sort("-timestamp").limit(request.limit).project(RunIdView).to_list()
+    if not runs:
+        raise HTTPException(status_code=404, detail="No stored runs with a parsed resume match the request")
+
+    ticket, task = await create_admitted_task(api_key, request.priority, request.batch_id)
+    background_tasks.add_task(
+        run_admitted_task,
+        ticket,
+        task.task_id,
+        process_rescore,
+        request.job_description,
+        [run.id for run in runs],
+        request.cache
+    )
+
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"task_id": task.task_id, "status": TaskStatus.PENDING, "run_count": len(runs)}
+    )
+
+
+@router.get("/triage/stats")
+async def get_triage_stats():
+    """Aggregate how many runs triage screened out and the estimated time and spend saved"""
+    pipeline = [
+        {"$match": {"output.triage": {"$ne": None}}},
+        {"$group": {
+            "_id": None,
+            "triage_runs": {"$sum": 1},
+            "triaged": {"$sum": {"$cond": ["$output.triage.triaged", 1, 0]}},
+            "estimated_seconds_saved": {"$sum": {"$ifNull": ["$output.triage.saved.estimated_seconds", 0]}},
+            "estimated_cost_usd_saved": {"$sum": {"$ifNull": ["$output.triage.saved.estimated_cost_usd", 0]}},
+        }},
+    ]
+    stats = await AgentRun.get_motor_collection().aggregate(pipeline).to_list(length=1)
+    if not stats:
+        return {"triage_runs": 0, "triaged": 0, "estimated_seconds_saved": 0, "estimated_cost_usd_saved": 0}
+    stats = stats[0]
+    stats.pop("_id", None)
+    return stats
+
+@router.get("/llm/usage")
+async def get_llm_usage(since: Optional[datetime] = Query(None, description="Only count runs after this time")):
+    """
+    Token usage per pipeline step, with the share of prompt tokens served from the provider's
+    prompt cache and the number of calls answered by the LLM response cache
+    """
+    match: Dict[str, Any] = {"output.metrics.llm_usage": {"$exists": True}}
+    if since:
+        match["timestamp"] = {"$gte": since}
+    pipeline = [
+        {"$match": match},
+        {"$project": {"steps": {"$objectToArray": "$output.metrics.llm_usage"}}},
+        {"$unwind": "$steps"},
+        {"$group": {
+            "_id": "$steps.k",
+            "calls": {"$sum": {"$ifNull": ["$steps.v.calls", 0]}},
+            "input_tokens": {"$sum": {"$ifNull": ["$steps.v.input_tokens", 0]}},
+            "cached_tokens": {"$sum": {"$ifNull": ["$steps.v.cached_tokens", 0]}},
+            "output_tokens": {"$sum": {"$ifNull": ["$steps.v.output_tokens", 0]}},
+            "response_cache_hits": {"$sum": {"$ifNull": ["$steps.v.cache_hits", 0]}},
+        }},
+        {"$sort": {"_id": 1}},
+    ]
+    steps = {}
+    async for row in AgentRun.get_motor_collection().aggregate(pipeline):
+        step = row.pop("_id")
+        row["cache_hit_rate"] = round(row["cached_tokens"] / row["input_tokens"], 3) if row["input_tokens"] else 0.0
+        steps[step] = row
+
+    input_tokens = sum(row["input_tokens"] for row in steps.values())
+    cached_tokens = sum(row["cached_tokens"] for row in steps.values())
+    return {
+        "steps": steps,
+        "input_tokens": input_tokens,
+        "cached_tokens": cached_tokens,
+        "response_cache_hits": sum(row["response_cache_hits"] for row in steps.values()),
+        "cache_hit_rate": round(cached_tokens / input_tokens, 3) if input_tokens else 0.0,
+    }
+
+@router.post("/candidates/search")
+async def search_candidates(request: CandidateSearchRequest):
+    """Rank already parsed candidates against a job description using the local vector index"""
+    if not request.job_description.strip():
+        raise HTTPException(status_code=400, detail="Job description text is empty")
+
+    start_time = time.perf_counter()
+    matches = candidate_index.search(request.job_description, request.top_k)
+    took_ms = (time.perf_counter() - start_time) * 1000
+
+    return {
+        "results": [
+            {"agent_run_id": agent_run_id, "candidate_name": candidate_name, "score": round(score, 4)}
+            for agent_run_id, candidate_name, score in matches
+        ],
+        "indexed_candidates": len(candidate_index),
+        "took_ms": round(took_ms, 2)
+    }
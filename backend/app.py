@@ -1,12 +1,17 @@
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import tempfile
 import shutil
 from recruiter_agent.graph import run_recruiting_assistant, extract_text_from_file
 from models.run_history import AgentRun, AgentRunInput, AgentRunOutput
 from models.task import Task
 from config import settings
+from utils.candidate_index import candidate_index, sync_candidate_index, candidate_index_loop
+from utils.duplicate_index import sync_duplicate_index
+from utils.task_events import task_events
+from utils.retention import ensure_task_ttl_index, retention_loop
 from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
 from contextlib import asynccontextmanager
@@ -15,7 +20,19 @@ from contextlib import asynccontextmanager
 async def lifespan(app: FastAPI):
     client = AsyncIOMotorClient(settings.MONGODB_URL)
     await init_beanie(database=client[settings.MONGODB_DB], document_models=[AgentRun, Task])
+    await sync_candidate_index()
+    index_saver = asyncio.create_task(candidate_index_loop())
+    if settings.DUPLICATE_DETECTION_ENABLED:
+        await sync_duplicate_index()
+    await ensure_task_ttl_index()
+    await task_events.start()
+    retention = asyncio.create_task(retention_loop()) if settings.RETENTION_ENABLED else None
     yield
+    if retention:
+        retention.cancel()
+    await task_events.stop()
+    index_saver.cancel()
+    candidate_index.save_if_dirty()
 
 app = FastAPI(title="Recruiter Agent API", version="1.0.0", lifespan=lifespan)
 
@@ -29,7 +46,9 @@ app.add_middleware(
 )
 
 from api.agent import router as agent_router
+from api.admin import router as admin_router
 app.include_router(agent_router)
+app.include_router(admin_router)
 
 # For local development only
 if __name__ == "__main__":
@@ -0,0 +1,75 @@
+"""
+Benchmark for the combined JD + resume extraction against the two-node path.
+
+Calls the real LLM (OPENAI_API_KEY must be set), so it costs a few cents.
+The two-node path is run the way the graph runs it, with both parsers in
+parallel. Run from the backend directory:
+
+    python -m benchmarks.parse_bench --resume tmp/resume.txt --job-description tmp/job_description.txt --runs 5
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_community.callbacks import get_openai_callback
+
+from recruiter_agent.graph import extract_text_from_file
+from recruiter_agent.normalize import normalize_text
+from recruiter_agent.nodes import parse_jd_node, parse_resume_node, parse_combined_node
+from recruiter_agent.utils import count_tokens
+
+
+def run_separate(state):
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        jd_future = executor.submit(parse_jd_node, state)
+        resume_future = executor.submit(parse_resume_node, state)
+        return {**jd_future.result(), **resume_future.result()}
+
+
+def run_combined(state):
+    result = parse_combined_node(state)
+    if result["metrics"]["parse"]["mode"] != "combined":
+        raise RuntimeError("Combined call failed and fell back to separate calls")
+    return result
+
+
+def measure(label, func, state, runs):
+    latencies, prompt_tokens, completion_tokens = [], [], []
+    for _ in range(runs):
+        with get_openai_callback() as usage:
+            start = time.perf_counter()
+            func(state)
+            latencies.append(time.perf_counter() - start)
+        prompt_tokens.append(usage.prompt_tokens)
+        completion_tokens.append(usage.completion_tokens)
+
+    print(f"{label:<10} latency p50 {statistics.median(latencies):6.2f} s  max {max(latencies):6.2f} s  "
+          f"prompt tokens {statistics.mean(prompt_tokens):7.0f}  completion tokens {statistics.mean(completion_tokens):6.0f}")
+    return statistics.median(latencies), statistics.mean(prompt_tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Combined vs. separate JD/resume extraction")
+    parser.add_argument("--resume", required=True, help="Resume file (PDF, DOCX or TXT)")
+    parser.add_argument("--job-description", required=True, help="Job description file (PDF, DOCX or TXT)")
+    parser.add_argument("--candidate-name", default="")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    state = {
+        "candidate_name": args.candidate_name,
+        "resume_text": normalize_text(extract_text_from_file(args.resume))[0],
+        "job_description": normalize_text(extract_text_from_file(args.job_description))[0],
+    }
+    print(f"Input: {count_tokens(state['resume_text'])} resume tokens, "
+          f"{count_tokens(state['job_description'])} JD tokens, {args.runs} runs each\n")
+
+    separate_latency, separate_tokens = measure("separate", run_separate, state, args.runs)
+    combined_latency, combined_tokens = measure("combined", run_combined, state, args.runs)
+    print(f"\ncombined vs separate: latency {combined_latency / separate_latency:.2f}x, "
+          f"prompt tokens {combined_tokens / separate_tokens:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Microbenchmarks for web research result scoring and deduplication.
+
+Compares the per-result relevance scoring (which rebuilt the candidate's
+matchers for every result) and the O(n^2) URL dedupe against the compiled
+CandidateProfile and the canonical-URL set. Run from the backend directory:
+
+    python -m benchmarks.relevance_bench
+"""
+import random
+import string
+import timeit
+from typing import Any, Dict, List
+
+from recruiter_agent.utils import CandidateProfile, canonical_url
+
+CANDIDATE_NAME = "Sumit Chauhan"
+USERNAMES = {"github": "codeit13", "linkedin": "sumit02"}
+RESUME = {
+    "experience": [{"company": "Acme Corp"}, {"company": "Globex"}, {"company": "Initech"}, {"company": "Acme Corp"}],
+    "education": [{"institution": "IIT Delhi"}, {"institution": "Delhi Public School"}],
+}
+
+
+def legacy_relevance(result: Dict[str, Any], candidate_name: str,
+                     resume_structured: Dict[str, Any], usernames: Dict[str, str]) -> float:
+    """The scoring as it was before CandidateProfile, kept as the baseline"""
+    content = result.get('content', '').lower()
+    title = result.get('title', '').lower()
+    url = result.get('url', '').lower()
+    relevance = 0.0
+    name_parts = candidate_name.lower().split()
+    if len(name_parts) >= 2:
+        if all(part in content[:500] or part in title for part in name_parts):
+            relevance += 5.0
+        elif any(part in content[:500] or part in title for part in name_parts):
+            matching_parts = sum(1 for part in name_parts if part in content[:500] or part in title)
+            relevance += (matching_parts / len(name_parts)) * 2.5
+    for platform, username in usernames.items():
+        username_lower = username.lower()
+        if platform == 'github' and 'github.com/' + username_lower in url:
+            relevance += 8.0
+        elif platform == 'linkedin' and 'linkedin.com/in/' + username_lower in url:
+            relevance += 8.0
+        elif platform == 'twitter' and ('twitter.com/' + username_lower in url or 'x.com/' + username_lower in url):
+            relevance += 7.0
+        if username_lower in content[:1000]:
+            relevance += 2.0
+    companies = [exp.get('company', '').lower() for exp in resume_structured.get('experience', [])]
+    education = [edu.get('institution', '').lower() for edu in resume_structured.get('education', [])]
+    company_matches = sum(1 for company in companies if company and company in content[:1000])
+    edu_matches = sum(1 for school in education if school and school in content[:1000])
+    relevance += min(company_matches * 1.5, 3.0)
+    relevance += min(edu_matches * 1.0, 2.0)
+    return relevance
+
+
+def make_results(count: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """Synthetic search results with realistic content sizes and some duplicate URLs"""
+    rng = random.Random(seed)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(2000)]
+    signals = ["Sumit", "Chauhan", "codeit13", "Acme Corp", "IIT Delhi", "Globex"]
+    results = []
+    for i in range(count):
+        body = rng.choices(words, k=rng.randint(300, 1200))
+        for signal in rng.sample(signals, rng.randint(0, 3)):
+            body.insert(rng.randint(0, 150), signal)
+        host = rng.choice(["github.com/codeit13", "example.com/post", "www.linkedin.com/in/sumit02", "blog.dev"])
+        results.append({
+            "title": " ".join(rng.choices(words + signals, k=8)),
+            "url": f"https://{host}/{rng.randint(0, count // 3)}",
+            "content": " ".join(body),
+        })
+    return results
+
+
+def dedupe_legacy(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    kept = []
+    for result in results:
+        if any(r['url'] == result['url'] for r in kept):
+            continue
+        kept.append(result)
+    return kept
+
+
+def dedupe_set(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    seen = set()
+    kept = []
+    for result in results:
+        url = canonical_url(result['url'])
+        if url not in seen:
+            seen.add(url)
+            kept.append(result)
+    return kept
+
+
+def bench(label: str, func, number: int) -> float:
+    seconds = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"  {label:<34} {seconds * 1000:9.3f} ms")
+    return seconds
+
+
+def main():
+    for count in (30, 300, 3000):
+        results = make_results(count)
+
+        legacy_scores = [legacy_relevance(r, CANDIDATE_NAME, RESUME, USERNAMES) for r in results]
+        profile_scores = CandidateProfile(CANDIDATE_NAME, RESUME, USERNAMES).score_batch(results)
+        assert legacy_scores == profile_scores, "CandidateProfile scores differ from the legacy scoring"
+
+        number = max(1, 3000 // count)
+        print(f"{count} results")
+        legacy = bench("relevance, per-result rebuild", lambda: [
+            legacy_relevance(r, CANDIDATE_NAME, RESUME, USERNAMES) for r in results], number)
+        batch = bench("relevance, CandidateProfile batch", lambda: CandidateProfile(
+            CANDIDATE_NAME, RESUME, USERNAMES).score_batch(results), number)
+        print(f"  speedup {legacy / batch:.1f}x")
+
+        legacy = bench("dedupe, any() scan", lambda: dedupe_legacy(results), number)
+        fast = bench("dedupe, canonical URL set", lambda: dedupe_set(results), number)
+        print(f"  speedup {legacy / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
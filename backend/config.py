@@ -1,3 +1,4 @@
+from typing import Dict, Optional
 from pydantic_settings import BaseSettings
 
 
@@ -10,6 +11,75 @@ class Settings(BaseSettings):
     LANGSMITH_ENDPOINT: str = ""
     LANGSMITH_API_KEY: str = ""
     LANGSMITH_PROJECT: str = ""
+    CANDIDATE_INDEX_PATH: str = "tmp/candidate_index.npz"
+    CANDIDATE_INDEX_DIM: int = 4096
+    CANDIDATE_INDEX_SAVE_SECONDS: float = 60.0
+    TRIAGE_ENABLED: bool = False
+    TRIAGE_THRESHOLD: float = 0.25
+    TRIAGE_EST_PIPELINE_SECONDS: float = 60.0
+    TRIAGE_EST_PIPELINE_COST_USD: float = 0.01
+    RESCORE_CONCURRENCY: int = 8
+    MATCH_ROLES_CONCURRENCY: int = 8
+    MATCH_ROLES_MAX_JDS: int = 50
+    DEFAULT_DEADLINE_MS: Optional[int] = None
+    FIT_SCORE_RESERVED_MS: int = 20000
+    WEB_STRUCTURING_RESERVED_MS: int = 10000
+    MIN_LLM_TIMEOUT_MS: int = 5000
+    WEB_PREFETCH_WORKERS: int = 6
+    SEARCH_MAX_QUERIES: int = 10
+    SEARCH_WAVE_SIZE: int = 3
+    SEARCH_HIGH_RELEVANCE: float = 8.0
+    SEARCH_EARLY_STOP_HITS: int = 3
+    WEB_BREAKER_FAILURE_THRESHOLD: int = 3
+    WEB_BREAKER_COOLDOWN_SECONDS: float = 600.0
+    WEB_URL_NEGATIVE_TTL_SECONDS: float = 3600.0
+    WEB_FETCH_MAX_CHARS: int = 20000
+    WEB_PASSAGE_CHARS: int = 500
+    WEB_CONTEXT_TOKEN_BUDGET: int = 1500
+    FIT_PROMPT_TOKEN_BUDGET: int = 3000
+    FIT_PROMPT_MAX_ITEM_CHARS: int = 300
+    RESUME_SECTION_MODE_MIN_TOKENS: int = 2500
+    RESUME_CHUNK_MAX_TOKENS: int = 1500
+    RESUME_SECTION_WORKERS: int = 8
+    COMBINED_PARSE_ENABLED: bool = True
+    COMBINED_PARSE_MAX_TOKENS: int = 2500
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_SQLITE_PATH: str = "tmp/llm_cache.sqlite3"
+    LLM_CACHE_MAX_ENTRIES: int = 10000
+    LLM_CACHE_MONGO_ENABLED: bool = True
+    LLM_CACHE_MONGO_MAX_ENTRIES: int = 100000
+    LLM_CACHE_TTL_SECONDS: float = 7 * 24 * 3600
+    WEB_RESEARCH_CACHE_ENABLED: bool = True
+    WEB_RESEARCH_CACHE_MAX_AGE_SECONDS: float = 3 * 24 * 3600
+    WEB_RESEARCH_CACHE_MAX_ENTRIES: int = 10000
+    DUPLICATE_DETECTION_ENABLED: bool = True
+    DUPLICATE_SIMILARITY_THRESHOLD: float = 0.8
+    DUPLICATE_NUM_PERM: int = 128
+    DUPLICATE_LSH_BANDS: int = 16
+    DUPLICATE_SHINGLE_SIZE: int = 3
+    DUPLICATE_REUSE_DEFAULT: bool = False
+    ADMISSION_MAX_RUNNING: int = 4
+    ADMISSION_MAX_QUEUED: int = 20  # Interactive runs waiting; bulk runs have their own cap below
+    ADMISSION_KEY_MAX_ACTIVE: Optional[int] = None  # Running + queued runs per X-API-Key
+    ADMISSION_KEY_LIMITS: Dict[str, int] = {}  # Per-key overrides, e.g. '{"team-a": 10}'
+    ADMISSION_INTERACTIVE_RESERVED: int = 1  # Run slots bulk work may not use (until it has aged)
+    ADMISSION_MAX_BULK_QUEUED: int = 1000  # Bulk runs waiting, across all batches
+    ADMISSION_BULK_AGING_SECONDS: float = 600.0
+    TASK_STATUS_MAX_IDS: int = 500
+    TASK_EVENTS_CHANGE_STREAM: bool = True  # Needs a replica set, falls back to in-process events otherwise
+    TASK_EVENTS_RECENT_TASKS: int = 10000  # Latest statuses kept in memory to answer subscribers
+    TASK_EVENTS_HEARTBEAT_SECONDS: int = 15
+    TASK_EVENTS_LONG_POLL_MAX_SECONDS: int = 60
+    PIPELINE_VERSION: str = "1"  # Bump when prompts or graph changes make stored runs stale
+    RUN_DEDUPE_ENABLED: bool = True
+    RUN_REUSE_MAX_AGE_SECONDS: float = 24 * 3600
+    RUN_INFLIGHT_MAX_AGE_SECONDS: float = 1800
+    TASK_TTL_SECONDS: Optional[int] = 7 * 24 * 3600  # Finished tasks are deleted this long after completion
+    RUN_RETENTION_DAYS: Optional[int] = 90  # Older agent runs are archived, only a summary stays in agent_runs
+    RUN_ARCHIVE_PATH: Optional[str] = None  # Directory for gzip JSONL archives, default is a compressed collection
+    RETENTION_ENABLED: bool = True  # Enable on one replica only when several API replicas share a database
+    RETENTION_INTERVAL_SECONDS: float = 3600
+    RETENTION_BATCH_SIZE: int = 500
 
     class Config:
         env_file = ".env"
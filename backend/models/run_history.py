@@ -1,12 +1,15 @@
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from beanie import Document
+from pymongo import DESCENDING, IndexModel
 from pydantic import BaseModel, Field
 
 class AgentRunInput(BaseModel):
     candidate_name: str
     resume_text: str
     job_description: str
+    job_description_hash: Optional[str] = None  # text_hash of job_description, used to reuse JD parses
+    dedupe_key: Optional[str] = None  # Resume, JD, options and pipeline version, used to reuse whole runs
 
 class AgentRunOutput(BaseModel):
     jd_structured: Optional[Dict[str, Any]] = None
@@ -14,10 +17,24 @@ class AgentRunOutput(BaseModel):
     web_structured: Optional[Dict[str, Any]] = None
     fit_assessment: Optional[Dict[str, Any]] = None
     formatted_output: Optional[str] = None  # Markdown formatted assessment
+    triage: Optional[Dict[str, Any]] = None  # Local pre-screen score and estimated savings
+    deadline_ms: Optional[int] = None  # Latency budget requested for the run
+    degraded_steps: Optional[List[str]] = None  # Steps cut short to meet the latency budget
+    metrics: Optional[Dict[str, Any]] = None  # Per-run pipeline metrics (search plan, ...)
 
 class AgentRun(Document):
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+    rescored_from: Optional[str] = None  # Original run when only the fit score was recomputed
+    matched_from: Optional[str] = None  # Best-matching role run of the same /match-roles/ request
+    resume_signature: Optional[List[int]] = None  # MinHash of the normalized resume, for near-duplicate detection
+    archived_at: Optional[datetime] = None  # Set once the full run moved to the archive, texts and parses are cleared
+    summary: Optional[Dict[str, Any]] = None  # Job title, fit score and archive location of an archived run
     input: AgentRunInput
     output: AgentRunOutput
     class Settings:
         name = "agent_runs"
+        indexes = [
+            "input.job_description_hash",
+            "input.dedupe_key",
+            IndexModel([("timestamp", DESCENDING)]),
+        ]
@@ -2,6 +2,7 @@ from datetime import datetime
 from enum import Enum
 from typing import Optional, Dict, Any
 from beanie import Document
+from pymongo import ASCENDING, IndexModel
 from pydantic import BaseModel, Field
 import uuid
 
@@ -11,6 +12,12 @@ class TaskStatus(str, Enum):
     COMPLETED = "completed"
     FAILED = "failed"
 
+class TaskPriority(str, Enum):
+    INTERACTIVE = "interactive"  # A recruiter waiting on the result
+    BULK = "bulk"  # Batch screens, re-scoring, imports
+
+TERMINAL_STATUSES = (TaskStatus.COMPLETED, TaskStatus.FAILED)
+
 class Task(Document):
     task_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     status: TaskStatus = Field(default=TaskStatus.PENDING)
@@ -19,6 +26,29 @@ class Task(Document):
     result: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
     agent_run_id: Optional[str] = None
+    dedupe_key: Optional[str] = None  # Identity of the submission, identical submissions share a task
+    priority: TaskPriority = Field(default=TaskPriority.INTERACTIVE)
+    batch_id: Optional[str] = None  # Bulk tasks of one batch share a fair-share slot
+    queue_wait_ms: Optional[float] = None  # Time spent queued by admission control before running
+    completed_at: Optional[datetime] = None  # When the task completed or failed, finished tasks expire after a TTL
     
     class Settings:
         name = "tasks"
+        indexes = [
+            IndexModel([("task_id", ASCENDING)], unique=True),
+            "dedupe_key",
+            "batch_id",
+        ]
+
+class TaskStatusView(BaseModel):
+    """Task fields reported by status endpoints and task events; the result is left in the database"""
+    task_id: str
+    status: TaskStatus
+    created_at: datetime
+    updated_at: datetime
+    error: Optional[str] = None
+    agent_run_id: Optional[str] = None
+    priority: TaskPriority = TaskPriority.INTERACTIVE
+    batch_id: Optional[str] = None
+    queue_wait_ms: Optional[float] = None
+    completed_at: Optional[datetime] = None
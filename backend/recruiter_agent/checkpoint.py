@@ -0,0 +1,33 @@
+import functools
+from langgraph.checkpoint.mongodb import MongoDBSaver
+from config import settings
+from recruiter_agent.mongo import get_sync_client
+
+CHECKPOINT_COLLECTION = "graph_checkpoints"
+WRITES_COLLECTION = "graph_checkpoint_writes"
+
+
+@functools.lru_cache(maxsize=1)
+def get_checkpointer() -> MongoDBSaver:
+    """
+    Shared Mongo-backed LangGraph checkpointer. Checkpoints are keyed by
+    thread_id, which is the task_id of the run.
+    """
+    return MongoDBSaver(
+        get_sync_client(),
+        db_name=settings.MONGODB_DB,
+        checkpoint_collection_name=CHECKPOINT_COLLECTION,
+        writes_collection_name=WRITES_COLLECTION,
+    )
+
+
+def thread_config(task_id: str) -> dict:
+    """Graph config that scopes checkpoints to a task"""
+    return {"configurable": {"thread_id": task_id}}
+
+
+def clear_checkpoints(task_id: str) -> None:
+    """Delete the checkpoints of a run once its result is stored, they are only needed to resume failures"""
+    checkpointer = get_checkpointer()
+    checkpointer.checkpoint_collection.delete_many({"thread_id": task_id})
+    checkpointer.writes_collection.delete_many({"thread_id": task_id})
@@ -1,9 +1,13 @@
-from ast import List
-from typing import Annotated, TypedDict, Any
+from typing import Annotated, TypedDict, Any, List, Optional, Union
+import operator
 from langchain_core.messages import AnyMessage
 import urllib
-from recruiter_agent.nodes import parse_jd_node, parse_resume_node, web_research_node, fit_score_node
-from recruiter_agent.utils import format_output
+from recruiter_agent.nodes import (
+    normalize_inputs_node, triage_node, parse_jd_node, parse_resume_node, parse_combined_node, use_combined_parse,
+    web_prefetch_node, web_research_node, fit_score_node
+)
+from recruiter_agent.utils import format_output, merge_metrics
+from recruiter_agent.checkpoint import get_checkpointer, thread_config
 from recruiter_agent.pydantic_types import JobDescription, Resume, WebResearch, FitAssessment
 from langgraph.graph import StateGraph, START, END, add_messages
 from pypdf import PdfReader
@@ -14,15 +18,43 @@ import argparse
 import time
 import json
 
-def create_graph():
+# Run in parallel after triage: both parsers plus the speculative web prefetch
+PARALLEL_START_NODES = ["JDParser", "ResumeParser", "WebPrefetcher"]
+# Short inputs: one call extracts both the JD and the resume
+COMBINED_START_NODES = ["CombinedParser", "WebPrefetcher"]
+
+
+def route_after_triage(state: Dict[str, Any]) -> Union[str, List[str]]:
+    """Stop after triage when the candidate was screened out, otherwise fan out"""
+    triage = state.get("triage")
+    if triage and triage.get("triaged"):
+        return END
+    # With a reused resume parse only the JD needs extracting, so the combined call would be wasted
+    if use_combined_parse(state) and not state.get("reuse"):
+        return COMBINED_START_NODES
+    return PARALLEL_START_NODES
+
+
+def create_graph(checkpointer=None):
     class State(TypedDict):
         """State definition for the recruitment agent graph"""
         candidate_name: str
         job_description: str
         resume_text: str
+        raw_job_description: str  # Inputs as submitted, the normalizer rewrites the two above
+        raw_resume_text: str
+        triage_threshold: Optional[float]
+        triage: Optional[Dict[str, Any]]
+        deadline_ms: Optional[int]
+        use_cache: Optional[bool]
+        reuse: Optional[Dict[str, Any]]
+        degraded_steps: Annotated[List[str], operator.add]
+        metrics: Annotated[Dict[str, Any], merge_metrics]
         jd_structured: JobDescription
         resume_structured: Resume
         extracted_urls: Any
+        usernames: Dict[str, str]
+        prefetched: Dict[str, Any]
         web_structured: WebResearch
         fit_assessment: FitAssessment
         formatted_output: str
@@ -30,28 +62,52 @@ def create_graph():
     workflow = StateGraph(State)
 
     # Add nodes
+    workflow.add_node("Normalizer", normalize_inputs_node)
+    workflow.add_node("Triage", triage_node)
     workflow.add_node("JDParser", parse_jd_node)
     workflow.add_node("ResumeParser", parse_resume_node)
+    workflow.add_node("CombinedParser", parse_combined_node)
+    workflow.add_node("WebPrefetcher", web_prefetch_node)
     workflow.add_node("WebResearcher", web_research_node)
     workflow.add_node("FitScorer", fit_score_node)
 
     # Add Edges
-    workflow.add_edge(START, "JDParser")
-    workflow.add_edge("JDParser", "ResumeParser")
-    workflow.add_edge("ResumeParser", "WebResearcher")
+    workflow.add_edge(START, "Normalizer")
+    workflow.add_edge("Normalizer", "Triage")
+    workflow.add_conditional_edges("Triage", route_after_triage, PARALLEL_START_NODES + ["CombinedParser", END])
+    # Each fan-out has its own join, WebResearcher starts once either set has finished
+    workflow.add_edge(PARALLEL_START_NODES, "WebResearcher")
+    workflow.add_edge(COMBINED_START_NODES, "WebResearcher")
     workflow.add_edge("WebResearcher", "FitScorer")
     workflow.add_edge("FitScorer", END)
 
-    graph = workflow.compile()
+    graph = workflow.compile(checkpointer=checkpointer)
+    return graph
+
 
+def save_graph_visualization(graph, output_file_path: str = 'tmp/graph.png') -> None:
+    """Render the graph with mermaid. This calls an external API, so it is kept out of the run path."""
     try:
         graph.get_graph().draw_mermaid_png(
-            output_file_path='tmp/graph.png')
-        print("✅ Graph visualization saved to tmp/graph.png")
+            output_file_path=output_file_path)
+        print(f"✅ Graph visualization saved to {output_file_path}")
     except Exception as e:
         print(f"Warning: Could not generate graph visualization: {str(e)}")
 
-    return graph
+
+def build_run_config(task_id: Optional[str] = None, deadline_ms: Optional[int] = None,
+                     use_cache: Optional[bool] = True) -> dict:
+    """
+    Graph config for a run. The deadline is an absolute timestamp, kept in the config
+    rather than the state so a resumed run gets a fresh budget. use_cache=False makes
+    every LLM call of the run bypass the response cache.
+    """
+    config = thread_config(task_id) if task_id else {"configurable": {}}
+    if deadline_ms:
+        config["configurable"]["deadline"] = time.time() + deadline_ms / 1000
+    if use_cache is False:
+        config["configurable"]["llm_cache"] = False
+    return config
 
 
 def extract_text_from_pdf(file_path: str) -> str:
@@ -66,11 +122,11 @@ def extract_text_from_pdf(file_path: str) -> str:
     """
     try:
         reader = PdfReader(file_path)
-        text = ""
+        pages = []
         links = []
 
         for page in reader.pages:
-            text += page.extract_text() + "\n"
+            pages.append(page.extract_text())
 
             if "/Annots" in page:
                 for annot in page["/Annots"]:
@@ -82,7 +138,8 @@ def extract_text_from_pdf(file_path: str) -> str:
                             # Optionally, use rectangle coordinates to find link text (advanced)
                             links.append(uri)
 
-        return text + "\n\nLinks: " + " , ".join(links)
+        # Pages are separated with form feeds so normalization can spot running headers/footers
+        return "\n\f".join(pages) + "\n\nLinks: " + " , ".join(links)
 
     except Exception as e:
         print(f"Error extracting text from PDF: {str(e)}")
@@ -137,7 +194,10 @@ def extract_text_from_file(file_path: str) -> str:
 
 
 
-def run_recruiting_assistant(candidate_name: str, resume_text: str, job_description: str) -> dict:
+def run_recruiting_assistant(candidate_name: str, resume_text: str, job_description: str,
+                             triage_threshold: Optional[float] = None, task_id: Optional[str] = None,
+                             deadline_ms: Optional[int] = None, use_cache: bool = True,
+                             reuse: Optional[Dict[str, Any]] = None) -> dict:
     """
     Executes the compiled LangGraph with the given inputs and returns the full state including
     structured JD, resume, web research, and fit assessment.
@@ -145,15 +205,60 @@ def run_recruiting_assistant(candidate_name: str, resume_text: str, job_descript
     :param candidate_name: Candidate's full name
     :param resume_text: Plain-text extracted from candidate resume (PDF or DOCX)
     :param job_description: Raw job description text (string)
+    :param triage_threshold: Minimum local triage score to run the full pipeline (None disables triage)
+    :param task_id: When given, every completed node is checkpointed under this ID so a failed run can be resumed
+    :param deadline_ms: Overall latency budget; web research is cut short to keep time for fit scoring
+    :param use_cache: When False, no LLM response is served from the response cache
+    :param reuse: resume_structured and/or web_structured of a near-duplicate run (with its agent_run_id)
+        to use instead of parsing the resume and researching the candidate again
     :return: A dict containing keys 'jd_structured', 'resume_structured', 'web_structured', 'fit_assessment'
     """
     initial_state = {
         "candidate_name": candidate_name,
         "job_description": job_description,
-        "resume_text": resume_text
+        "resume_text": resume_text,
+        "raw_job_description": job_description,
+        "raw_resume_text": resume_text,
+        "triage_threshold": triage_threshold,
+        "deadline_ms": deadline_ms,
+        "use_cache": use_cache,
+        "reuse": reuse,
+        "degraded_steps": [],
+        "metrics": {}
     }
-    graph = create_graph()
-    result = graph.invoke(initial_state)
+    config = build_run_config(task_id, deadline_ms, use_cache)
+    if not task_id:
+        graph = create_graph()
+        return graph.invoke(initial_state, config)
+
+    # The checkpoints are kept until the caller has stored the result (clear_checkpoints),
+    # so a failure to store it can still be retried
+    graph = create_graph(checkpointer=get_checkpointer())
+    return graph.invoke(initial_state, config)
+
+
+def resume_recruiting_assistant(task_id: str) -> dict:
+    """
+    Resume a checkpointed run from the last completed node. Nodes that already
+    succeeded are not executed again.
+
+    :param task_id: Task ID the run was started with
+    :return: The full final state, same as run_recruiting_assistant (checkpoints are kept, see clear_checkpoints)
+    """
+    graph = create_graph(checkpointer=get_checkpointer())
+
+    snapshot = graph.get_state(thread_config(task_id))
+    if not snapshot.values:
+        raise ValueError(f"No checkpoint found for task {task_id}")
+
+    # The retry gets the same latency budget as the original request, starting now
+    config = build_run_config(task_id, snapshot.values.get("deadline_ms"), snapshot.values.get("use_cache"))
+    if snapshot.next:
+        print(f"🔄 Resuming task {task_id} at: {', '.join(snapshot.next)}")
+        result = graph.invoke(None, config)
+    else:
+        # The graph finished before, storing its result failed
+        result = snapshot.values
     return result
 
 
@@ -167,6 +272,12 @@ def main():
                         help="Path to job description file or text")
     parser.add_argument("--output", type=str,
                         default="assessment.md", help="Output file path")
+    parser.add_argument("--triage-threshold", type=float, default=None,
+                        help="Screen out candidates below this local triage score before the full analysis")
+    parser.add_argument("--deadline-ms", type=int, default=None,
+                        help="Overall latency budget in milliseconds")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Do not serve LLM responses from the response cache")
 
     args = parser.parse_args()
 
@@ -195,18 +306,24 @@ def main():
     initial_state = {
         "candidate_name": urllib.parse.unquote(args.candidate_name) if args.candidate_name else "",
         "resume_text": resume_text,
-        "job_description": job_description
+        "job_description": job_description,
+        "triage_threshold": args.triage_threshold,
+        "deadline_ms": args.deadline_ms,
+        "use_cache": not args.no_cache,
+        "degraded_steps": [],
+        "metrics": {}
     }
 
     # Create and run the graph
     print("🔄 Creating agent graph...")
     graph = create_graph()
+    save_graph_visualization(graph)
 
     print("🚀 Running recruiting agent...")
     start_time = time.time()
 
     # Execute the graph
-    result = graph.invoke(initial_state)
+    result = graph.invoke(initial_state, build_run_config(deadline_ms=args.deadline_ms, use_cache=not args.no_cache))
 
     end_time = time.time()
     print(f"✅ Agent completed in {end_time - start_time:.2f} seconds")
@@ -224,10 +341,11 @@ def main():
     # Also save the full structured results
     with open(f"{os.path.splitext(args.output)[0]}_full.json", "w", encoding="utf-8") as f:
         json.dump({
-            "job_description": result["jd_structured"],
-            "resume": result["resume_structured"],
-            "web_research": result["web_structured"],
-            "assessment": result["fit_assessment"]
+            "job_description": result.get("jd_structured"),
+            "resume": result.get("resume_structured"),
+            "web_research": result.get("web_structured"),
+            "assessment": result["fit_assessment"],
+            "triage": result.get("triage")
         }, f, indent=2)
 
     print(
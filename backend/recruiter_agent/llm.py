@@ -1,16 +1,96 @@
+import asyncio
+from typing import Any, Dict, Optional, Tuple, Type
+import httpx
+import openai
+from pydantic import BaseModel
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
 from langchain_groq import ChatGroq
 from config import settings
+from recruiter_agent.llm_cache import get_llm_cache, cache_enabled, cache_key
 
 
-def create_llm():
+def create_llm(timeout: Optional[float] = None):
     llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.5,
-                     api_key=settings.OPENAI_API_KEY)
+                     api_key=settings.OPENAI_API_KEY, timeout=timeout)
     # llm = ChatGroq(model="llama-3.3-70b-versatile", temperature=0.5)
     return llm
 
 
+def is_timeout(error: BaseException) -> bool:
+    """Whether an LLM call failed because it ran out of time, as opposed to any other error"""
+    return isinstance(error, (TimeoutError, asyncio.TimeoutError, openai.APITimeoutError, httpx.TimeoutException))
+
+
+def llm_usage(message: Any) -> Dict[str, int]:
+    """Token usage of one LLM response, including prompt tokens served from the provider's cache"""
+    usage = getattr(message, "usage_metadata", None) or {}
+    details = usage.get("input_token_details") or {}
+    return {
+        "calls": 1,
+        "input_tokens": usage.get("input_tokens", 0),
+        "output_tokens": usage.get("output_tokens", 0),
+        "cached_tokens": details.get("cache_read") or 0,
+    }
+
+
+def add_usage(*usages: Dict[str, int]) -> Dict[str, int]:
+    """Sum llm_usage dicts, e.g. for a step that makes several calls"""
+    total: Dict[str, int] = {}
+    for usage in usages:
+        for key, value in usage.items():
+            total[key] = total.get(key, 0) + value
+    return total
+
+
+CACHE_HIT_USAGE = {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cached_tokens": 0, "cache_hits": 1}
+
+
+def response_cache_key(llm, schema: Optional[Type[BaseModel]], messages) -> str:
+    params = {"temperature": getattr(llm, "temperature", None)}
+    return cache_key(getattr(llm, "model_name", type(llm).__name__), params,
+                     schema.model_json_schema() if schema else None, messages)
+
+
+def invoke_structured(llm, schema: Type[BaseModel], messages,
+                      config: Optional[Dict[str, Any]] = None) -> Tuple[BaseModel, Dict[str, int]]:
+    """
+    Structured-output call that also returns the token usage of the raw response.
+    Raises when the output cannot be parsed, like a plain with_structured_output call.
+    Identical requests are answered from the LLM response cache unless the run opted out.
+    """
+    cache = get_llm_cache() if cache_enabled(config) else None
+    if cache:
+        key = response_cache_key(llm, schema, messages)
+        cached = cache.get(key)
+        if cached is not None:
+            return schema.model_validate(cached), dict(CACHE_HIT_USAGE)
+
+    result = llm.with_structured_output(schema, include_raw=True).invoke(messages)
+    if result.get("parsing_error") or result.get("parsed") is None:
+        raise ValueError(f"Could not parse {schema.__name__} output: {result.get('parsing_error')}")
+
+    if cache:
+        cache.set(key, result["parsed"].model_dump(mode="json"))
+    return result["parsed"], llm_usage(result["raw"])
+
+
+def invoke_text(llm, messages, config: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, int]]:
+    """Plain-text call with usage, answered from the LLM response cache like invoke_structured"""
+    cache = get_llm_cache() if cache_enabled(config) else None
+    if cache:
+        key = response_cache_key(llm, None, messages)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached, dict(CACHE_HIT_USAGE)
+
+    response = llm.invoke(messages)
+    content = response.content if hasattr(response, 'content') else str(response)
+    if cache:
+        cache.set(key, content)
+    return content, llm_usage(response)
+
+
 def create_prompt_template(template_str: str) -> ChatPromptTemplate:
     """
     Creates a ChatPromptTemplate from a template string.
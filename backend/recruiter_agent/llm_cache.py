@@ -0,0 +1,159 @@
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from config import settings
+
+MONGO_COLLECTION = "llm_cache"
+
+# Size bounds are enforced every this many writes rather than on each one
+PRUNE_EVERY = 100
+
+
+def cache_key(model: str, params: Dict[str, Any], schema: Optional[Dict[str, Any]], messages: Any) -> str:
+    """Exact-match key: model, sampling parameters, output schema and the full messages"""
+    payload = json.dumps({"model": model, "params": params, "schema": schema, "messages": messages},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SQLiteCacheTier:
+    """Local tier: one SQLite file per host, least recently used entries are evicted past max_entries"""
+
+    def __init__(self, path: str, max_entries: int, ttl_seconds: float, table: str = "llm_cache"):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.table = table
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)")
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_used ON {table} (last_used)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value FROM {self.table} WHERE key = ? AND created_at >= ?",
+                (key, now - self.ttl_seconds)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?)",
+                               (key, json.dumps(value, default=str), now, now))
+            self._writes += 1
+            if self._writes % PRUNE_EVERY == 0:
+                self._prune(now)
+            self._conn.commit()
+
+    def _prune(self, now: float) -> None:
+        self._conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN ("
+            f"SELECT key FROM {self.table} ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+
+class MongoCacheTier:
+    """Shared tier: entries expire through a TTL index, the oldest are trimmed past max_entries"""
+
+    def __init__(self, collection, max_entries: int, ttl_seconds: float):
+        self.collection = collection
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._writes = 0
+        self.collection.create_index("created_at", expireAfterSeconds=int(ttl_seconds))
+
+    def get(self, key: str) -> Optional[Any]:
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        # The TTL monitor runs about once a minute, so expired entries are filtered explicitly
+        document = self.collection.find_one({"_id": key, "created_at": {"$gte": cutoff}})
+        return document["value"] if document else None
+
+    def set(self, key: str, value: Any) -> None:
+        self.collection.replace_one({"_id": key}, {"_id": key, "value": value, "created_at": datetime.utcnow()},
+                                    upsert=True)
+        self._writes += 1
+        if self._writes % PRUNE_EVERY == 0:
+            excess = self.collection.estimated_document_count() - self.max_entries
+            if excess > 0:
+                oldest = [doc["_id"] for doc in
+                          self.collection.find({}, {"_id": 1}).sort("created_at", 1).limit(excess)]
+                self.collection.delete_many({"_id": {"$in": oldest}})
+
+
+class LLMCache:
+    """
+    Read-through cache over a list of tiers, fastest first. A hit in a slower
+    tier is copied into the faster ones. Tier errors are logged and treated as
+    misses so the cache can never fail an LLM call.
+    """
+
+    def __init__(self, tiers: List[Any]):
+        self.tiers = tiers
+
+    def get(self, key: str) -> Optional[Any]:
+        for index, tier in enumerate(self.tiers):
+            try:
+                value = tier.get(key)
+            except Exception as e:
+                print(f"Warning: LLM cache tier {type(tier).__name__} read failed: {str(e)}")
+                continue
+            if value is not None:
+                for faster in self.tiers[:index]:
+                    self._set_tier(faster, key, value)
+                return value
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        for tier in self.tiers:
+            self._set_tier(tier, key, value)
+
+    @staticmethod
+    def _set_tier(tier, key: str, value: Any) -> None:
+        try:
+            tier.set(key, value)
+        except Exception as e:
+            print(f"Warning: LLM cache tier {type(tier).__name__} write failed: {str(e)}")
+
+
+@functools.lru_cache(maxsize=1)
+def get_llm_cache() -> Optional[LLMCache]:
+    """The configured cache, or None when caching is disabled"""
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    tiers = []
+    if settings.LLM_CACHE_SQLITE_PATH:
+        tiers.append(SQLiteCacheTier(settings.LLM_CACHE_SQLITE_PATH, settings.LLM_CACHE_MAX_ENTRIES,
+                                     settings.LLM_CACHE_TTL_SECONDS))
+    if settings.LLM_CACHE_MONGO_ENABLED:
+        from recruiter_agent.mongo import get_sync_db
+        try:
+            tiers.append(MongoCacheTier(get_sync_db()[MONGO_COLLECTION], settings.LLM_CACHE_MONGO_MAX_ENTRIES,
+                                        settings.LLM_CACHE_TTL_SECONDS))
+        except Exception as e:
+            print(f"Warning: Mongo LLM cache tier unavailable: {str(e)}")
+    return LLMCache(tiers) if tiers else None
+
+
+def cache_enabled(config: Optional[Dict[str, Any]]) -> bool:
+    """Whether this run may use cached LLM responses (requests can opt out with cache=off)"""
+    return ((config or {}).get("configurable") or {}).get("llm_cache", True) is not False
@@ -0,0 +1,17 @@
+import functools
+from pymongo import MongoClient
+from pymongo.database import Database
+from config import settings
+
+
+@functools.lru_cache(maxsize=1)
+def get_sync_client() -> MongoClient:
+    """
+    Process-wide synchronous Mongo client for code running in graph nodes
+    (worker threads), where the async motor client cannot be used.
+    """
+    return MongoClient(settings.MONGODB_URL)
+
+
+def get_sync_db() -> Database:
+    return get_sync_client()[settings.MONGODB_DB]
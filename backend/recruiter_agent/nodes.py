@@ -1,46 +1,125 @@
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List, Optional
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, START, END
-from langchain_tavily import TavilySearch
 from config import settings
-from recruiter_agent.llm import create_llm
-from recruiter_agent.pydantic_types import JobDescription, Resume, WebResearch, FitAssessment
+from recruiter_agent.llm import create_llm, invoke_structured, add_usage, is_timeout
+from recruiter_agent.llm_cache import cache_enabled
+from recruiter_agent.prompts import (
+    parse_jd_messages, parse_resume_messages, parse_combined_messages, parse_resume_section_messages,
+    web_research_messages, fit_score_messages, FIT_SCORE_SYSTEM
+)
+from recruiter_agent.tools import create_search_tool, run_search
+from recruiter_agent.pydantic_types import (
+    JobDescription, Resume, WebResearch, FitAssessment, CombinedExtraction, ResumePersonalSection, ResumeExperienceSection,
+    ResumeEducationSection, ResumeSkillsSection, ResumeProjectsSection
+)
+from recruiter_agent.resume_sections import split_resume_sections, chunk_lines, merge_experience, unique
+from recruiter_agent.triage import compute_triage_score
+from recruiter_agent.normalize import normalize_text
+from recruiter_agent.passages import select_passages, candidate_query
+from recruiter_agent.prompt_budget import PromptBudget, PromptSection, render_sections
+from recruiter_agent.research_cache import candidate_identity_key, load_research, store_research
 from recruiter_agent.utils import (
     extract_links_from_text, get_url_content, extract_username_from_url,
-    calculate_result_relevance, generate_search_queries, generate_llm_search_queries, format_output
+    CandidateProfile, canonical_url, plan_search_queries, identity_search_queries, identity_signals_weak,
+    generate_llm_search_queries, format_output, time_left, llm_timeout, ResearchBudget, count_tokens
 )
 
-def parse_jd_node(state: Dict[str, Any]) -> Dict[str, Any]:
+def normalize_inputs_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Strip extraction noise (repeated page headers/footers, page numbers, glyphs,
+    duplicate links, whitespace runs) from the resume and JD before anything reads them.
+    """
+    resume_text, resume_stats = normalize_text(state["resume_text"])
+    job_description, jd_stats = normalize_text(state["job_description"])
+    removed = resume_stats["tokens_removed"] + jd_stats["tokens_removed"]
+    print(f"✅ Inputs normalized ({removed} tokens removed)")
+    return {
+        "resume_text": resume_text,
+        "job_description": job_description,
+        "metrics": {"normalization": {"resume": resume_stats, "job_description": jd_stats}},
+    }
+
+
+def triage_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Cheap local pre-screen. Candidates scoring below the request's triage threshold
+    get a short-circuit "Not a Fit" assessment and skip the rest of the pipeline.
+    """
+    threshold = state.get("triage_threshold")
+    if threshold is None:
+        return {"triage": None}
+
+    start_time = time.perf_counter()
+    triage = compute_triage_score(state["resume_text"], state["job_description"])
+    triage["threshold"] = threshold
+    triage["triaged"] = triage["score"] < threshold
+    triage["elapsed_ms"] = round((time.perf_counter() - start_time) * 1000, 2)
+
+    if not triage["triaged"]:
+        print(f"✅ Triage passed (score {triage['score']} >= {threshold})")
+        return {"triage": triage}
+
+    # Everything after this node is skipped: 4 LLM calls, up to 10 searches and the page fetches
+    triage["saved"] = {
+        "llm_calls": 4,
+        "web_searches": 10,
+        "estimated_seconds": settings.TRIAGE_EST_PIPELINE_SECONDS,
+        "estimated_cost_usd": settings.TRIAGE_EST_PIPELINE_COST_USD,
+    }
+
+    fit_assessment = FitAssessment(
+        fit_score="Not a Fit",
+        score_details={
+            "skill_match_percentage": triage["keyword_overlap"] * 100,
+            "experience_years": triage["resume_years"],
+            "domain_signal": "Low",
+        },
+        comparison_matrix=[
+            {"skill": keyword, "required": True, "candidate_has": keyword in triage["matched_keywords"]}
+            for keyword in triage["matched_keywords"] + triage["missing_keywords"][:10]
+        ],
+        reasoning=(
+            f"Screened out by automatic triage before full analysis (score {triage['score']} "
+            f"below threshold {threshold}). Keyword overlap with the job description is "
+            f"{triage['keyword_overlap'] * 100:.0f}%, {triage['qualification_hits']} of "
+            f"{triage['qualification_total']} required qualifications were found in the resume and "
+            f"the resume shows about {triage['resume_years']:g} years of experience"
+            + (f" against {triage['required_years']:g} required." if triage["required_years"] else ".")
+        ),
+    ).model_dump()
+    fit_assessment["triaged"] = True
+    print(f"✅ Triage rejected candidate (score {triage['score']} < {threshold})")
+
+    return {"triage": triage, "fit_assessment": fit_assessment,
+            "formatted_output": format_output(fit_assessment)}
+
+
+def parse_jd_node(state: Dict[str, Any], config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
     """
     Extract structured job fields from raw job_description text.
     """
     jd_text = state["job_description"]
-    jd_llm = create_llm().with_structured_output(JobDescription)
-
-    messages = [
-        (
-            "system",
-            f"""
-            Extract the following information from this job description in structured format:
-            - Job title
-            - Location (if available)
-            - List of key responsibilities
-            - List of required qualifications
-            - List of preferred qualifications (if available)
-            - List of key skills extracted from the job description
-
-            The job description text is:
-            {jd_text}
-            """
-        )
-    ]
+    llm = create_llm(timeout=llm_timeout(config))
+    degraded_steps = []
+    usage = {}
+
+    messages = parse_jd_messages(jd_text)
 
     try:
-        jd_structured = jd_llm.invoke(messages)
+        jd_structured, usage = invoke_structured(llm, JobDescription, messages, config)
         jd_structured = jd_structured.model_dump()
         print("✅ Job Description Parsed")
     except Exception as e:
         print(f"Error parsing job description: {str(e)}")
+        if time_left(config) is not None:
+            # The budget only excuses running out of time, any other error fails the run
+            if not is_timeout(e):
+                raise
+            degraded_steps.append("parse_jd")
         # Fallback structure
         jd_structured = {
             "title": "Unknown Position",
@@ -51,56 +130,63 @@ def parse_jd_node(state: Dict[str, Any]) -> Dict[str, Any]:
             "top_skills": []
         }
 
-    return {**state, "jd_structured": jd_structured}
+    return {"jd_structured": jd_structured, "degraded_steps": degraded_steps,
+            "metrics": {"llm_usage": {"parse_jd": usage}}}
 
 
-def parse_resume_node(state: Dict[str, Any]) -> Dict[str, Any]:
+def parse_resume_node(state: Dict[str, Any], config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
     """
     Extract structured resume fields from plain-text resume.
     """
     resume_text = state["resume_text"]
     candidate_name = state.get("candidate_name", "")
 
+    # A near-duplicate of an earlier resume was submitted and its parse is reused
+    reuse = state.get("reuse") or {}
+    if reuse.get("resume_structured"):
+        resume_structured = reuse["resume_structured"]
+        print(f"♻️ Resume parse reused from near-duplicate run {reuse['agent_run_id']}")
+        return {"resume_structured": resume_structured,
+                "candidate_name": candidate_name or resume_structured.get("personal", {}).get("name", ""),
+                "degraded_steps": [],
+                "metrics": {"resume_parse": {"mode": "reused", "from": reuse["agent_run_id"]},
+                            "llm_usage": {"parse_resume": {}}}}
+
     # Extract URLs from resume text first
     urls = extract_links_from_text(resume_text)
 
-    resume_llm = create_llm().with_structured_output(Resume)
-    messages = [
-        (
-            "system",
-            f"""
-            Extract the following detailed information from this resume:
-            - Personal information (name, email, phone)
-            - Education history (with degree, institution, and years)
-            - Work experience (with title, company, dates, and descriptions)
-            - Skills
-            - Certifications (if available)
-            - Projects (if available)
-            
-            If the candidate name is not in the resume, use: {candidate_name}
-            
-            The resume text is:
-            {resume_text}
-            
-            These URLs were found in the resume: {', '.join(urls)}
-            Please ensure they're properly included in the appropriate sections.
-            """
-        )
-    ]
+    # Long CVs are extracted section by section in parallel
+    resume_tokens = count_tokens(resume_text)
+    sections = split_resume_sections(resume_text) if resume_tokens >= settings.RESUME_SECTION_MODE_MIN_TOKENS else {}
+    if REQUIRED_RESUME_SECTIONS.issubset(sections):
+        resume_structured, degraded_steps, parse_stats, usage = parse_resume_sections(
+            sections, candidate_name, urls, config)
+        if not candidate_name:
+            candidate_name = resume_structured["personal"]["name"]
+        return {"resume_structured": resume_structured, "candidate_name": candidate_name,
+                "degraded_steps": degraded_steps,
+                "metrics": {"resume_parse": parse_stats, "llm_usage": {"parse_resume": usage}}}
+
+    llm = create_llm(timeout=llm_timeout(config))
+    degraded_steps = []
+    usage = {}
+    messages = parse_resume_messages(resume_text, candidate_name, urls)
 
     try:
-        resume_structured = resume_llm.invoke(messages)
+        resume_structured, usage = invoke_structured(llm, Resume, messages, config)
         resume_structured = resume_structured.model_dump()
         print("✅ Resume Parsed")
 
         # Extract candidate name if not already in state
         if not candidate_name and resume_structured.get("personal", {}).get("name"):
             candidate_name = resume_structured["personal"]["name"]
-
-        # Add extracted URLs to state for later use
-        state["extracted_urls"] = urls
     except Exception as e:
         print(f"Error parsing resume: {str(e)}")
+        if time_left(config) is not None:
+            # The budget only excuses running out of time, any other error fails the run
+            if not is_timeout(e):
+                raise
+            degraded_steps.append("parse_resume")
         # Fallback structure
         resume_structured = {
             "personal": {"name": candidate_name or "Unknown", "email": None, "phone": None},
@@ -111,27 +197,170 @@ def parse_resume_node(state: Dict[str, Any]) -> Dict[str, Any]:
             "projects": None
         }
 
-    return {**state, "resume_structured": resume_structured, "candidate_name": candidate_name}
+    # extracted_urls is written by web_prefetch_node, which runs in parallel with this node
+    return {"resume_structured": resume_structured, "candidate_name": candidate_name,
+            "degraded_steps": degraded_steps,
+            "metrics": {"resume_parse": {"mode": "single", "calls": 1, "tokens": resume_tokens},
+                        "llm_usage": {"parse_resume": usage}}}
+
+
+# Section mode is only used when these headings are found, otherwise the single call is safer
+REQUIRED_RESUME_SECTIONS = {"experience", "education", "skills"}
+
+RESUME_SECTION_SCHEMAS = {
+    "personal": (ResumePersonalSection, "the candidate's personal information (name, email, phone, years of work experience)"),
+    "experience": (ResumeExperienceSection, "every work experience entry (title, company, dates as YYYY-MM-DD, description, location)"),
+    "education": (ResumeEducationSection, "every education entry (degree, institution, start and end year)"),
+    "skills": (ResumeSkillsSection, "all skills, and certifications if any"),
+    "projects": (ResumeProjectsSection, "all projects"),
+}
 
 
-def web_research_node(state: Dict[str, Any]) -> Dict[str, Any]:
+def parse_resume_sections(sections: Dict[str, str], candidate_name: str, urls: List[str],
+                          config: Optional[RunnableConfig] = None) -> tuple:
     """
-    Perform improved web research with better content extraction and processing.
+    Extract a long resume with one small structured-output call per section
+    chunk, run in parallel, and merge the parts into one validated Resume.
+    Returns (resume_structured, degraded_steps, stats, llm usage).
     """
-    candidate_name = state["candidate_name"]
-    resume_structured = state["resume_structured"]
-    extracted_urls = state.get("extracted_urls", [])
+    tasks = []
+    for name, text in sections.items():
+        for chunk in chunk_lines(text, settings.RESUME_CHUNK_MAX_TOKENS):
+            tasks.append((name, chunk))
+            if name == "personal":
+                # Only the top of the resume holds contact details
+                break
+
+    def extract(task):
+        name, chunk = task
+        schema, fields = RESUME_SECTION_SCHEMAS[name]
+        llm = create_llm(timeout=llm_timeout(config))
+        messages = parse_resume_section_messages(fields, chunk, candidate_name, urls if name == "projects" else [])
+        try:
+            parsed, usage = invoke_structured(llm, schema, messages, config)
+            return parsed.model_dump(), usage
+        except Exception as e:
+            print(f"Error parsing resume section '{name}': {str(e)}")
+            if time_left(config) is not None and not is_timeout(e):
+                raise
+            return None, {}
+
+    with ThreadPoolExecutor(max_workers=min(len(tasks), settings.RESUME_SECTION_WORKERS)) as executor:
+        outputs = list(executor.map(extract, tasks))
+    results = [result for result, _ in outputs]
+
+    parts = {"experience": [], "education": [], "skills": [], "certifications": [], "projects": []}
+    personal = None
+    failed = []
+    for (name, _), result in zip(tasks, results):
+        if result is None:
+            failed.append(name)
+        elif name == "personal":
+            personal = result["personal"]
+        else:
+            for key, values in result.items():
+                parts[key].extend(values or [])
+
+    if personal is None:
+        personal = {"name": candidate_name or "Unknown", "email": None, "phone": None}
+    education_keys = set()
+    education = []
+    for entry in parts["education"]:
+        key = ((entry.get("degree") or "").lower(), (entry.get("institution") or "").lower())
+        if key not in education_keys:
+            education_keys.add(key)
+            education.append(entry)
+
+    resume_structured = Resume(
+        personal=personal,
+        education=education,
+        experience=merge_experience(parts["experience"]),
+        skills=unique(parts["skills"]),
+        certifications=unique(parts["certifications"]) or None,
+        projects=unique(parts["projects"]) or None,
+    ).model_dump()
+    print(f"✅ Resume Parsed ({len(tasks)} section calls)")
+
+    degraded_steps = []
+    if failed and time_left(config) is not None:
+        degraded_steps.append("parse_resume")
+    stats = {
+        "mode": "sections",
+        "calls": len(tasks),
+        "tokens": {name: count_tokens(text) for name, text in sections.items()},
+        "failed": sorted(set(failed)),
+    }
+    return resume_structured, degraded_steps, stats, add_usage(*(usage for _, usage in outputs))
+
+
+def use_combined_parse(state: Dict[str, Any]) -> bool:
+    """Whether the JD and resume are short enough to extract in one LLM call"""
+    if not settings.COMBINED_PARSE_ENABLED:
+        return False
+    tokens = count_tokens(state["resume_text"]) + count_tokens(state["job_description"])
+    return tokens <= settings.COMBINED_PARSE_MAX_TOKENS
+
+
+def parse_combined_node(state: Dict[str, Any], config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+    """
+    Extract the structured JD and resume in a single structured-output call.
+    Used for short inputs instead of parse_jd_node + parse_resume_node; falls
+    back to those two nodes if the combined call fails.
+    """
+    jd_text = state["job_description"]
+    resume_text = state["resume_text"]
+    candidate_name = state.get("candidate_name", "")
+    urls = extract_links_from_text(resume_text)
 
-    # Initialize search tool
-    search_tool = TavilySearch(
-        tavily_api_key=settings.TAVILY_SEARCH_API_KEY,
-        max_results=3,
-        topic="general",
-    )
+    llm = create_llm(timeout=llm_timeout(config))
+    messages = parse_combined_messages(jd_text, resume_text, candidate_name, urls)
 
-    # Create context for collecting information
-    search_context = []
-    search_results = []
+    tokens = count_tokens(jd_text) + count_tokens(resume_text)
+    try:
+        combined, usage = invoke_structured(llm, CombinedExtraction, messages, config)
+        combined = combined.model_dump()
+        print("✅ Job Description and Resume Parsed (single call)")
+    except Exception as e:
+        print(f"Error in combined parsing, falling back to separate calls: {str(e)}")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            jd_future = executor.submit(parse_jd_node, state, config)
+            resume_future = executor.submit(parse_resume_node, state, config)
+            jd_update, resume_update = jd_future.result(), resume_future.result()
+        return {
+            **jd_update,
+            **resume_update,
+            "degraded_steps": jd_update["degraded_steps"] + resume_update["degraded_steps"],
+            "metrics": {
+                "parse": {"mode": "combined_fallback", "tokens": tokens},
+                "resume_parse": resume_update["metrics"]["resume_parse"],
+                "llm_usage": {**jd_update["metrics"]["llm_usage"], **resume_update["metrics"]["llm_usage"]},
+            },
+        }
+
+    resume_structured = combined["resume"]
+    if not candidate_name and resume_structured.get("personal", {}).get("name"):
+        candidate_name = resume_structured["personal"]["name"]
+    return {
+        "jd_structured": combined["job_description"],
+        "resume_structured": resume_structured,
+        "candidate_name": candidate_name,
+        "degraded_steps": [],
+        "metrics": {"parse": {"mode": "combined", "calls": 1, "tokens": tokens},
+                    "llm_usage": {"parse_combined": usage}},
+    }
+
+
+def web_prefetch_node(state: Dict[str, Any], config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+    """
+    Speculatively start web research from the raw resume text while the parsers run:
+    fetch the URLs found in the resume and run the username-based searches. Results are
+    scored and merged by web_research_node once the parsed resume is available.
+    Nothing is fetched when the candidate's research is cached under their username.
+    """
+    resume_text = state["resume_text"]
+    budget = ResearchBudget(config, settings.FIT_SCORE_RESERVED_MS + settings.WEB_STRUCTURING_RESERVED_MS)
+
+    extracted_urls = extract_links_from_text(resume_text)
 
     # Extract usernames from URLs
     usernames = {}
@@ -139,145 +368,288 @@ def web_research_node(state: Dict[str, Any]) -> Dict[str, Any]:
         username, platform = extract_username_from_url(url)
         if username:
             usernames[platform] = username
-            search_context.append(
-                f"{platform.capitalize()} username: {username}")
 
-    # 1. Process URLs directly found in resume first
-    web_contents = []
-    for url in extracted_urls:
+    # Web research is reused from a near-duplicate run, nothing to prefetch
+    if (state.get("reuse") or {}).get("web_structured"):
+        return {"extracted_urls": extracted_urls, "usernames": usernames,
+                "prefetched": {"web_contents": [], "search_results": {}}, "degraded_steps": []}
+
+    research_key = candidate_identity_key(state.get("candidate_name", ""), usernames)
+    cached_research = load_research(research_key) if cache_enabled(config) else None
+    if cached_research:
+        print(f"♻️ Web research for {research_key} found in cache, skipping prefetch")
+        return {
+            "extracted_urls": extracted_urls,
+            "usernames": usernames,
+            "prefetched": {"web_contents": [], "search_results": {}, "research_cache": cached_research},
+            "degraded_steps": [],
+        }
+
+    search_tool = create_search_tool()
+
+    def fetch(url: str) -> Optional[Dict[str, Any]]:
+        if budget.out_of_time("web_research.direct_urls"):
+            return None
         print(f"Fetching content from: {url}")
-        content_data = get_url_content(url)
-        if content_data:
-            web_contents.append(content_data)
-
-            # Log successful extraction
-            search_context.append(f"Extracted content from {url}")
-            search_results.append({
-                'title': content_data['title'],
-                'url': url,
-                # Truncate for logging
-                'content': content_data['content'][:300],
-                'relevance': 10,  # High relevance since it's from resume
-                'source': 'direct_url'
-            })
-
-    # 2. Create optimized search queries
-    search_queries = generate_search_queries(state)
-
-    # 3. Perform searches with the generated queries
-    for query in search_queries:
+        return get_url_content(url, timeout=budget.fetch_timeout())
+
+    def search(query: str) -> List[Dict[str, Any]]:
+        if budget.out_of_time("web_research.search"):
+            return []
         try:
             print(f"Searching: {query}")
-            results = search_tool.invoke({"query": query})
-
-            # Extract results from response
-            if isinstance(results, dict) and 'results' in results:
-                results = results.get('results', [])
-
-            if results:
-                # Add query context
-                search_context.append(f"\nSEARCH RESULTS FOR: '{query}'")
-
-                # Process each result
-                for result in results:
-                    # Skip if we already have this URL
-                    if any(r['url'] == result.get('url') for r in search_results):
-                        continue
-
-                    # Process the result with improved relevance calculation
-                    relevance = calculate_result_relevance(
-                        result, candidate_name, resume_structured, usernames)
-
-                    if relevance >= 3:  # Only include reasonably relevant results
-                        search_results.append({
-                            'title': result.get('title', ''),
-                            'url': result.get('url', ''),
-                            # Truncate for context
-                            'content': result.get('content', '')[:300],
-                            'relevance': relevance,
-                            'source': 'search'
-                        })
-            else:
-                search_context.append(f"No results found for: {query}")
+            return run_search(search_tool, query)
+        except Exception as e:
+            print(f"Error performing search for '{query}': {str(e)}")
+            return []
+
+    queries = identity_search_queries(usernames)
+    with ThreadPoolExecutor(max_workers=settings.WEB_PREFETCH_WORKERS) as executor:
+        fetches = [executor.submit(fetch, url) for url in extracted_urls]
+        searches = {query: executor.submit(search, query) for query in queries}
+        web_contents = [content for content in (f.result() for f in fetches) if content]
+        search_results = {query: future.result() for query, future in searches.items()}
+
+    print(f"✅ Web Prefetch Completed ({len(web_contents)} pages, {len(search_results)} searches)")
+    return {
+        "extracted_urls": extracted_urls,
+        "usernames": usernames,
+        "prefetched": {"web_contents": web_contents, "search_results": search_results},
+        "degraded_steps": budget.degraded_steps,
+    }
+
+
+# web_structured of a run whose web research failed
+NO_WEB_RESEARCH = {
+    "github_repos": ["No verified repositories found"],
+    "blogs": ["No verified blog posts found"],
+    "conference_talks": ["No verified conference talks found"],
+    "social_mentions": ["No verified social mentions found"]
+}
+
+
+def research_complete(web_structured: Optional[Dict[str, Any]], degraded_steps: Optional[List[str]]) -> bool:
+    """Whether a run's web research finished, i.e. is worth reusing for another run"""
+    if not web_structured or web_structured == NO_WEB_RESEARCH:
+        return False
+    return not any(step.startswith("web_research") for step in degraded_steps or [])
+
+
+def web_research_node(state: Dict[str, Any], config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+    """
+    Perform improved web research with better content extraction and processing.
+    Builds on the speculative prefetch results when the graph ran web_prefetch_node.
+    The research depends only on the candidate, so it is cached under their identity
+    (see candidate_identity_key) and reused for every role they are screened for.
+    """
+    candidate_name = state["candidate_name"]
+    resume_structured = state["resume_structured"]
 
+    reuse = state.get("reuse") or {}
+    if reuse.get("web_structured"):
+        print(f"♻️ Web Research reused from near-duplicate run {reuse['agent_run_id']}")
+        return {"web_structured": reuse["web_structured"], "degraded_steps": [],
+                "metrics": {"llm_usage": {"web_research": {}}}}
+
+    # Searches and fetches must leave time for structuring the findings and for fit scoring
+    budget = ResearchBudget(config, settings.FIT_SCORE_RESERVED_MS + settings.WEB_STRUCTURING_RESERVED_MS)
+
+    # Called outside the graph (e.g. role matching), so run the prefetch inline
+    if state.get("prefetched") is None:
+        prefetch = web_prefetch_node(state, config)
+        budget.degraded_steps.extend(prefetch.pop("degraded_steps"))
+        state = {**state, **prefetch}
+
+    usernames = state.get("usernames") or {}
+    prefetched = state["prefetched"]
+
+    research_key = candidate_identity_key(candidate_name, usernames, resume_structured)
+    use_research_cache = cache_enabled(config)
+    cached_research = prefetched.get("research_cache") or (
+        load_research(research_key) if use_research_cache else None)
+    if cached_research:
+        age_seconds = round(time.time() - cached_research["researched_at"])
+        print(f"✅ Web Research reused from cache ({research_key}, {age_seconds}s old)")
+        return {"web_structured": cached_research["web_structured"], "degraded_steps": budget.degraded_steps,
+                "metrics": {"research_cache": {"hit": True, "key": research_key, "age_seconds": age_seconds},
+                            "llm_usage": {"web_research": {}}}}
+
+    # Initialize search tool
+    search_tool = create_search_tool()
+
+    # Create context for collecting information
+    search_context = [f"{platform.capitalize()} username: {username}" for platform, username in usernames.items()]
+    search_results = []
+    seen_urls = set()
+
+    # Matchers for scoring search results, built once for the whole run
+    profile = CandidateProfile(candidate_name, resume_structured, usernames)
+
+    # 1. Process URLs directly found in resume first
+    web_contents = []
+    for content_data in prefetched["web_contents"]:
+        web_contents.append(content_data)
+        seen_urls.add(canonical_url(content_data['url']))
+
+        # Log successful extraction
+        search_context.append(f"Extracted content from {content_data['url']}")
+        search_results.append({
+            'title': content_data['title'],
+            'url': content_data['url'],
+            # Truncate for logging
+            'content': content_data['content'][:300],
+            'relevance': 10,  # High relevance since it's from resume
+            'source': 'direct_url'
+        })
+
+    def collect_results(query: str, results: List[Dict[str, Any]]) -> None:
+        if not results:
+            search_context.append(f"No results found for: {query}")
+            return
+
+        # Add query context
+        search_context.append(f"\nSEARCH RESULTS FOR: '{query}'")
+
+        # Skip URLs we already have
+        new_results = []
+        for result in results:
+            url = canonical_url(result.get('url', ''))
+            if url not in seen_urls:
+                seen_urls.add(url)
+                new_results.append(result)
+
+        for result, relevance in zip(new_results, profile.score_batch(new_results)):
+            if relevance >= 3:  # Only include reasonably relevant results
+                search_results.append({
+                    'title': result.get('title', ''),
+                    'url': result.get('url', ''),
+                    # Truncate for context
+                    'content': result.get('content', '')[:300],
+                    'relevance': relevance,
+                    'source': 'search'
+                })
+
+    # 2. Score the speculative username searches now that the resume is parsed
+    for query, results in prefetched["search_results"].items():
+        collect_results(query, results)
+
+    def search(query: str) -> List[Dict[str, Any]]:
+        try:
+            print(f"Searching: {query}")
+            return run_search(search_tool, query)
         except Exception as e:
             print(f"Error performing search for '{query}': {str(e)}")
+            return []
+
+    def enough_hits() -> bool:
+        hits = sum(1 for r in search_results
+                   if r['source'] == 'search' and r['relevance'] >= settings.SEARCH_HIGH_RELEVANCE)
+        return hits >= settings.SEARCH_EARLY_STOP_HITS
+
+    def run_waves(queries: List[str]) -> int:
+        """Run queries in concurrent waves until enough high-relevance results are in"""
+        issued = 0
+        for start in range(0, len(queries), settings.SEARCH_WAVE_SIZE):
+            if enough_hits() or budget.out_of_time("web_research.search"):
+                break
+            wave = queries[start:start + settings.SEARCH_WAVE_SIZE]
+            with ThreadPoolExecutor(max_workers=len(wave)) as executor:
+                wave_results = list(executor.map(search, wave))
+            for query, results in zip(wave, wave_results):
+                collect_results(query, results)
+            issued += len(wave)
+        return issued
+
+    # 3. Plan search queries by expected yield, skipping those already run speculatively
+    planned_queries = [query for query, _ in plan_search_queries(state)]
+    pending_queries = [query for query in planned_queries if query not in prefetched["search_results"]]
+    issued = len(prefetched["search_results"]) + run_waves(pending_queries)
+
+    # 4. Only ask the LLM for more queries when the resume gives weak identity signals
+    llm_queries = []
+    if not enough_hits() and identity_signals_weak(state) \
+            and not budget.out_of_time("web_research.llm_queries"):
+        llm_queries = [query for query in generate_llm_search_queries(state, config=config)
+                       if query not in planned_queries]
+        llm_queries = llm_queries[:max(settings.SEARCH_MAX_QUERIES - len(planned_queries), 0)]
+        issued += run_waves(llm_queries)
+
+    planned = len(set(planned_queries) | set(prefetched["search_results"])) + len(llm_queries)
+    search_metrics = {
+        "planned": planned,
+        "issued": issued,
+        "saved": planned - issued,
+        "early_stopped": enough_hits(),
+        "llm_queries_generated": bool(llm_queries),
+    }
+    print(f"🔎 Search plan: {issued}/{planned} queries issued")
 
     # Sort results by relevance
     search_results.sort(key=lambda x: x['relevance'], reverse=True)
 
-    # 4. Fetch content for high-relevance search results we don't already have
+    # 5. Fetch content for high-relevance search results we don't already have
     for result in search_results[:5]:  # Process top 5 results
         if result['source'] == 'search':  # Only process search results, not direct URLs
-            content_data = get_url_content(result['url'])
+            if budget.out_of_time("web_research.page_fetch"):
+                break
+            content_data = get_url_content(result['url'], timeout=budget.fetch_timeout())
             if content_data:
                 web_contents.append(content_data)
                 # Update with full content
                 result['content'] = content_data['content']
 
-    # 5. Structure the web research findings using LLM
-    web_llm = create_llm().with_structured_output(WebResearch)
-
-    # Prepare context for LLM
-    web_content_summary = []
-    # Limit to top 5 to avoid context length issues
-    for content in web_contents[:5]:
-        summary = f"URL: {content['url']}\nTitle: {content['title']}\n"
-        # Limit content length
-        summary += f"Content: {content['content'][:1500]}...\n\n"
-        web_content_summary.append(summary)
-
-    messages = [
-        (
-            "system",
-            f"""
-            Analyze these web findings about candidate {candidate_name} and extract verified information.
-            
-            VERIFICATION RULES:
-            1. Only include information that clearly belongs to THIS specific candidate
-            2. Look for multiple signals confirming identity (name + company, name + education, etc.)
-            3. If uncertain about information, DO NOT include it
-            4. When results are ambiguous or could belong to another person with the same name, exclude them
-            
-            Based on the web research results provided, extract:
-            1. GitHub repositories (list only repositories that are definitely by this candidate)
-            2. Blog posts written by the candidate (only if clearly authored by them)
-            3. Conference talks or presentations given by this specific candidate
-            4. Social media or professional mentions (only those relevant to this candidate)
-            
-            CANDIDATE INFORMATION FOR VERIFICATION:
-            Name: {candidate_name}
-            Education: {', '.join([edu.get('institution', '') for edu in resume_structured.get('education', [])])}
-            Companies: {', '.join([exp.get('company', '') for exp in resume_structured.get('experience', [])])}
-            
-            WEB RESEARCH CONTENT:
-            {chr(10).join(web_content_summary)}
-            
-            IMPORTANT: Quality over quantity. It's better to return fewer highly-confident results than many uncertain ones.
-            If you cannot find verified information for a category, state "No verified information found" instead of making assumptions.
-            """
-        )
-    ]
+    # 6. Structure the web research findings using LLM
+    llm = create_llm(timeout=llm_timeout(config))
+    usage = {}
+
+    # Prepare context for LLM: the passages that best identify the candidate, within a token budget
+    web_content_summary, context_metrics = select_passages(
+        web_contents,
+        candidate_query(candidate_name, resume_structured, usernames),
+        token_budget=settings.WEB_CONTEXT_TOKEN_BUDGET,
+        passage_chars=settings.WEB_PASSAGE_CHARS,
+    )
+
+    messages = web_research_messages(
+        candidate_name,
+        [edu.get('institution', '') for edu in resume_structured.get('education', [])],
+        [exp.get('company', '') for exp in resume_structured.get('experience', [])],
+        web_content_summary,
+    )
 
     try:
-        web_structured = web_llm.invoke(messages)
+        # Structure whatever was gathered, unless that would eat into fit scoring's reserved time
+        remaining = time_left(config, settings.FIT_SCORE_RESERVED_MS)
+        if remaining is not None and remaining * 1000 < settings.MIN_LLM_TIMEOUT_MS:
+            budget.degraded_steps.append("web_research.structuring")
+            raise TimeoutError("Latency budget exhausted before structuring web research")
+        web_structured, usage = invoke_structured(llm, WebResearch, messages, config)
         web_structured = web_structured.model_dump()
         print("✅ Web Research Completed")
+        # Only complete research is worth sharing with the candidate's other runs
+        stored = use_research_cache and not budget.degraded_steps
     except Exception as e:
         print(f"Error in web research analysis: {str(e)}")
+        stored = False
         # Fallback structure
-        web_structured = {
-            "github_repos": ["No verified repositories found"],
-            "blogs": ["No verified blog posts found"],
-            "conference_talks": ["No verified conference talks found"],
-            "social_mentions": ["No verified social mentions found"]
-        }
+        web_structured = dict(NO_WEB_RESEARCH)
+
+    if stored:
+        store_research(research_key, {
+            "web_structured": web_structured,
+            "search_results": search_results,
+            "web_contents": web_contents,
+            "search": search_metrics,
+        })
 
     # Add usernames to state for other nodes
-    return {**state, "web_structured": web_structured, "usernames": usernames}
+    return {"web_structured": web_structured, "degraded_steps": budget.degraded_steps,
+            "metrics": {"search": search_metrics, "web_context": context_metrics,
+                        "research_cache": {"hit": False, "key": research_key, "stored": bool(stored)},
+                        "llm_usage": {"web_research": usage}}}
 
 
-def fit_score_node(state: Dict[str, Any]) -> Dict[str, Any]:
+def fit_score_node(state: Dict[str, Any], config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
     """
     Compare JD, resume, and web research to produce a fit score and reasoning.
     Uses a more balanced approach that considers potential and transferable skills.
@@ -287,106 +659,59 @@ def fit_score_node(state: Dict[str, Any]) -> Dict[str, Any]:
     web_structured = state["web_structured"]
 
     # Create LLM and set up structured output
-    fit_llm = create_llm().with_structured_output(FitAssessment)
-
-    # Get candidate skills from resume
-    candidate_skills = resume_structured.get('skills', [])
-
-    # Get required skills from JD
-    jd_skills = jd_structured.get('top_skills', [])
-
-    # Extract projects from resume if available
-    projects = resume_structured.get('projects', [])
-
-    # Format experience for better assessment
-    experience_formatted = []
-    for exp in resume_structured.get('experience', []):
-        exp_entry = f"{exp.get('title')} at {exp.get('company')}"
-        if exp.get('start_date') and exp.get('end_date'):
-            exp_entry += f" ({exp.get('start_date')} to {exp.get('end_date')})"
-        elif exp.get('start_date'):
-            exp_entry += f" (from {exp.get('start_date')} to Present)"
-
-        if exp.get('description'):
-            exp_entry += f": {exp.get('description')}"
-
-        experience_formatted.append(exp_entry)
-
-    # Check for GitHub repositories that might indicate relevant skills
-    github_repos = web_structured.get("github_repos", [])
-    has_github_projects = any(
-        repo != "No verified repositories found" for repo in github_repos)
-
-    messages = [
-        (
-            "system",
-            f"""
-            Evaluate this candidate against the job requirements with a focus on potential and transferable skills:
-            
-            JOB DESCRIPTION:
-            Title: {jd_structured.get("title")}
-            Location: {jd_structured.get("location") if jd_structured.get("location") else 'Not specified'}
-            
-            Required Qualifications:
-            {chr(10).join(f"- {qual}" for qual in jd_structured.get("required_qualifications", []))}
-            
-            Preferred Qualifications:
-            {chr(10).join(f"- {qual}" for qual in jd_structured.get("preferred_qualifications")) if jd_structured.get("preferred_qualifications") else 'None specified'}
-            
-            Top Skills Required:
-            {chr(10).join(f"- {skill}" for skill in jd_structured.get("top_skills"))}
-            
-            CANDIDATE RESUME:
-            Name: {resume_structured.get("personal").get("name") if resume_structured.get("personal") else 'Not specified'}
-            
-            Education:
-            {chr(10).join(f"- {edu.get("degree")} from {edu.get("institution")} ({edu.get("start_year")}-{edu.get("end_year") if edu.get("end_year") else 'Present'})" for edu in resume_structured.get("education")) if resume_structured.get("education") else 'Not specified'}
-            
-            Experience:
-            {chr(10).join(f"- {exp.get("title")} at {exp.get("company")} ({exp.get("start_date")}-{exp.get("end_date") if exp.get("end_date") else 'Present'})" for exp in resume_structured.get("experience")) if resume_structured.get("experience") else 'Not specified'}
-            
-            Total Experience: {resume_structured.get("personal").get("work_experience") if resume_structured.get("personal") else 'Not specified'} years
-            
-            Skills:
-            {chr(10).join(f"- {skill}" for skill in resume_structured.get("skills")) if resume_structured.get("skills") else 'Not specified'}
-            
-            Projects:
-            {chr(10).join(f"- {project}" for project in projects) if projects else 'None specified in resume'}
-            
-            WEB RESEARCH FINDINGS:
-            GitHub: {chr(10).join(f"- {repo}" for repo in web_structured.get("github_repos")) if web_structured.get("github_repos") else 'None found'}
-            
-            Blogs: {chr(10).join(f"- {blog}" for blog in web_structured.get("blogs")) if web_structured.get("blogs") else 'None found'}
-            
-            Conference Talks: {chr(10).join(f"- {talk}" for talk in web_structured.get("conference_talks")) if web_structured.get("conference_talks") else 'None found'}
-            
-            Social/Professional Mentions: {chr(10).join(f"- {mention}" for mention in web_structured.get("social_mentions")) if web_structured.get("social_mentions") else 'None found'}
-            
-            ASSESSMENT GUIDELINES:
-            1. Create a detailed comparison matrix showing each required skill and whether the candidate has it
-            2. Calculate:
-               - Skill match percentage (% of required skills candidate has)
-               - Approximate experience years in relevant roles
-               - Domain signal strength based on web findings (High/Medium/Low)
-            3. Determine overall fit: "Strong Fit", "Moderate Fit", or "Not a Fit"
-            4. Provide clear reasoning for your assessment
-            
-            IMPORTANT EVALUATION CONSIDERATIONS:
-            - Look for transferable skills that could apply to the job requirements
-            - Consider project work and GitHub repositories as evidence of practical skills
-            - Value potential and ability to learn, especially for junior to mid-level positions
-            - Recognize that candidates may have relevant experience even if job titles don't exactly match
-            - Consider education and certifications as indicators of knowledge in required areas
-            - Be generous in skill assessment - if the candidate shows adjacent skills, count them as partial matches
-            - For technical roles, give significant weight to demonstrated coding abilities in projects
-            - Consider quality of work over quantity of experience
-            
-            Be balanced and fair in your assessment, considering both current skills and growth potential.
-            """
-        )
+    # Fit scoring always gets at least its reserved time, even if earlier steps overran
+    llm = create_llm(timeout=llm_timeout(config, reserve_ms=0, floor_ms=settings.FIT_SCORE_RESERVED_MS))
+
+    personal = resume_structured.get("personal") or {}
+
+    # Prompt sections, most important first; lower-priority ones are compacted if the prompt is over budget
+    sections = [
+        PromptSection("required_qualifications", "Required Qualifications",
+                      jd_structured.get("required_qualifications"), priority=0),
+        PromptSection("preferred_qualifications", "Preferred Qualifications",
+                      jd_structured.get("preferred_qualifications"), priority=2, empty_text="None specified"),
+        PromptSection("top_skills", "Top Skills Required", jd_structured.get("top_skills"), priority=0),
+        PromptSection("education", "Education", [
+            f"{edu.get('degree')} from {edu.get('institution')} "
+            f"({edu.get('start_year')}-{edu.get('end_year') or 'Present'})"
+            for edu in resume_structured.get("education") or []], priority=2),
+        PromptSection("experience", "Experience", [
+            f"{exp.get('title')} at {exp.get('company')} ({exp.get('start_date')}-{exp.get('end_date') or 'Present'})"
+            for exp in resume_structured.get("experience") or []], priority=1),
+        PromptSection("skills", "Skills", resume_structured.get("skills"), priority=1),
+        PromptSection("projects", "Projects", resume_structured.get("projects"), priority=3, empty_text="None specified in resume"),
+        PromptSection("github_repos", "GitHub", web_structured.get("github_repos"), priority=4,
+                      empty_text="None found"),
+        PromptSection("blogs", "Blogs", web_structured.get("blogs"), priority=4, empty_text="None found"),
+        PromptSection("conference_talks", "Conference Talks", web_structured.get("conference_talks"), priority=4,
+                      empty_text="None found"),
+        PromptSection("social_mentions", "Social/Professional Mentions", web_structured.get("social_mentions"),
+                      priority=5, empty_text="None found"),
     ]
-    
-    fit_assessment = fit_llm.invoke(messages)
+
+    job_header = f"""JOB DESCRIPTION:
+Title: {jd_structured.get("title")}
+Location: {jd_structured.get("location") or 'Not specified'}"""
+    candidate_header = f"""CANDIDATE RESUME:
+Name: {personal.get("name") or 'Not specified'}
+Total Experience: {personal.get("work_experience") or 'Not specified'} years"""
+
+    fixed_text = "\n\n".join([FIT_SCORE_SYSTEM, job_header, candidate_header, "WEB RESEARCH FINDINGS:"])
+    prompt_stats = PromptBudget(settings.FIT_PROMPT_TOKEN_BUDGET, settings.FIT_PROMPT_MAX_ITEM_CHARS).fit(
+        sections, fixed_text)
+    if prompt_stats["compacted"]:
+        print(f"✂️ Fit prompt compacted to {prompt_stats['total']} tokens: {', '.join(prompt_stats['compacted'])}")
+
+    messages = fit_score_messages("\n\n".join([
+        job_header,
+        render_sections(sections[:3]),
+        candidate_header,
+        render_sections(sections[3:7]),
+        "WEB RESEARCH FINDINGS:",
+        render_sections(sections[7:]),
+    ]))
+
+    fit_assessment, usage = invoke_structured(llm, FitAssessment, messages, config)
     fit_assessment = fit_assessment.model_dump()
     print("✅ Fit Assessment Completed:")
     print(json.dumps(fit_assessment, indent=2))
@@ -396,4 +721,5 @@ def fit_score_node(state: Dict[str, Any]) -> Dict[str, Any]:
     print(f"✅ Generated formatted markdown assessment")
     
     # Return both the structured assessment and the formatted markdown
-    return {**state, "fit_assessment": fit_assessment, "formatted_output": formatted_output}
+    return {"fit_assessment": fit_assessment, "formatted_output": formatted_output,
+            "metrics": {"prompt_tokens": {"fit_score": prompt_stats}, "llm_usage": {"fit_score": usage}}}
@@ -0,0 +1,147 @@
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+from recruiter_agent.utils import count_tokens, extract_links_from_text
+
+# Page separator written by extract_text_from_pdf
+PAGE_BREAK = "\f"
+
+# How many lines at the top and bottom of a page can be running headers/footers
+EDGE_LINES = 3
+
+PAGE_NUMBER_PATTERN = re.compile(r"^[-–—\s]*(page\s*)?\d{1,3}(\s*(of|/)\s*\d{1,3})?[-–—\s]*$", re.IGNORECASE)
+LINKS_LINE_PATTERN = re.compile(r"^\s*Links:\s*(.*)$")
+INLINE_SPACE_PATTERN = re.compile(r"[ \t\u00a0\u2000-\u200a\u202f\u205f\u3000]+")
+BULLET_PATTERN = re.compile(r"^[\u2022\u25cf\u25aa\u25e6\u25a0\u25a1\u27a2\u27a4\u25ba\u25b6\u2713\u2714\u2756\u25c6\u25cb\u2219\u00b7]\s*")
+
+# Unicode categories that never carry content: controls, format chars (zero-width etc.),
+# private use (icon fonts) and unpaired surrogates
+DROP_CATEGORIES = {"Cc", "Cf", "Co", "Cs"}
+
+
+def strip_glyphs(text: str) -> Tuple[str, int]:
+    """Remove control, zero-width, private-use and replacement characters; returns (text, removed)"""
+    kept = [ch for ch in text
+            if ch in "\n\f\t" or (ch != "\ufffd" and unicodedata.category(ch) not in DROP_CATEGORIES)]
+    return "".join(kept), len(text) - len(kept)
+
+
+def edge_key(line: str) -> str:
+    """Line identity for header/footer detection"""
+    return INLINE_SPACE_PATTERN.sub(" ", line).strip().lower()
+
+
+def remove_page_boilerplate(pages: List[List[str]]) -> Tuple[List[List[str]], int]:
+    """
+    Drop page numbers and lines repeated at the top or bottom of most pages
+    (running headers and footers) after their first appearance. Returns the
+    cleaned pages and the number of lines removed.
+    """
+    def edge_indexes(lines: List[str]) -> List[int]:
+        filled = [i for i, line in enumerate(lines) if line.strip()]
+        return sorted(set(filled[:EDGE_LINES] + filled[-EDGE_LINES:]))
+
+    repeated = set()
+    if len(pages) >= 2:
+        counts = Counter()
+        for lines in pages:
+            counts.update({edge_key(lines[i]) for i in edge_indexes(lines)})
+        min_pages = max(2, math.ceil(0.6 * len(pages)))
+        repeated = {key for key, count in counts.items() if count >= min_pages}
+
+    # The first occurrence of a repeated line is kept, it is often the candidate's name and contact line
+    seen = set()
+    removed = 0
+    cleaned = []
+    for lines in pages:
+        drop = set()
+        for i in edge_indexes(lines):
+            key = edge_key(lines[i])
+            if PAGE_NUMBER_PATTERN.match(lines[i]) or key in seen:
+                drop.add(i)
+            elif key in repeated:
+                seen.add(key)
+        removed += len(drop)
+        cleaned.append([line for i, line in enumerate(lines) if i not in drop])
+    return cleaned, removed
+
+
+def url_key(url: str) -> str:
+    """URL identity for deduplication: no scheme, www., trailing slash or trailing punctuation"""
+    url = url.strip().rstrip(".,;)").lower()
+    url = re.sub(r"^(https?://)?(www\.)?", "", url)
+    return url.rstrip("/")
+
+
+def dedupe_links(lines: List[str]) -> Tuple[List[str], int]:
+    """
+    Rewrite the 'Links:' block appended by the PDF extractor so it only lists
+    URLs that are not already in the text, each once. A URL only counts as
+    present if extract_links_from_text would find it there, so link extraction
+    downstream sees the same set. Returns (lines, links removed).
+    """
+    body_urls = set()
+    links_index = None
+    for i, line in enumerate(lines):
+        if LINKS_LINE_PATTERN.match(line):
+            links_index = i
+        else:
+            body_urls.update(url_key(url) for url in extract_links_from_text(line))
+    if links_index is None:
+        return lines, 0
+
+    links = [link.strip() for link in LINKS_LINE_PATTERN.match(lines[links_index]).group(1).split(",")]
+    links = [link for link in links if link]
+    kept, seen = [], set(body_urls)
+    for link in links:
+        key = url_key(link)
+        if key not in seen:
+            seen.add(key)
+            kept.append(link)
+
+    lines = list(lines)
+    if kept:
+        lines[links_index] = "Links: " + " , ".join(kept)
+    else:
+        del lines[links_index]
+    return lines, len(links) - len(kept)
+
+
+def normalize_text(text: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Clean extracted document text before it is sent to a parser: strip
+    non-content glyphs, drop repeated page headers/footers and page numbers,
+    dedupe the links block and collapse whitespace. Returns the text and
+    stats including the number of tokens removed.
+    """
+    if not text:
+        return text or "", {"tokens_before": 0, "tokens_after": 0, "tokens_removed": 0}
+
+    cleaned, glyphs_removed = strip_glyphs(text.replace("\r\n", "\n").replace("\r", "\n"))
+
+    pages = [page.split("\n") for page in cleaned.split(PAGE_BREAK)]
+    pages, boilerplate_lines = remove_page_boilerplate(pages)
+
+    lines = []
+    for page in pages:
+        for line in page:
+            line = BULLET_PATTERN.sub("- ", INLINE_SPACE_PATTERN.sub(" ", line).strip())
+            # Keep at most one blank line in a row
+            if line or (lines and lines[-1]):
+                lines.append(line)
+    lines, links_removed = dedupe_links(lines)
+    normalized = "\n".join(lines).strip()
+
+    tokens_before = count_tokens(text)
+    tokens_after = count_tokens(normalized)
+    return normalized, {
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_removed": tokens_before - tokens_after,
+        "boilerplate_lines": boilerplate_lines,
+        "links_deduped": links_removed,
+        "glyphs_removed": glyphs_removed,
+    }
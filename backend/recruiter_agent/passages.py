@@ -0,0 +1,132 @@
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+from recruiter_agent.utils import count_tokens
+
+TERM_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#._-]*[a-z0-9+#]|[a-z0-9]")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# BM25 parameters (the usual defaults)
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def terms(text: str) -> List[str]:
+    """Lowercased terms for BM25 matching"""
+    return TERM_PATTERN.findall(text.lower())
+
+
+def split_passages(text: str, max_chars: int) -> List[str]:
+    """
+    Chunk page text into passages of up to max_chars, keeping lines together
+    where possible and splitting overlong lines at sentence boundaries.
+    """
+    pieces: List[str] = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if len(line) <= max_chars:
+            pieces.append(line)
+            continue
+        for sentence in SENTENCE_END.split(line):
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                pieces.append(sentence[:cut])
+                sentence = sentence[cut:].strip()
+            if sentence:
+                pieces.append(sentence)
+
+    passages: List[str] = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + 1 + len(piece) > max_chars:
+            passages.append(current)
+            current = piece
+        else:
+            current = f"{current}\n{piece}" if current else piece
+    if current:
+        passages.append(current)
+    return passages
+
+
+def bm25_scores(passages: List[List[str]], query: List[str]) -> List[float]:
+    """BM25 score of each tokenized passage for the query terms"""
+    if not passages:
+        return []
+    count = len(passages)
+    avg_length = sum(len(p) for p in passages) / count or 1.0
+    document_frequency = Counter(term for passage in passages for term in set(passage))
+    query_terms = set(query)
+    idf = {term: math.log(1 + (count - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+           for term in query_terms if document_frequency[term]}
+
+    scores = []
+    for passage in passages:
+        frequencies = Counter(term for term in passage if term in idf)
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * len(passage) / avg_length)
+        scores.append(sum(idf[term] * tf * (BM25_K1 + 1) / (tf + length_norm)
+                          for term, tf in frequencies.items()))
+    return scores
+
+
+def candidate_query(candidate_name: str, resume_structured: Dict[str, Any], usernames: Dict[str, str]) -> List[str]:
+    """Query terms identifying the candidate: name, usernames, companies, schools and skills"""
+    parts = [candidate_name, *usernames.values()]
+    parts += [exp.get('company') or '' for exp in resume_structured.get('experience') or []]
+    parts += [edu.get('institution') or '' for edu in resume_structured.get('education') or []]
+    parts += resume_structured.get('skills') or []
+    return terms(" ".join(parts))
+
+
+def select_passages(pages: List[Dict[str, Any]], query: List[str], token_budget: int,
+                    passage_chars: int) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    Rank the passages of all fetched pages with BM25 and pack the best ones
+    into token_budget. Each page's opening passage is kept as a candidate even
+    when it does not match, so the model can tell what the page is. Returns one
+    summary block per page (best page first, passages in page order) and
+    selection stats. Ties are broken by URL, not by the order pages were
+    fetched in, so the same pages always give the same context (and prompt).
+    """
+    passages: List[Tuple[int, int, str]] = []
+    for page_index, page in enumerate(pages):
+        for position, passage in enumerate(split_passages(page.get('content') or '', passage_chars)):
+            passages.append((page_index, position, passage))
+
+    scores = bm25_scores([terms(passage) for _, _, passage in passages], query)
+    ranked = sorted(
+        ((score, page_index, position, passage)
+         for (page_index, position, passage), score in zip(passages, scores) if score > 0 or position == 0),
+        key=lambda item: (-item[0], pages[item[1]]['url'], item[2]))
+
+    selected: Dict[int, List[Tuple[int, str]]] = {}
+    used_tokens = 0
+    for score, page_index, position, passage in ranked:
+        header_tokens = 0 if page_index in selected else count_tokens(
+            f"URL: {pages[page_index]['url']}\nTitle: {pages[page_index].get('title', '')}\n")
+        passage_tokens = count_tokens(passage)
+        if used_tokens + header_tokens + passage_tokens > token_budget:
+            continue
+        selected.setdefault(page_index, []).append((position, passage))
+        used_tokens += header_tokens + passage_tokens
+
+    summaries = []
+    best_score: Dict[int, float] = {}
+    for score, page_index, _, _ in ranked:
+        best_score.setdefault(page_index, score)
+    for page_index in sorted(selected, key=lambda index: (-best_score[index], pages[index]['url'])):
+        page = pages[page_index]
+        body = "\n...\n".join(passage for _, passage in sorted(selected[page_index]))
+        summaries.append(f"URL: {page['url']}\nTitle: {page.get('title', '')}\nContent:\n{body}\n\n")
+
+    stats = {
+        "pages": len(pages),
+        "passages_considered": len(passages),
+        "passages_selected": sum(len(page_passages) for page_passages in selected.values()),
+        "tokens": used_tokens,
+    }
+    return summaries, stats
@@ -0,0 +1,99 @@
+from typing import Any, Dict, List
+
+from recruiter_agent.utils import count_tokens
+
+
+def truncate_words(text: str, max_chars: int) -> str:
+    """Cut text at a word boundary to at most max_chars (plus an ellipsis)"""
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars)
+    return text[:cut if cut > 0 else max_chars].rstrip(" ,;:") + "..."
+
+
+class PromptSection:
+    """
+    A titled list of prompt lines. Lower priority numbers are more important
+    and are the last to be compacted.
+    """
+
+    def __init__(self, name: str, title: str, items: List[Any], priority: int,
+                 empty_text: str = "Not specified"):
+        self.name = name
+        self.title = title
+        self.items = [str(item) for item in items or [] if item]
+        self.priority = priority
+        self.empty_text = empty_text
+        self.omitted = 0
+
+    def render(self) -> str:
+        if not self.items and not self.omitted:
+            return f"{self.title}: {self.empty_text}"
+        lines = [f"- {item}" for item in self.items]
+        if self.omitted:
+            lines.append(f"- ... and {self.omitted} more not shown")
+        return f"{self.title}:\n" + "\n".join(lines)
+
+    def tokens(self) -> int:
+        return count_tokens(self.render())
+
+    def compact(self, max_tokens: int, max_item_chars: int) -> None:
+        """
+        Fit the section into max_tokens: long items are shortened first, then
+        the trailing items are dropped and replaced by a count. Items are kept
+        in their original order, so the result is deterministic.
+        """
+        self.items = [truncate_words(item, max_item_chars) for item in self.items]
+        if self.tokens() <= max_tokens:
+            return
+
+        total = len(self.items) + self.omitted
+        kept: List[str] = []
+        for item in self.items:
+            candidate = PromptSection(self.name, self.title, kept + [item], self.priority)
+            candidate.omitted = total - len(kept) - 1
+            if candidate.tokens() > max_tokens:
+                break
+            kept.append(item)
+        self.items = kept
+        self.omitted = total - len(kept)
+
+
+class PromptBudget:
+    """
+    Allocates a token budget across prompt sections by priority. The fixed
+    part of the prompt is always kept; when the sections do not fit in what
+    is left, the lowest-priority sections are compacted first.
+    """
+
+    def __init__(self, max_tokens: int, max_item_chars: int):
+        self.max_tokens = max_tokens
+        self.max_item_chars = max_item_chars
+
+    def fit(self, sections: List[PromptSection], fixed_text: str = "") -> Dict[str, Any]:
+        """Compact sections in place so that fixed_text plus sections fit the budget, returns token stats"""
+        fixed_tokens = count_tokens(fixed_text)
+        available = max(self.max_tokens - fixed_tokens, 0)
+        tokens = {section.name: section.tokens() for section in sections}
+        compacted: List[str] = []
+
+        for section in sorted(sections, key=lambda s: -s.priority):
+            used = sum(tokens.values())
+            if used <= available:
+                break
+            allowance = max(available - (used - tokens[section.name]), 0)
+            section.compact(allowance, self.max_item_chars)
+            tokens[section.name] = section.tokens()
+            compacted.append(section.name)
+
+        return {
+            "budget": self.max_tokens,
+            "fixed": fixed_tokens,
+            "sections": tokens,
+            "total": fixed_tokens + sum(tokens.values()),
+            "compacted": compacted,
+        }
+
+
+def render_sections(sections: List[PromptSection]) -> str:
+    return "\n\n".join(section.render() for section in sections)
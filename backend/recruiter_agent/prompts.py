@@ -0,0 +1,160 @@
+"""
+Prompt templates for the agent's LLM calls.
+
+Every prompt is laid out as a static system message (instructions, rules,
+output guidance) followed by a human message with the per-run data. Calls of
+the same kind therefore share an identical prefix, which the provider can
+serve from its prompt cache; nothing run-specific may go into the system
+messages below.
+"""
+from typing import List, Tuple
+
+Messages = List[Tuple[str, str]]
+
+JD_FIELDS = """From the job description:
+- Job title
+- Location (if available)
+- List of key responsibilities
+- List of required qualifications
+- List of preferred qualifications (if available)
+- List of key skills extracted from the job description"""
+
+RESUME_FIELDS = """From the resume:
+- Personal information (name, email, phone)
+- Education history (with degree, institution, and years)
+- Work experience (with title, company, dates, and descriptions)
+- Skills
+- Certifications (if available)
+- Projects (if available)
+
+If the candidate name is not in the resume, use the candidate name given with the resume.
+Make sure the URLs found in the resume are properly included in the appropriate sections."""
+
+PARSE_JD_SYSTEM = f"""Extract the following information from the job description in structured format.
+
+{JD_FIELDS}"""
+
+PARSE_RESUME_SYSTEM = f"""Extract the following detailed information from the resume in structured format.
+
+{RESUME_FIELDS}"""
+
+PARSE_COMBINED_SYSTEM = f"""Extract structured information from the job description and the resume provided.
+
+{JD_FIELDS}
+
+{RESUME_FIELDS}"""
+
+PARSE_RESUME_SECTION_SYSTEM = """Extract {fields} from the part of a resume provided.
+If the candidate name is not in the text, use the candidate name given with it."""
+
+WEB_RESEARCH_SYSTEM = """Analyze the web findings provided about a candidate and extract verified information.
+
+VERIFICATION RULES:
+1. Only include information that clearly belongs to THIS specific candidate
+2. Look for multiple signals confirming identity (name + company, name + education, etc.)
+3. If uncertain about information, DO NOT include it
+4. When results are ambiguous or could belong to another person with the same name, exclude them
+
+Based on the web research results provided, extract:
+1. GitHub repositories (list only repositories that are definitely by this candidate)
+2. Blog posts written by the candidate (only if clearly authored by them)
+3. Conference talks or presentations given by this specific candidate
+4. Social media or professional mentions (only those relevant to this candidate)
+
+IMPORTANT: Quality over quantity. It's better to return fewer highly-confident results than many uncertain ones.
+If you cannot find verified information for a category, state "No verified information found" instead of making assumptions."""
+
+FIT_SCORE_SYSTEM = """Evaluate the candidate against the job requirements with a focus on potential and transferable skills.
+
+ASSESSMENT GUIDELINES:
+1. Create a detailed comparison matrix showing each required skill and whether the candidate has it
+2. Calculate:
+   - Skill match percentage (% of required skills candidate has)
+   - Approximate experience years in relevant roles
+   - Domain signal strength based on web findings (High/Medium/Low)
+3. Determine overall fit: "Strong Fit", "Moderate Fit", or "Not a Fit"
+4. Provide clear reasoning for your assessment
+
+IMPORTANT EVALUATION CONSIDERATIONS:
+- Look for transferable skills that could apply to the job requirements
+- Consider project work and GitHub repositories as evidence of practical skills
+- Value potential and ability to learn, especially for junior to mid-level positions
+- Recognize that candidates may have relevant experience even if job titles don't exactly match
+- Consider education and certifications as indicators of knowledge in required areas
+- Be generous in skill assessment - if the candidate shows adjacent skills, count them as partial matches
+- For technical roles, give significant weight to demonstrated coding abilities in projects
+- Consider quality of work over quantity of experience
+
+Be balanced and fair in your assessment, considering both current skills and growth potential."""
+
+SEARCH_QUERIES_SYSTEM = """Generate highly specific search queries to find professional information about the person described.
+
+Each query should:
+1. Be designed to find specific content about this exact person
+2. Include disambiguating information to avoid finding other people with similar names
+3. Focus on professional achievements, contributions, or publications
+4. Use specialized search operators when helpful (e.g., site:github.com)
+
+Return only the search queries, one per line, without numbering or explanation."""
+
+
+def urls_line(urls: List[str]) -> str:
+    return f"URLs found in the resume: {', '.join(urls) if urls else 'None'}"
+
+
+def parse_jd_messages(jd_text: str) -> Messages:
+    return [("system", PARSE_JD_SYSTEM), ("human", f"JOB DESCRIPTION:\n{jd_text}")]
+
+
+def parse_resume_messages(resume_text: str, candidate_name: str, urls: List[str]) -> Messages:
+    return [
+        ("system", PARSE_RESUME_SYSTEM),
+        ("human", f"Candidate name: {candidate_name or 'Unknown'}\n{urls_line(urls)}\n\nRESUME:\n{resume_text}"),
+    ]
+
+
+def parse_combined_messages(jd_text: str, resume_text: str, candidate_name: str, urls: List[str]) -> Messages:
+    return [
+        ("system", PARSE_COMBINED_SYSTEM),
+        ("human", f"JOB DESCRIPTION:\n{jd_text}\n\n"
+                  f"Candidate name: {candidate_name or 'Unknown'}\n{urls_line(urls)}\n\nRESUME:\n{resume_text}"),
+    ]
+
+
+def parse_resume_section_messages(fields: str, section_text: str, candidate_name: str, urls: List[str]) -> Messages:
+    data = f"Candidate name: {candidate_name or 'Unknown'}\n"
+    if urls:
+        data += f"{urls_line(urls)}\n"
+    return [
+        ("system", PARSE_RESUME_SECTION_SYSTEM.format(fields=fields)),
+        ("human", f"{data}\nRESUME SECTION:\n{section_text}"),
+    ]
+
+
+def web_research_messages(candidate_name: str, education: List[str], companies: List[str],
+                          web_content: List[str]) -> Messages:
+    return [
+        ("system", WEB_RESEARCH_SYSTEM),
+        ("human", f"CANDIDATE INFORMATION FOR VERIFICATION:\n"
+                  f"Name: {candidate_name}\n"
+                  f"Education: {', '.join(education)}\n"
+                  f"Companies: {', '.join(companies)}\n\n"
+                  f"WEB RESEARCH CONTENT:\n{''.join(web_content)}"),
+    ]
+
+
+def fit_score_messages(candidate_data: str) -> Messages:
+    return [("system", FIT_SCORE_SYSTEM), ("human", candidate_data)]
+
+
+def search_queries_messages(num_queries: int, candidate_name: str, companies: List[str], education: List[str],
+                            skills: List[str], usernames_json: str) -> Messages:
+    return [
+        ("system", SEARCH_QUERIES_SYSTEM),
+        ("human", f"Number of queries: {num_queries}\n"
+                  f"Name: {candidate_name}\n"
+                  f"Work history: {', '.join(companies) if companies else 'Unknown'}\n"
+                  f"Education: {', '.join(education) if education else 'Unknown'}\n"
+                  f"Skills: {', '.join(skills[:5]) if skills else 'Unknown'}\n"
+                  f"Usernames: {usernames_json}"),
+    ]
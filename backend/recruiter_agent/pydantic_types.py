@@ -57,6 +57,34 @@ class Resume(BaseModel):
         None, description="Certifications")
     projects: Optional[List[str]] = Field(None, description="Project titles")
 
+# Partial schemas for extracting a long resume one section at a time
+
+
+class ResumePersonalSection(BaseModel):
+    personal: Personal
+
+
+class ResumeExperienceSection(BaseModel):
+    experience: List[ExperienceEntry] = Field(..., description="Work experience")
+
+
+class ResumeEducationSection(BaseModel):
+    education: List[EducationEntry] = Field(..., description="Education history")
+
+
+class ResumeSkillsSection(BaseModel):
+    skills: List[str] = Field(..., description="List of skills")
+    certifications: Optional[List[str]] = Field(
+        None, description="Certifications")
+
+
+class ResumeProjectsSection(BaseModel):
+    projects: List[str] = Field(..., description="Project titles")
+
+class CombinedExtraction(BaseModel):
+    job_description: JobDescription
+    resume: Resume
+
 # ── 3. Web Research ────────────────────────────────────────────────────────────
 
 
@@ -0,0 +1,57 @@
+import functools
+import time
+from typing import Any, Dict, Optional
+
+from config import settings
+from recruiter_agent.llm_cache import LLMCache, MongoCacheTier, SQLiteCacheTier
+from recruiter_agent.utils import text_hash
+
+MONGO_COLLECTION = "web_research_cache"
+SQLITE_TABLE = "web_research"
+
+
+def candidate_identity_key(candidate_name: str, usernames: Dict[str, str],
+                           resume_structured: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """
+    Stable key for a candidate's web research, independent of the JD: the
+    GitHub or LinkedIn username when the resume links one, otherwise a hash of
+    the name and employers. None when neither is known yet.
+    """
+    for platform in ("github", "linkedin"):
+        if usernames.get(platform):
+            return f"{platform}:{usernames[platform].lower()}"
+    if not candidate_name or resume_structured is None:
+        return None
+    companies = sorted({(exp.get("company") or "").strip().lower()
+                        for exp in resume_structured.get("experience", []) if exp.get("company")})
+    return "name:" + text_hash("\n".join([candidate_name.strip().lower()] + companies))
+
+
+@functools.lru_cache(maxsize=1)
+def get_research_cache() -> Optional[LLMCache]:
+    """Candidate research cache on the same tiers as the LLM response cache, or None when disabled"""
+    if not settings.WEB_RESEARCH_CACHE_ENABLED:
+        return None
+    tiers = []
+    if settings.LLM_CACHE_SQLITE_PATH:
+        tiers.append(SQLiteCacheTier(settings.LLM_CACHE_SQLITE_PATH, settings.WEB_RESEARCH_CACHE_MAX_ENTRIES,
+                                     settings.WEB_RESEARCH_CACHE_MAX_AGE_SECONDS, table=SQLITE_TABLE))
+    if settings.LLM_CACHE_MONGO_ENABLED:
+        from recruiter_agent.mongo import get_sync_db
+        try:
+            tiers.append(MongoCacheTier(get_sync_db()[MONGO_COLLECTION], settings.WEB_RESEARCH_CACHE_MAX_ENTRIES,
+                                        settings.WEB_RESEARCH_CACHE_MAX_AGE_SECONDS))
+        except Exception as e:
+            print(f"Warning: Mongo web research cache tier unavailable: {str(e)}")
+    return LLMCache(tiers) if tiers else None
+
+
+def load_research(key: Optional[str]) -> Optional[Dict[str, Any]]:
+    cache = get_research_cache() if key else None
+    return cache.get(key) if cache else None
+
+
+def store_research(key: Optional[str], entry: Dict[str, Any]) -> None:
+    cache = get_research_cache() if key else None
+    if cache:
+        cache.set(key, {**entry, "researched_at": time.time()})
@@ -0,0 +1,99 @@
+import re
+from typing import Any, Dict, List
+
+from recruiter_agent.utils import count_tokens
+
+# Heading wording per resume section. Headings that are not listed (summary,
+# awards, ...) stay with the section above them.
+SECTION_HEADINGS = {
+    "experience": (
+        "experience", "work experience", "professional experience", "relevant experience", "employment",
+        "employment history", "work history", "career history", "professional background", "career",
+    ),
+    "education": (
+        "education", "academic background", "academics", "education and training", "academic qualifications",
+    ),
+    "skills": (
+        "skills", "technical skills", "key skills", "core skills", "core competencies", "competencies",
+        "technologies", "tech stack", "tools", "certifications", "certificates", "licenses and certifications",
+    ),
+    "projects": (
+        "projects", "personal projects", "side projects", "selected projects", "key projects", "open source",
+        "open source contributions",
+    ),
+}
+
+HEADING_LOOKUP = {heading: section for section, headings in SECTION_HEADINGS.items() for heading in headings}
+NON_LETTERS = re.compile(r"[^a-z]+")
+MAX_HEADING_CHARS = 40
+
+
+def heading_section(line: str) -> str:
+    """Section name if the line is a known resume heading, else an empty string"""
+    line = line.strip()
+    if not line or len(line) > MAX_HEADING_CHARS or line.endswith((".", ",")):
+        return ""
+    words = NON_LETTERS.sub(" ", line.lower().replace("&", " and ")).split()
+    return HEADING_LOOKUP.get(" ".join(words), "")
+
+
+def split_resume_sections(text: str) -> Dict[str, str]:
+    """
+    Split resume text into personal (everything before the first heading),
+    experience, education, skills and projects. Repeated headings (e.g. on
+    every page) append to the same section.
+    """
+    sections: Dict[str, List[str]] = {"personal": []}
+    current = "personal"
+    for line in text.splitlines():
+        section = heading_section(line)
+        if section:
+            current = section
+            sections.setdefault(current, [])
+        sections[current].append(line)
+    return {name: "\n".join(lines).strip() for name, lines in sections.items() if "".join(lines).strip()}
+
+
+def chunk_lines(text: str, max_tokens: int) -> List[str]:
+    """
+    Split a section into chunks of about max_tokens, breaking at blank lines
+    so that a single role or degree is normally not cut in half.
+    """
+    blocks = [block for block in re.split(r"\n\s*\n", text) if block.strip()]
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for block in blocks:
+        block_tokens = count_tokens(block)
+        if current and current_tokens + block_tokens > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(block)
+        current_tokens += block_tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def merge_experience(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop roles extracted twice from overlapping chunks, keeping the longer description"""
+    merged: Dict[tuple, Dict[str, Any]] = {}
+    for entry in entries:
+        key = ((entry.get("title") or "").strip().lower(), (entry.get("company") or "").strip().lower(),
+               entry.get("start_date"))
+        existing = merged.get(key)
+        if existing is None or len(entry.get("description") or "") > len(existing.get("description") or ""):
+            merged[key] = entry
+    return list(merged.values())
+
+
+def unique(items: List[str]) -> List[str]:
+    """Case-insensitive dedupe that keeps the first spelling and order"""
+    seen = set()
+    result = []
+    for item in items:
+        key = item.strip().lower()
+        if key and key not in seen:
+            seen.add(key)
+            result.append(item)
+    return result
@@ -0,0 +1,21 @@
+from typing import Any, Dict, List
+from langchain_tavily import TavilySearch
+from config import settings
+
+
+def create_search_tool(max_results: int = 3) -> TavilySearch:
+    return TavilySearch(
+        tavily_api_key=settings.TAVILY_SEARCH_API_KEY,
+        max_results=max_results,
+        topic="general",
+    )
+
+
+def run_search(search_tool: TavilySearch, query: str) -> List[Dict[str, Any]]:
+    """Run a search query and return the list of result dicts"""
+    results = search_tool.invoke({"query": query})
+
+    # Extract results from response
+    if isinstance(results, dict) and 'results' in results:
+        results = results.get('results', [])
+    return results or []
@@ -0,0 +1,128 @@
+import re
+from collections import Counter
+from datetime import date
+from typing import Dict, Any, List, Optional, Set
+
+# Words that carry no signal about whether a candidate fits a role
+STOPWORDS = {
+    "a", "about", "above", "across", "after", "all", "also", "an", "and", "any", "are", "as", "at",
+    "be", "been", "being", "both", "but", "by", "can", "candidate", "candidates", "company", "do",
+    "each", "etc", "excellent", "experience", "experienced", "for", "from", "good", "great",
+    "has", "have", "help", "highly", "if", "in", "including", "into", "is", "it", "its", "job", "join",
+    "knowledge", "least", "like", "looking", "more", "must", "new", "nice", "not", "of", "on", "or",
+    "our", "plus", "preferred", "proven", "qualifications", "required", "requirements", "responsibilities",
+    "role", "should", "skills", "strong", "such", "team", "teams", "that", "the", "their", "this", "to", "understanding",
+    "us", "using", "we", "well", "will", "with", "work", "working", "year", "years", "you", "your",
+    "ability", "able", "degree", "other", "related", "who", "what", "within", "per",
+}
+
+WORD_PATTERN = re.compile(r"[a-z][a-z0-9+#.]*[a-z0-9+#]|[a-z]")
+YEARS_REQUIRED_PATTERN = re.compile(r"(\d{1,2})\s*\+?\s*(?:-\s*\d{1,2}\s*)?(?:years?|yrs?)", re.IGNORECASE)
+YEARS_STATED_PATTERN = re.compile(
+    r"(\d{1,2}(?:\.\d)?)\s*\+?\s*(?:years?|yrs?)\s+(?:of\s+)?(?:professional\s+|industry\s+|work\s+)?experience",
+    re.IGNORECASE)
+YEAR_RANGE_PATTERN = re.compile(
+    r"\b((?:19|20)\d{2})\s*(?:-|–|—|to)\s*((?:19|20)\d{2}|present|current|now|today)\b", re.IGNORECASE)
+REQUIRED_HEADING_PATTERN = re.compile(
+    r"^\W*(required|requirements|qualifications|must[\s-]have|what you('ll)? (need|bring)|minimum)", re.IGNORECASE)
+HEADING_PATTERN = re.compile(r"^\W*[A-Za-z][A-Za-z '&/-]{2,40}:?\s*$")
+
+
+def extract_keywords(text: str) -> List[str]:
+    """Lowercased content words from text, stopwords removed"""
+    return [w for w in WORD_PATTERN.findall(text.lower()) if w not in STOPWORDS and len(w) > 1]
+
+
+def top_keywords(text: str, limit: int = 25) -> List[str]:
+    """Most frequent content words in text"""
+    return [word for word, _ in Counter(extract_keywords(text)).most_common(limit)]
+
+
+def extract_required_lines(jd_text: str) -> List[str]:
+    """Lines listed under a 'required qualifications' style heading"""
+    lines = []
+    in_required = False
+    for raw_line in jd_text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        if REQUIRED_HEADING_PATTERN.match(line):
+            in_required = True
+            continue
+        if in_required and HEADING_PATTERN.match(line) and not line.startswith(("-", "*", "•")):
+            in_required = False
+            continue
+        if in_required:
+            lines.append(line)
+    return lines
+
+
+def estimate_required_years(jd_text: str) -> Optional[float]:
+    """Lowest 'N+ years' figure mentioned in the job description"""
+    years = [int(match) for match in YEARS_REQUIRED_PATTERN.findall(jd_text) if 0 < int(match) <= 30]
+    return float(min(years)) if years else None
+
+
+def estimate_resume_years(resume_text: str) -> float:
+    """Years of experience from an explicit statement, else from merged date ranges"""
+    stated = [float(match) for match in YEARS_STATED_PATTERN.findall(resume_text)]
+    if stated:
+        return max(stated)
+
+    current_year = date.today().year
+    spans = []
+    for start, end in YEAR_RANGE_PATTERN.findall(resume_text):
+        start_year = int(start)
+        end_year = current_year if not end[0].isdigit() else int(end)
+        if start_year <= end_year <= current_year:
+            spans.append((start_year, end_year))
+
+    # Merge overlapping ranges so parallel roles/education are not double counted
+    total = 0
+    last_end = None
+    for start_year, end_year in sorted(spans):
+        if last_end is not None and start_year <= last_end:
+            if end_year > last_end:
+                total += end_year - last_end
+                last_end = end_year
+        else:
+            total += end_year - start_year
+            last_end = end_year
+    return float(total)
+
+
+def compute_triage_score(resume_text: str, jd_text: str) -> Dict[str, Any]:
+    """
+    Fast local fit score in [0, 1] from keyword overlap, years of experience and
+    required-qualification hits. No LLM or network calls.
+    """
+    resume_words: Set[str] = set(extract_keywords(resume_text))
+    jd_keywords = top_keywords(jd_text)
+
+    matched = [kw for kw in jd_keywords if kw in resume_words]
+    keyword_overlap = len(matched) / len(jd_keywords) if jd_keywords else 1.0
+
+    required_years = estimate_required_years(jd_text)
+    resume_years = estimate_resume_years(resume_text)
+    years_score = min(resume_years / required_years, 1.0) if required_years else 1.0
+
+    required_lines = extract_required_lines(jd_text)
+    hits = 0
+    for line in required_lines:
+        line_keywords = set(extract_keywords(line))
+        if line_keywords and len(line_keywords & resume_words) / len(line_keywords) >= 0.5:
+            hits += 1
+    qualification_hits = hits / len(required_lines) if required_lines else keyword_overlap
+
+    score = 0.5 * keyword_overlap + 0.2 * years_score + 0.3 * qualification_hits
+
+    return {
+        "score": round(score, 3),
+        "keyword_overlap": round(keyword_overlap, 3),
+        "matched_keywords": matched,
+        "missing_keywords": [kw for kw in jd_keywords if kw not in resume_words],
+        "required_years": required_years,
+        "resume_years": resume_years,
+        "qualification_hits": hits,
+        "qualification_total": len(required_lines),
+    }
@@ -1,7 +1,9 @@
 import functools
+import hashlib
 import traceback
 import json
 import re
+import time
 from typing import Callable, TypeVar, ParamSpec, Dict, Any, List, Optional, Tuple
 from urllib.parse import urlparse
 import requests
@@ -12,6 +14,8 @@ from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from config import settings
+from recruiter_agent.web_health import web_health
 
 # from utils.utils import count_tokens
 
@@ -119,6 +123,75 @@ def create_tool_node_with_fallback(tools: list) -> dict:
     )
 
 
+# Latency budget utilities
+
+def merge_metrics(left: Optional[Dict[str, Any]], right: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    State reducer for per-run metrics: nested dicts are merged so parallel nodes
+    can each report their own section.
+    """
+    merged = dict(left or {})
+    for key, value in (right or {}).items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_metrics(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def time_left(config: Optional[Dict[str, Any]], reserve_ms: float = 0) -> Optional[float]:
+    """
+    Seconds left before the run's deadline after keeping reserve_ms aside.
+    Returns None when the run has no deadline.
+    """
+    deadline = ((config or {}).get("configurable") or {}).get("deadline")
+    if deadline is None:
+        return None
+    return deadline - time.time() - reserve_ms / 1000
+
+
+def llm_timeout(config: Optional[Dict[str, Any]], reserve_ms: float = settings.FIT_SCORE_RESERVED_MS,
+                floor_ms: float = settings.MIN_LLM_TIMEOUT_MS) -> Optional[float]:
+    """
+    Request timeout for an LLM call that must leave reserve_ms for later steps,
+    never shorter than floor_ms. Returns None when the run has no deadline.
+    """
+    remaining = time_left(config, reserve_ms)
+    if remaining is None:
+        return None
+    return max(remaining, floor_ms / 1000)
+
+
+# Timeout of a page fetch when the request's latency budget does not call for less
+FETCH_TIMEOUT_SECONDS = 15.0
+
+
+class ResearchBudget:
+    """
+    Tracks the time web research may spend on searches and fetches: everything
+    up to the deadline minus the time reserved for later steps. Steps skipped
+    because the budget ran out are collected in degraded_steps.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]], reserve_ms: float):
+        self.config = config
+        self.reserve_ms = reserve_ms
+        self.degraded_steps: List[str] = []
+
+    def out_of_time(self, step: str) -> bool:
+        remaining = time_left(self.config, self.reserve_ms)
+        if remaining is not None and remaining <= 0:
+            if step not in self.degraded_steps:
+                print(f"⏱️ Latency budget exhausted, skipping {step}")
+                self.degraded_steps.append(step)
+            return True
+        return False
+
+    def fetch_timeout(self, default: float = FETCH_TIMEOUT_SECONDS) -> float:
+        remaining = time_left(self.config, self.reserve_ms)
+        return default if remaining is None else max(1.0, min(default, remaining))
+
+
 # Web content extraction utilities
 
 def extract_links_from_text(text: str) -> List[str]:
@@ -161,17 +234,26 @@ def extract_links_from_text(text: str) -> List[str]:
     return processed_urls
 
 
-def get_url_content(url: str, max_chars: int = 5000) -> Optional[Dict[str, Any]]:
+def get_url_content(url: str, max_chars: int = settings.WEB_FETCH_MAX_CHARS,
+                    timeout: float = FETCH_TIMEOUT_SECONDS) -> Optional[Dict[str, Any]]:
     """
     Enhanced URL content fetcher with better error handling and content extraction.
     Returns the content and metadata about the URL.
+    Domains whose circuit breaker is open and recently failed URLs are skipped.
     """
+    allowed, reason, probe = web_health.allow(url)
+    if not allowed:
+        print(f"Skipping {url}: {reason}")
+        return None
+
     try:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
+        response = requests.get(url, headers=headers, timeout=timeout)
+        # LinkedIn answers blocked scrapers with a non-standard 999
+        if response.status_code >= 400:
+            raise requests.HTTPError(f"{response.status_code} status for url: {url}", response=response)
 
         # Parse with BeautifulSoup
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -202,14 +284,24 @@ def get_url_content(url: str, max_chars: int = 5000) -> Optional[Dict[str, Any]]
         # Truncate to avoid overloading the model
         content = content[:max_chars]
 
+        web_health.record_success(url, probe)
         return {
             "url": url,
             "title": title,
             "content": content,
             "domain": domain
         }
+    except requests.Timeout as e:
+        if timeout < FETCH_TIMEOUT_SECONDS:
+            # Cut short by the request's latency budget, which says nothing about the site
+            web_health.record_skip(url, f"latency budget left only {timeout:.1f}s", probe)
+        else:
+            print(f"Error fetching {url}: {str(e)}")
+            web_health.record_failure(url, str(e), probe)
+        return None
     except Exception as e:
         print(f"Error fetching {url}: {str(e)}")
+        web_health.record_failure(url, str(e), probe)
         return None
 
 
@@ -371,151 +463,226 @@ def extract_username_from_url(url: str) -> Tuple[Optional[str], str]:
 
 # Search-related utility functions
 
+# Tokenizer used by gpt-4o-mini
+TOKEN_ENCODING = "o200k_base"
+
+# Query parameters that never change the page a URL points at, matched by exact name
+# (utm_ by prefix); on GitHub ?ref= selects a branch or tag, so it is kept there
+TRACKING_PARAMS = {"ref", "fbclid", "gclid"}
+TRACKING_PARAM_PREFIX = "utm_"
+MEANINGFUL_PARAMS = {"github.com": {"ref"}}
+
+
+def is_tracking_param(name: str, domain: str) -> bool:
+    name = name.lower()
+    if name in MEANINGFUL_PARAMS.get(domain, ()):
+        return False
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PARAM_PREFIX)
+
+
+def canonical_url(url: str) -> str:
+    """
+    Normalize a URL for deduplication: lowercase host without www., no fragment,
+    no tracking parameters and no trailing slash.
+    """
+    parsed = urlparse(url.strip())
+    domain = parsed.netloc.lower()
+    if domain.startswith("www."):
+        domain = domain[4:]
+    query = "&".join(param for param in parsed.query.split("&")
+                     if param and not is_tracking_param(param.split("=", 1)[0], domain))
+    path = parsed.path.rstrip("/")
+    return f"{domain}{path}" + (f"?{query}" if query else "")
+
+
+class CandidateProfile:
+    """
+    Identity matchers for one candidate, built once per run so that scoring a
+    search result is only a handful of substring checks on pre-sliced text.
+    """
+
+    # Profile URL prefixes per platform and the relevance a URL match is worth
+    PROFILE_URLS = {
+        "github": (("github.com/",), 8.0),
+        "linkedin": (("linkedin.com/in/",), 8.0),
+        "twitter": (("twitter.com/", "x.com/"), 7.0),
+    }
+
+    def __init__(self, candidate_name: str, resume_structured: Dict[str, Any], usernames: Dict[str, str]):
+        parts = candidate_name.lower().split()
+        # Single-word names are too ambiguous to count as a match
+        self.name_parts = tuple(parts) if len(parts) >= 2 else ()
+
+        self.usernames = tuple(username.lower() for username in usernames.values())
+        self.profile_urls = []
+        for platform, username in usernames.items():
+            if platform in self.PROFILE_URLS:
+                prefixes, weight = self.PROFILE_URLS[platform]
+                self.profile_urls.append((tuple(prefix + username.lower() for prefix in prefixes), weight))
+
+        # Terms are kept with their multiplicity, e.g. two roles at one company count twice
+        self.companies = self._term_counts(exp.get('company') for exp in resume_structured.get('experience') or [])
+        self.schools = self._term_counts(edu.get('institution') for edu in resume_structured.get('education') or [])
+
+    @staticmethod
+    def _term_counts(terms) -> Tuple[Tuple[str, int], ...]:
+        counts: Dict[str, int] = {}
+        for term in terms:
+            term = (term or "").lower()
+            if term:
+                counts[term] = counts.get(term, 0) + 1
+        return tuple(counts.items())
+
+    def score(self, result: Dict[str, Any]) -> float:
+        """Relevance of a single search result"""
+        # Only the head of the content is ever inspected
+        head = (result.get('content') or '')[:1000].lower()
+        name_window = head[:500]
+        title = (result.get('title') or '').lower()
+        url = (result.get('url') or '').lower()
+
+        relevance = 0.0
+
+        # Name match (essential)
+        if self.name_parts:
+            matching_parts = sum(1 for part in self.name_parts if part in name_window or part in title)
+            if matching_parts == len(self.name_parts):
+                # Full name match is strong signal
+                relevance += 5.0
+            elif matching_parts:
+                relevance += (matching_parts / len(self.name_parts)) * 2.5
+
+        # Username in a profile URL is a very strong signal
+        for prefixes, weight in self.profile_urls:
+            if any(prefix in url for prefix in prefixes):
+                relevance += weight
+        for username in self.usernames:
+            if username in head:
+                relevance += 2.0
+
+        # Company/education matches, capped
+        company_matches = sum(count for company, count in self.companies if company in head)
+        school_matches = sum(count for school, count in self.schools if school in head)
+        relevance += min(company_matches * 1.5, 3.0)
+        relevance += min(school_matches * 1.0, 2.0)
+
+        return relevance
+
+    def score_batch(self, results: List[Dict[str, Any]]) -> List[float]:
+        """Relevance of each result, in order"""
+        return [self.score(result) for result in results]
+
+
 def calculate_result_relevance(result: Dict[str, Any], candidate_name: str,
                                resume_structured: Dict[str, Any], usernames: Dict[str, str]) -> float:
     """
     Calculate relevance score for a search result with improved matching heuristics.
+    Prefer building a CandidateProfile once when scoring many results.
     """
-    content = result.get('content', '').lower()
-    title = result.get('title', '').lower()
-    url = result.get('url', '').lower()
-
-    # Initialize relevance score
-    relevance = 0.0
-
-    # Check for name match (essential)
-    name_parts = candidate_name.lower().split()
-    if len(name_parts) >= 2:
-        if all(part in content[:500] or part in title for part in name_parts):
-            # Full name match is strong signal
-            relevance += 5.0
-        elif any(part in content[:500] or part in title for part in name_parts):
-            # Partial name match
-            matching_parts = sum(
-                1 for part in name_parts if part in content[:500] or part in title)
-            relevance += (matching_parts / len(name_parts)) * 2.5
-
-    # Check for username matches (very strong signal)
-    for platform, username in usernames.items():
-        username_lower = username.lower()
-
-        # Direct username match in URL
-        if platform == 'github' and 'github.com/' + username_lower in url:
-            relevance += 8.0  # Almost certainly relevant
-        elif platform == 'linkedin' and 'linkedin.com/in/' + username_lower in url:
-            relevance += 8.0
-        elif platform == 'twitter' and ('twitter.com/' + username_lower in url or 'x.com/' + username_lower in url):
-            relevance += 7.0
-
-        # Username mention in content
-        if username_lower in content[:1000]:
-            relevance += 2.0
-
-    # Check for company/education matches
-    # Extract companies and education from resume
-    companies = [exp.get('company', '').lower()
-                 for exp in resume_structured.get('experience', [])]
-    education = [edu.get('institution', '').lower()
-                 for edu in resume_structured.get('education', [])]
+    return CandidateProfile(candidate_name, resume_structured, usernames).score(result)
 
-    # Check for matches in the content
-    company_matches = sum(
-        1 for company in companies if company and company in content[:1000])
-    edu_matches = sum(
-        1 for school in education if school and school in content[:1000])
 
-    relevance += min(company_matches * 1.5, 3.0)  # Cap at 3.0 for companies
-    relevance += min(edu_matches * 1.0, 2.0)      # Cap at 2.0 for education
+def identity_search_queries(usernames: Dict[str, str]) -> List[str]:
+    """
+    Username-based queries that need nothing from the parsed resume.
+    """
+    queries = []
+    if 'github' in usernames:
+        # Direct username query - highest specificity
+        queries.append(f"github.com/{usernames['github']}")
+        queries.append(f"site:github.com {usernames['github']} repositories")
+    if 'linkedin' in usernames:
+        queries.append(f"site:linkedin.com/in/{usernames['linkedin']}")
+    return queries
+
 
-    return relevance
+def identity_signals_weak(state: Dict[str, Any]) -> bool:
+    """
+    True when the resume gives little to disambiguate the candidate online:
+    no GitHub/LinkedIn username and at most one of employer or school.
+    """
+    usernames = state.get("usernames") or {}
+    resume_structured = state["resume_structured"]
+    has_company = any(exp.get('company') for exp in resume_structured.get('experience', []))
+    has_school = any(edu.get('institution') for edu in resume_structured.get('education', []))
+    if 'github' in usernames or 'linkedin' in usernames:
+        return False
+    return not (has_company and has_school)
 
 
-def generate_search_queries(state: Dict[str, Any]) -> List[str]:
+def plan_search_queries(state: Dict[str, Any]) -> List[Tuple[str, float]]:
     """
-    Generate optimized search queries based on candidate information.
+    Plan templated search queries with their expected yield (0-10), best first.
+    Username queries find the candidate almost every time; name plus generic
+    keyword queries rarely add anything once the identity is established.
+    Nothing here depends on the JD, so the research can be shared across roles.
     """
     candidate_name = state["candidate_name"]
     resume_structured = state["resume_structured"]
     usernames = state.get("usernames", {})
-    jd_structured = state.get("jd_structured", {})
 
-    # Create base queries using available information
-    queries = []
+    planned: List[Tuple[str, float]] = []
 
-    # 1. GitHub queries
-    if 'github' in usernames:
-        # Direct username query - highest specificity
-        queries.append(f"github.com/{usernames['github']}")
-        queries.append(f"site:github.com {usernames['github']} repositories")
-    else:
+    companies = [exp.get('company', '') for exp in resume_structured.get(
+        'experience', []) if exp.get('company')]
+
+    # 1. GitHub / LinkedIn queries
+    for query in identity_search_queries(usernames):
+        planned.append((query, 9.0))
+    if 'github' not in usernames:
         # More general GitHub query with disambiguation
-        companies = [exp.get('company', '') for exp in resume_structured.get(
-            'experience', []) if exp.get('company')]
         if companies:
-            queries.append(f"{candidate_name} {companies[0]} github")
+            planned.append((f"{candidate_name} {companies[0]} github", 6.0))
         else:
-            queries.append(f"{candidate_name} github profile")
-
-    # 2. LinkedIn queries
-    if 'linkedin' in usernames:
-        queries.append(f"site:linkedin.com/in/{usernames['linkedin']}")
-    else:
+            planned.append((f"{candidate_name} github profile", 4.0))
+    if 'linkedin' not in usernames:
         # General LinkedIn query
         if companies:
-            queries.append(f"{candidate_name} {companies[0]} linkedin")
+            planned.append((f"{candidate_name} {companies[0]} linkedin", 5.0))
         else:
-            queries.append(f"{candidate_name} linkedin profile")
+            planned.append((f"{candidate_name} linkedin profile", 3.0))
+
+    # 2. Company-specific queries
+    if companies:
+        planned.append(
+            (f"{candidate_name} {companies[0]} portfolio work achievements", 4.0))
 
     # 3. Technical/professional content queries
     skills = resume_structured.get('skills', [])
     if skills and len(skills) >= 2:
         # Use specific skills in queries
-        queries.append(
-            f"{candidate_name} {skills[0]} {skills[1]} project blog")
-        queries.append(f"{candidate_name} {skills[0]} conference talk")
+        planned.append(
+            (f"{candidate_name} {skills[0]} {skills[1]} project blog", 3.5))
+        planned.append((f"{candidate_name} {skills[0]} conference talk", 2.0))
 
-    # 4. Company-specific queries
-    if companies and len(companies) >= 1:
-        queries.append(
-            f"{candidate_name} {companies[0]} portfolio work achievements")
-
-    # 5. Education-specific queries
+    # 4. Education-specific queries
     education = [edu.get('institution', '') for edu in resume_structured.get(
         'education', []) if edu.get('institution')]
     if education:
-        queries.append(
-            f"{candidate_name} {education[0]} research paper project")
+        planned.append(
+            (f"{candidate_name} {education[0]} research paper project", 3.0))
 
-    # 6. Use job title for relevance
+    # 5. Use job title for relevance
     job_titles = [exp.get('title', '') for exp in resume_structured.get(
         'experience', []) if exp.get('title')]
     if job_titles:
-        queries.append(f"{candidate_name} {job_titles[0]} portfolio project")
-
-    # 7. Add job-specific query using JD
-    if jd_structured and jd_structured.get('title'):
-        # Create query relevant to the job being applied for
-        jd_title = jd_structured.get('title', '')
-        jd_skill = jd_structured.get('top_skills', [''])[
-            0] if jd_structured.get('top_skills') else ''
-        if jd_title and jd_skill:
-            queries.append(f"{candidate_name} {jd_title} {jd_skill}")
-
-    # 8. Use LLM to generate additional queries if needed
-    if len(queries) < 6:
-        additional_queries = generate_llm_search_queries(state)
-        queries.extend(additional_queries)
+        planned.append((f"{candidate_name} {job_titles[0]} portfolio project", 2.5))
 
-    # Remove duplicates and limit to 10 queries
-    unique_queries = list(dict.fromkeys(queries))
-    return unique_queries[:10]
+    # Remove duplicates, order by expected yield and limit the plan
+    unique: Dict[str, float] = {}
+    for query, expected_yield in planned:
+        unique[query] = max(expected_yield, unique.get(query, 0.0))
+    ordered = sorted(unique.items(), key=lambda item: item[1], reverse=True)
+    return ordered[:settings.SEARCH_MAX_QUERIES]
 
 
-def generate_llm_search_queries(state: Dict[str, Any], num_queries: int = 3) -> List[str]:
+def generate_llm_search_queries(state: Dict[str, Any], num_queries: int = 3,
+                                config: Optional[Dict[str, Any]] = None) -> List[str]:
     """
     Use LLM to generate targeted search queries for a candidate.
     """
-    from recruiter_agent.llm import create_llm
+    from recruiter_agent.llm import create_llm, invoke_text
+    from recruiter_agent.prompts import search_queries_messages
 
     llm = create_llm()
     candidate_name = state["candidate_name"]
@@ -529,28 +696,11 @@ def generate_llm_search_queries(state: Dict[str, Any], num_queries: int = 3) ->
                  for edu in resume_structured.get('education', [])]
     skills = resume_structured.get('skills', [])
 
-    prompt = f"""
-    Generate {num_queries} highly specific search queries to find professional information about:
-    
-    Name: {candidate_name}
-    Work history: {', '.join(companies) if companies else 'Unknown'}
-    Education: {', '.join(education) if education else 'Unknown'}
-    Skills: {', '.join(skills[:5]) if skills else 'Unknown'}
-    Usernames: {json.dumps(usernames)}
-    
-    Each query should:
-    1. Be designed to find specific content about this exact person
-    2. Include disambiguating information to avoid finding other people with similar names
-    3. Focus on professional achievements, contributions, or publications
-    4. Use specialized search operators when helpful (e.g., site:github.com)
-    
-    Return only the search queries, one per line, without numbering or explanation.
-    """
+    messages = search_queries_messages(num_queries, candidate_name, companies, education, skills,
+                                       json.dumps(usernames))
 
     try:
-        response = llm.invoke(prompt)
-        content = response.content if hasattr(
-            response, 'content') else str(response)
+        content, _ = invoke_text(llm, messages, config)
 
         # Process the response to extract queries
         queries = [q.strip() for q in content.strip().split('\n') if q.strip()]
@@ -561,6 +711,48 @@ def generate_llm_search_queries(state: Dict[str, Any], num_queries: int = 3) ->
         return []
 
 
+@functools.lru_cache(maxsize=1)
+def get_token_encoding():
+    """
+    Tokenizer for the chat model, or None when tiktoken cannot load it
+    (the encoding file is downloaded on first use).
+    """
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception as e:
+        print(f"Warning: Could not load {TOKEN_ENCODING} tokenizer, estimating token counts: {str(e)}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Token count of text for the chat model (about 4 characters per token if tiktoken is unavailable)"""
+    encoding = get_token_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def text_hash(text: str) -> str:
+    """
+    Stable content hash of a document, insensitive to whitespace-only differences.
+    """
+    normalized = " ".join(text.split())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+FIT_SCORE_ORDER = {"strong fit": 0, "moderate fit": 1, "not a fit": 2}
+
+
+def fit_rank_key(fit_assessment: Dict[str, Any]) -> Tuple[int, float]:
+    """
+    Sort key that ranks assessments best first: by fit category, then skill match.
+    """
+    fit_score = (fit_assessment.get('fit_score') or '').strip().lower()
+    skill_match = (fit_assessment.get('score_details') or {}).get('skill_match_percentage') or 0.0
+    return FIT_SCORE_ORDER.get(fit_score, len(FIT_SCORE_ORDER)), -float(skill_match)
+
+
 def format_output(fit_assessment: Dict[str, Any]) -> str:
     """
     Format the fit assessment output in a readable format.
@@ -0,0 +1,167 @@
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+from config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Expired negative cache entries are pruned once this many URLs are tracked
+MAX_FAILED_URLS = 1024
+
+
+def url_domain(url: str) -> str:
+    """Domain used to group URLs for the breaker (www. is ignored)"""
+    domain = urlparse(url).netloc.lower()
+    return domain[4:] if domain.startswith("www.") else domain
+
+
+class WebHealth:
+    """
+    Process-wide health tracker for web fetches.
+
+    Each domain has a circuit breaker: after WEB_BREAKER_FAILURE_THRESHOLD
+    consecutive failures it opens and the domain is skipped for
+    WEB_BREAKER_COOLDOWN_SECONDS. Once the cool-down is over a single probe
+    request is let through (half open); success closes the breaker, failure
+    opens it again. Only the probe's outcome changes an open breaker, fetches
+    that started before it opened and finish late do not. Individual failing
+    URLs are also skipped for WEB_URL_NEGATIVE_TTL_SECONDS.
+    """
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float, url_ttl_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.url_ttl_seconds = url_ttl_seconds
+        self._domains: Dict[str, Dict[str, Any]] = {}
+        self._failed_urls: Dict[str, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def _domain_state(self, domain: str) -> Dict[str, Any]:
+        if domain not in self._domains:
+            self._domains[domain] = {
+                "state": CLOSED,
+                "consecutive_failures": 0,
+                "opened_until": None,
+                "probe_in_flight": False,
+                "failures": 0,
+                "successes": 0,
+                "skipped": 0,
+                "last_error": None,
+            }
+        return self._domains[domain]
+
+    def allow(self, url: str) -> Tuple[bool, Optional[str], bool]:
+        """
+        Whether a fetch of url should be attempted, with the reason when it
+        should not and whether it is the half-open probe (pass that on to the
+        record_* call for its outcome)
+        """
+        now = time.time()
+        domain = url_domain(url)
+        with self._lock:
+            failed = self._failed_urls.get(url)
+            if failed:
+                if failed[0] > now:
+                    self._domain_state(domain)["skipped"] += 1
+                    return False, f"recently failed: {failed[1]}", False
+                del self._failed_urls[url]
+
+            health = self._domain_state(domain)
+            if health["state"] == OPEN:
+                if health["opened_until"] > now:
+                    health["skipped"] += 1
+                    return False, f"circuit open for {domain}", False
+                health["state"] = HALF_OPEN
+                health["probe_in_flight"] = False
+
+            if health["state"] == HALF_OPEN:
+                if health["probe_in_flight"]:
+                    health["skipped"] += 1
+                    return False, f"circuit half open for {domain}, probe in flight", False
+                health["probe_in_flight"] = True
+                return True, None, True
+            return True, None, False
+
+    def record_success(self, url: str, probe: bool = False) -> None:
+        with self._lock:
+            health = self._domain_state(url_domain(url))
+            if probe or health["state"] == CLOSED:
+                health.update(state=CLOSED, consecutive_failures=0, opened_until=None, probe_in_flight=False)
+            health["successes"] += 1
+            self._failed_urls.pop(url, None)
+
+    def record_skip(self, url: str, reason: str, probe: bool = False) -> None:
+        """
+        A fetch given up for reasons that say nothing about the site (the request's
+        latency budget ran out): no negative caching and no breaker failure. A probe
+        that was given up frees the way for the next one.
+        """
+        with self._lock:
+            health = self._domain_state(url_domain(url))
+            health["skipped"] += 1
+            if probe:
+                health["probe_in_flight"] = False
+        print(f"Skipping {url}: {reason}")
+
+    def record_failure(self, url: str, error: str, probe: bool = False) -> None:
+        now = time.time()
+        domain = url_domain(url)
+        with self._lock:
+            if len(self._failed_urls) >= MAX_FAILED_URLS:
+                self._failed_urls = {u: entry for u, entry in self._failed_urls.items() if entry[0] > now}
+            self._failed_urls[url] = (now + self.url_ttl_seconds, error)
+
+            health = self._domain_state(domain)
+            health["failures"] += 1
+            health["consecutive_failures"] += 1
+            health["last_error"] = error
+            if probe:
+                health["probe_in_flight"] = False
+            elif health["state"] != CLOSED:
+                # A fetch that started before the breaker opened, only the probe decides now
+                return
+            if probe or health["consecutive_failures"] >= self.failure_threshold:
+                print(f"⚡ Circuit opened for {domain} after {health['consecutive_failures']} failures")
+                health["state"] = OPEN
+                health["opened_until"] = now + self.cooldown_seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Breaker state per domain and the live negative cache, for the admin endpoint"""
+        now = time.time()
+        with self._lock:
+            domains = {}
+            for domain, health in self._domains.items():
+                state = health["state"]
+                if state == OPEN and health["opened_until"] <= now:
+                    state = HALF_OPEN
+                domains[domain] = {
+                    **{k: v for k, v in health.items() if k != "probe_in_flight"},
+                    "state": state,
+                    "retry_in_seconds": round(max(health["opened_until"] - now, 0), 1)
+                    if health["opened_until"] else 0,
+                }
+            failed_urls = {url: {"error": error, "expires_in_seconds": round(expires - now, 1)}
+                           for url, (expires, error) in self._failed_urls.items() if expires > now}
+        return {"domains": domains, "failed_urls": failed_urls}
+
+    def reset(self, domain: Optional[str] = None) -> None:
+        """Close the breaker and forget failed URLs, for one domain or all of them"""
+        with self._lock:
+            if domain is None:
+                self._domains.clear()
+                self._failed_urls.clear()
+                return
+            domain = url_domain(f"//{domain}")
+            self._domains.pop(domain, None)
+            for url in [url for url in self._failed_urls if url_domain(url) == domain]:
+                del self._failed_urls[url]
+
+
+web_health = WebHealth(
+    settings.WEB_BREAKER_FAILURE_THRESHOLD,
+    settings.WEB_BREAKER_COOLDOWN_SECONDS,
+    settings.WEB_URL_NEGATIVE_TTL_SECONDS,
+)
@@ -0,0 +1,280 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from config import settings
+from models.task import TaskPriority
+
+ANONYMOUS_KEY = "anonymous"
+
+# Weight of the latest sample in the moving averages (run time, queue wait)
+SMOOTHING = 0.2
+
+
+def mask_key(api_key: str) -> str:
+    """API keys are shown by their first characters only"""
+    return api_key if api_key == ANONYMOUS_KEY or len(api_key) <= 8 else f"{api_key[:4]}..."
+
+
+class AdmissionRejected(Exception):
+    """The run was not admitted; retry_after is the suggested wait in seconds"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """An admitted run: queued until a slot is free, then running until released"""
+
+    def __init__(self, api_key: str, priority: TaskPriority, batch: Optional[str]):
+        self.api_key = api_key
+        self.priority = priority
+        self.batch = batch
+        self.admitted_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.slot: Optional[asyncio.Future] = None
+
+    @property
+    def wait_ms(self) -> float:
+        end = self.started_at if self.started_at is not None else time.monotonic()
+        return round((end - self.admitted_at) * 1000, 1)
+
+
+class Batch:
+    """Queued bulk runs of one batch; pass_value is its virtual time for stride scheduling"""
+
+    def __init__(self, weight: float, pass_value: float):
+        self.weight = weight
+        self.pass_value = pass_value
+        self.queue: Deque[Ticket] = deque()
+
+
+class AdmissionController:
+    """
+    Caps the number of concurrently running pipelines and bounds the queues in
+    front of them. Admission is decided when the request arrives, so a client
+    is told to back off (429) instead of waiting behind an ever longer queue.
+
+    Interactive runs are served first, FIFO, and reserved_interactive slots
+    are never given to ordinary bulk work. Bulk runs are grouped by batch and
+    the batches share the remaining slots in proportion to their weight
+    (stride scheduling). A bulk run that has waited aging_seconds goes ahead
+    of interactive runs and may use the reserved slots, so bulk work cannot
+    starve.
+
+    The two classes are bounded separately: max_queued caps the interactive
+    runs waiting and max_bulk_queued the bulk runs waiting across all batches,
+    so a large batch fills its own queue and never the interactive one.
+
+    State is in-process: with several API workers each enforces its own limits.
+    """
+
+    def __init__(self, max_running: int, max_queued: int, key_max_active: Optional[int] = None,
+                 key_limits: Optional[Dict[str, int]] = None, initial_run_seconds: float = 60.0,
+                 reserved_interactive: int = 0, max_bulk_queued: int = 0, aging_seconds: float = 300.0):
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.key_max_active = key_max_active
+        self.key_limits = key_limits or {}
+        self.avg_run_seconds = initial_run_seconds
+        self.reserved_interactive = max(0, min(reserved_interactive, max_running - 1))
+        self.max_bulk_queued = max_bulk_queued
+        self.aging_seconds = aging_seconds
+        self._running: Dict[TaskPriority, int] = {priority: 0 for priority in TaskPriority}
+        self._interactive: Deque[Ticket] = deque()
+        self._batches: Dict[str, Batch] = {}
+        self._bulk_queued = 0
+        self._virtual_time = 0.0
+        self._active_by_key: Dict[str, int] = {}
+        self._avg_wait_ms: Dict[TaskPriority, float] = {priority: 0.0 for priority in TaskPriority}
+        self.aged_starts = 0
+        self.rejected = 0
+
+    @property
+    def running(self) -> int:
+        return sum(self._running.values())
+
+    @property
+    def queued(self) -> int:
+        return len(self._interactive) + self._bulk_queued
+
+    @property
+    def bulk_slots(self) -> int:
+        return self.max_running - self.reserved_interactive
+
+    def key_limit(self, api_key: str) -> Optional[int]:
+        """Active-run limit for a key; requests without a key only share the global limits unless configured"""
+        default = None if api_key == ANONYMOUS_KEY else self.key_max_active
+        return self.key_limits.get(api_key, default)
+
+    def retry_after(self, waiting: int, slots: Optional[int] = None) -> int:
+        """Seconds until about `waiting` runs ahead have been drained through `slots` slots"""
+        return max(1, math.ceil(self.avg_run_seconds * max(waiting, 1) / (slots or self.max_running)))
+
+    def admit(self, api_key: Optional[str] = None, priority: TaskPriority = TaskPriority.INTERACTIVE,
+              batch_id: Optional[str] = None, weight: float = 1.0) -> Ticket:
+        """
+        Reserve a place for a run or raise AdmissionRejected. Nothing is awaited
+        between the checks and the reservation, so concurrent requests cannot
+        overshoot the limits. Bulk runs without a batch_id form one batch per API key.
+        """
+        api_key = api_key or ANONYMOUS_KEY
+        limit = self.key_limit(api_key)
+        active = self._active_by_key.get(api_key, 0)
+        if limit is not None and active >= limit:
+            self.rejected += 1
+            raise AdmissionRejected(f"API key has {active} runs in progress (limit {limit})",
+                                    self.retry_after(active))
+
+        bulk = priority == TaskPriority.BULK
+        if bulk and self._bulk_queued >= self.max_bulk_queued:
+            self.rejected += 1
+            raise AdmissionRejected("Too many bulk runs queued",
+                                    self.retry_after(self._bulk_queued + 1, self.bulk_slots))
+        if not bulk and self.running >= self.max_running and len(self._interactive) >= self.max_queued:
+            self.rejected += 1
+            raise AdmissionRejected("Too many interactive runs queued", self.retry_after(len(self._interactive) + 1))
+
+        ticket = Ticket(api_key, priority, (batch_id or f"key:{api_key}") if bulk else None)
+        ticket.slot = asyncio.get_running_loop().create_future()
+        self._active_by_key[api_key] = active + 1
+        if bulk:
+            batch = self._batches.get(ticket.batch)
+            if batch is None:
+                # A new (or returning) batch starts at the current virtual time, it gets no credit for idling
+                batch = self._batches[ticket.batch] = Batch(weight, self._virtual_time)
+            batch.weight = weight
+            batch.queue.append(ticket)
+            self._bulk_queued += 1
+        else:
+            self._interactive.append(ticket)
+        self._dispatch()
+        return ticket
+
+    def position(self, ticket: Ticket) -> int:
+        """Runs queued ahead of this ticket, approximate for bulk runs (0 once it is running)"""
+        if ticket.started_at is not None:
+            return 0
+        if ticket.priority == TaskPriority.INTERACTIVE:
+            return self._interactive.index(ticket) if ticket in self._interactive else 0
+        ahead = sum(1 for batch in self._batches.values() for queued in batch.queue
+                    if queued.admitted_at < ticket.admitted_at)
+        return len(self._interactive) + ahead
+
+    def _aged_batch(self) -> Optional[Batch]:
+        """Batch whose oldest run has waited at least aging_seconds, longest wait first"""
+        now = time.monotonic()
+        aged = [batch for batch in self._batches.values()
+                if now - batch.queue[0].admitted_at >= self.aging_seconds]
+        return min(aged, key=lambda batch: batch.queue[0].admitted_at) if aged else None
+
+    def _fair_batch(self) -> Optional[Batch]:
+        """Batch with the lowest virtual time, i.e. furthest behind its weighted share"""
+        return min(self._batches.values(), key=lambda batch: batch.pass_value) if self._batches else None
+
+    def _pop_bulk(self, batch: Batch) -> Ticket:
+        ticket = batch.queue.popleft()
+        self._bulk_queued -= 1
+        self._virtual_time = max(self._virtual_time, batch.pass_value)
+        batch.pass_value += 1.0 / batch.weight
+        if not batch.queue:
+            del self._batches[ticket.batch]
+        return ticket
+
+    def _dispatch(self) -> None:
+        """Start queued runs while slots are free"""
+        while self.running < self.max_running:
+            aged = self._aged_batch()
+            if aged:
+                self.aged_starts += 1
+                self._start(self._pop_bulk(aged))
+            elif self._interactive:
+                self._start(self._interactive.popleft())
+            elif self._batches and self._running[TaskPriority.BULK] < self.bulk_slots:
+                self._start(self._pop_bulk(self._fair_batch()))
+            else:
+                break
+
+    def _start(self, ticket: Ticket) -> None:
+        self._running[ticket.priority] += 1
+        ticket.started_at = time.monotonic()
+        self._avg_wait_ms[ticket.priority] += SMOOTHING * (ticket.wait_ms - self._avg_wait_ms[ticket.priority])
+        if ticket.slot and not ticket.slot.done():
+            ticket.slot.set_result(None)
+
+    def release(self, ticket: Ticket) -> None:
+        """Free the ticket's place and start the next queued runs"""
+        if ticket.started_at is None:
+            if ticket in self._interactive:
+                self._interactive.remove(ticket)
+            elif ticket.batch in self._batches and ticket in self._batches[ticket.batch].queue:
+                self._batches[ticket.batch].queue.remove(ticket)
+                self._bulk_queued -= 1
+                if not self._batches[ticket.batch].queue:
+                    del self._batches[ticket.batch]
+        else:
+            self._running[ticket.priority] -= 1
+            elapsed = time.monotonic() - ticket.started_at
+            self.avg_run_seconds += SMOOTHING * (elapsed - self.avg_run_seconds)
+        remaining = self._active_by_key.get(ticket.api_key, 1) - 1
+        if remaining > 0:
+            self._active_by_key[ticket.api_key] = remaining
+        else:
+            self._active_by_key.pop(ticket.api_key, None)
+        self._dispatch()
+
+    async def run(self, ticket: Ticket, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Wait for the ticket's slot, run func and release the slot however it ends"""
+        try:
+            # Bulk runs can age into a reserved slot without any run finishing, so re-dispatch now and then
+            while not ticket.slot.done():
+                try:
+                    await asyncio.wait_for(asyncio.shield(ticket.slot), timeout=self.aging_seconds)
+                except asyncio.TimeoutError:
+                    self._dispatch()
+            return await func(*args, **kwargs)
+        finally:
+            self.release(ticket)
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        queued = list(self._interactive) + [ticket for batch in self._batches.values() for ticket in batch.queue]
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "max_running": self.max_running,
+            "max_queued": self.max_queued,
+            "max_bulk_queued": self.max_bulk_queued,
+            "reserved_interactive": self.reserved_interactive,
+            "classes": {
+                priority.value: {
+                    "running": self._running[priority],
+                    "queued": len(self._interactive) if priority == TaskPriority.INTERACTIVE else self._bulk_queued,
+                    "avg_wait_ms": round(self._avg_wait_ms[priority], 1),
+                }
+                for priority in TaskPriority
+            },
+            "batches": {name: {"queued": len(batch.queue), "weight": batch.weight}
+                        for name, batch in self._batches.items()},
+            "oldest_queued_seconds": round(now - min(t.admitted_at for t in queued), 1) if queued else 0.0,
+            "avg_run_seconds": round(self.avg_run_seconds, 1),
+            "aged_starts": self.aged_starts,
+            "rejected": self.rejected,
+            "active_by_key": {mask_key(key): count for key, count in self._active_by_key.items()},
+        }
+
+
+admission = AdmissionController(
+    settings.ADMISSION_MAX_RUNNING,
+    settings.ADMISSION_MAX_QUEUED,
+    key_max_active=settings.ADMISSION_KEY_MAX_ACTIVE,
+    key_limits=settings.ADMISSION_KEY_LIMITS,
+    initial_run_seconds=settings.TRIAGE_EST_PIPELINE_SECONDS,
+    reserved_interactive=settings.ADMISSION_INTERACTIVE_RESERVED,
+    max_bulk_queued=settings.ADMISSION_MAX_BULK_QUEUED,
+    aging_seconds=settings.ADMISSION_BULK_AGING_SECONDS,
+)
@@ -0,0 +1,238 @@
+import asyncio
+import math
+import os
+import re
+import threading
+import zlib
+from datetime import timedelta
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from config import settings
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#.]*[a-z0-9+#]|[a-z0-9]")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens plus adjacent bigrams"""
+    words = TOKEN_PATTERN.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def embed_text(text: str, dim: int) -> np.ndarray:
+    """
+    Embed text with a signed hashing vectorizer (sublinear tf, L2 normalized).
+    crc32 is used instead of hash() so vectors stay stable across processes.
+    """
+    counts: Dict[int, float] = {}
+    for token in tokenize(text):
+        h = zlib.crc32(token.encode("utf-8"))
+        index = h % dim
+        sign = 1.0 if (h >> 31) & 1 else -1.0
+        counts[index] = counts.get(index, 0.0) + sign
+
+    vector = np.zeros(dim, dtype=np.float32)
+    for index, count in counts.items():
+        if count:
+            vector[index] = math.copysign(1.0 + math.log(abs(count)), count)
+
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+def resume_to_text(resume_structured: Dict[str, Any]) -> str:
+    """Flatten the searchable parts of a structured resume into plain text"""
+    parts: List[str] = []
+    parts.extend(resume_structured.get("skills") or [])
+    for exp in resume_structured.get("experience") or []:
+        parts.extend(filter(None, [exp.get("title"), exp.get("company"), exp.get("description")]))
+    for edu in resume_structured.get("education") or []:
+        parts.extend(filter(None, [edu.get("degree"), edu.get("institution")]))
+    parts.extend(resume_structured.get("certifications") or [])
+    parts.extend(resume_structured.get("projects") or [])
+    return "\n".join(str(part) for part in parts)
+
+
+class CandidateIndex:
+    """
+    In-memory cosine index over stored candidates, one row per AgentRun.
+    Rows live in a preallocated NumPy matrix that grows by doubling; removal
+    swaps the last row into the freed slot so the live rows stay contiguous.
+    """
+
+    def __init__(self, path: str, dim: int):
+        self.path = path
+        self.dim = dim
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        self._ids: List[str] = []
+        self._names: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()
+        # Bumped on every change; the index is dirty while it differs from the saved version
+        self._version = 0
+        self._saved_version = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, agent_run_id: str) -> bool:
+        return agent_run_id in self._rows
+
+    @property
+    def ids(self) -> List[str]:
+        return list(self._ids)
+
+    def add(self, agent_run_id: str, candidate_name: str, resume_structured: Dict[str, Any]) -> None:
+        """Add or replace the vector for an agent run"""
+        vector = embed_text(resume_to_text(resume_structured), self.dim)
+        candidate_name = candidate_name or (resume_structured.get("personal") or {}).get("name") or ""
+        with self._lock:
+            if agent_run_id in self._rows:
+                row = self._rows[agent_run_id]
+                self._names[row] = candidate_name
+            else:
+                row = len(self._ids)
+                if row >= self._matrix.shape[0]:
+                    grown = np.zeros((max(64, row * 2), self.dim), dtype=np.float32)
+                    grown[:row] = self._matrix[:row]
+                    self._matrix = grown
+                self._ids.append(agent_run_id)
+                self._names.append(candidate_name)
+                self._rows[agent_run_id] = row
+            self._matrix[row] = vector
+            self._version += 1
+
+    def remove(self, agent_run_id: str) -> bool:
+        """Remove an agent run from the index, returns False if it was not indexed"""
+        with self._lock:
+            row = self._rows.pop(agent_run_id, None)
+            if row is None:
+                return False
+            last = len(self._ids) - 1
+            if row != last:
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = self._ids[last]
+                self._names[row] = self._names[last]
+                self._rows[self._ids[row]] = row
+            self._matrix[last] = 0
+            self._ids.pop()
+            self._names.pop()
+            self._version += 1
+            return True
+
+    def search(self, text: str, top_k: int = 10) -> List[Tuple[str, str, float]]:
+        """Return (agent_run_id, candidate_name, cosine score) for the top_k best matches"""
+        query = embed_text(text, self.dim)
+        with self._lock:
+            count = len(self._ids)
+            if count == 0 or top_k <= 0:
+                return []
+            scores = self._matrix[:count] @ query
+            k = min(top_k, count)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self._ids[i], self._names[i], float(scores[i])) for i in top]
+
+    @property
+    def dirty(self) -> bool:
+        return self._version != self._saved_version
+
+    def save(self) -> None:
+        """
+        Persist the live rows to disk (atomic replace). Only the copy of the
+        rows is taken under the lock, so adds and searches are not held up
+        while the file is written.
+        """
+        with self._save_lock:
+            with self._lock:
+                count = len(self._ids)
+                matrix = self._matrix[:count].copy()
+                ids = np.array(self._ids, dtype=str)
+                names = np.array(self._names, dtype=str)
+                version = self._version
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + ".tmp.npz"
+            np.savez(tmp_path, matrix=matrix, ids=ids, names=names)
+            os.replace(tmp_path, self.path)
+            self._saved_version = version
+
+    def save_if_dirty(self) -> None:
+        if self.dirty:
+            self.save()
+
+    def load(self) -> bool:
+        """Load a persisted index, returns False if there is nothing usable on disk"""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with np.load(self.path) as data:
+                matrix = data["matrix"].astype(np.float32)
+                ids = [str(i) for i in data["ids"]]
+                names = [str(n) for n in data["names"]]
+        except Exception as e:
+            print(f"Warning: Could not load candidate index from {self.path}: {str(e)}")
+            return False
+
+        if matrix.ndim != 2 or matrix.shape[1] != self.dim or len(ids) != matrix.shape[0]:
+            print(f"Warning: Ignoring candidate index at {self.path}, dimension mismatch")
+            return False
+
+        with self._lock:
+            self._matrix = matrix
+            self._ids = ids
+            self._names = names
+            self._rows = {agent_run_id: row for row, agent_run_id in enumerate(ids)}
+            self._saved_version = self._version
+        return True
+
+
+# Runs inserted concurrently (or by another replica) can carry ids slightly older than the newest indexed one
+SYNC_OVERLAP_SECONDS = 300
+
+candidate_index = CandidateIndex(settings.CANDIDATE_INDEX_PATH, settings.CANDIDATE_INDEX_DIM)
+
+
+async def sync_candidate_index() -> int:
+    """
+    Load the persisted index and backfill the stored runs it is missing. Only
+    runs newer than the newest indexed one are read (their ObjectId carries
+    the insert time), so startup does not scan the whole collection.
+    """
+    from beanie import PydanticObjectId
+    from models.run_history import AgentRun
+
+    candidate_index.load()
+    # Re-scored copies and secondary role runs share a resume that is already indexed
+    query = {"output.resume_structured": {"$ne": None}, "rescored_from": None, "matched_from": None}
+    if len(candidate_index):
+        newest = max(PydanticObjectId(agent_run_id).generation_time for agent_run_id in candidate_index.ids)
+        since = newest - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+        query["_id"] = {"$gt": PydanticObjectId.from_datetime(since)}
+
+    added = 0
+    async for run in AgentRun.find(query):
+        if str(run.id) in candidate_index:
+            continue
+        candidate_index.add(str(run.id), run.input.candidate_name, run.output.resume_structured)
+        added += 1
+
+    if added:
+        candidate_index.save()
+        print(f"✅ Candidate index backfilled with {added} runs")
+    return added
+
+
+async def candidate_index_loop() -> None:
+    """Persist new vectors every CANDIDATE_INDEX_SAVE_SECONDS, so a crash loses at most that much indexing"""
+    while True:
+        await asyncio.sleep(settings.CANDIDATE_INDEX_SAVE_SECONDS)
+        try:
+            await asyncio.to_thread(candidate_index.save_if_dirty)
+        except Exception as e:
+            print(f"Warning: Could not save candidate index: {str(e)}")
@@ -0,0 +1,159 @@
+import re
+import threading
+import zlib
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from config import settings
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Universal hashing h(x) = (a * x + b) mod p over 32-bit shingle hashes; with
+# p = 2^31 - 1 the product stays below 2^63, so uint64 arithmetic cannot overflow
+MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+PERMUTATION_SEED = 1
+
+
+def shingles(text: str, size: int) -> Set[int]:
+    """crc32 hashes of the overlapping word n-grams of the text (case and punctuation ignored)"""
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {zlib.crc32(" ".join(words[i:i + size]).encode("utf-8")) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """MinHash signatures with a fixed, seeded set of hash permutations so signatures are stable across processes"""
+
+    def __init__(self, num_perm: int, shingle_size: int):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(PERMUTATION_SEED)
+        self._a = rng.integers(1, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter(shingles(text, self.shingle_size), dtype=np.uint64)
+        if hashes.size == 0:
+            return np.full(self.num_perm, MERSENNE_PRIME, dtype=np.uint64)
+        # (num_perm, shingles) matrix of permuted hashes, minimum per permutation
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % MERSENNE_PRIME
+        return permuted.min(axis=1)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    return float(np.mean(a == b))
+
+
+class DuplicateIndex:
+    """
+    LSH index over resume MinHash signatures, one entry per AgentRun. The
+    signature is split into bands; two resumes become candidates when any band
+    is identical, and candidates are then checked against the full signature.
+    Signatures are persisted on the AgentRun documents, so the index is rebuilt
+    from MongoDB at startup rather than saved to disk.
+    """
+
+    def __init__(self, num_perm: int, bands: int, shingle_size: int):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets: List[Dict[bytes, Set[str]]] = [{} for _ in range(bands)]
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._names: Dict[str, str] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, agent_run_id: str) -> bool:
+        return agent_run_id in self._signatures
+
+    def signature(self, text: str) -> List[int]:
+        """Signature of a resume text in the form stored on AgentRun"""
+        return self.hasher.signature(text).tolist()
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def add(self, agent_run_id: str, candidate_name: str, signature: List[int]) -> None:
+        """Add or replace the signature of an agent run"""
+        values = np.asarray(signature, dtype=np.uint64)
+        if values.size != self.hasher.num_perm:
+            return
+        with self._lock:
+            self.remove(agent_run_id)
+            self._signatures[agent_run_id] = values
+            self._names[agent_run_id] = candidate_name or ""
+            for band, key in enumerate(self._band_keys(values)):
+                self._buckets[band].setdefault(key, set()).add(agent_run_id)
+
+    def remove(self, agent_run_id: str) -> bool:
+        """Remove an agent run from the index, returns False if it was not indexed"""
+        with self._lock:
+            values = self._signatures.pop(agent_run_id, None)
+            if values is None:
+                return False
+            self._names.pop(agent_run_id, None)
+            for band, key in enumerate(self._band_keys(values)):
+                bucket = self._buckets[band].get(key)
+                if bucket:
+                    bucket.discard(agent_run_id)
+                    if not bucket:
+                        del self._buckets[band][key]
+            return True
+
+    def query(self, signature: List[int], threshold: float,
+              limit: int = 5) -> List[Tuple[str, str, float]]:
+        """
+        Return (agent_run_id, candidate_name, similarity) for indexed runs at
+        or above threshold, most similar first and, among equals, newest first.
+        """
+        values = np.asarray(signature, dtype=np.uint64)
+        with self._lock:
+            candidates: Set[str] = set()
+            for band, key in enumerate(self._band_keys(values)):
+                candidates.update(self._buckets[band].get(key, ()))
+            matches = [(agent_run_id, self._names[agent_run_id], similarity(values, self._signatures[agent_run_id]))
+                       for agent_run_id in candidates]
+        # ObjectIds sort by creation time
+        matches = [match for match in matches if match[2] >= threshold]
+        matches.sort(key=lambda match: (match[2], match[0]), reverse=True)
+        return matches[:limit]
+
+    def find_duplicates(self, text: str, threshold: Optional[float] = None,
+                        limit: int = 5) -> List[Tuple[str, str, float]]:
+        threshold = settings.DUPLICATE_SIMILARITY_THRESHOLD if threshold is None else threshold
+        return self.query(self.signature(text), threshold, limit)
+
+
+duplicate_index = DuplicateIndex(settings.DUPLICATE_NUM_PERM, settings.DUPLICATE_LSH_BANDS,
+                                 settings.DUPLICATE_SHINGLE_SIZE)
+
+
+async def sync_duplicate_index() -> int:
+    """
+    Rebuild the index from the signatures stored on AgentRun, computing and
+    storing the signature for runs saved before it existed. Re-scored runs and
+    secondary /match-roles/ runs share another run's resume and are left out.
+    """
+    from models.run_history import AgentRun
+    from recruiter_agent.normalize import normalize_text
+
+    query = {"output.resume_structured": {"$ne": None}, "rescored_from": None, "matched_from": None}
+    indexed = backfilled = 0
+    async for run in AgentRun.find(query):
+        signature = run.resume_signature
+        if not signature:
+            signature = duplicate_index.signature(normalize_text(run.input.resume_text)[0])
+            await run.set({AgentRun.resume_signature: signature})
+            backfilled += 1
+        duplicate_index.add(str(run.id), run.input.candidate_name, signature)
+        indexed += 1
+
+    print(f"✅ Duplicate index built with {indexed} runs ({backfilled} signatures backfilled)")
+    return indexed
@@ -0,0 +1,181 @@
+import asyncio
+import gzip
+import os
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import bson
+from bson import json_util
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import OperationFailure
+
+from config import settings
+from models.run_history import AgentRun
+from models.task import Task, TERMINAL_STATUSES
+from utils.candidate_index import candidate_index
+from utils.duplicate_index import duplicate_index
+
+ARCHIVE_COLLECTION = "agent_runs_archive"
+TASK_TTL_INDEX = "completed_at_ttl"
+
+# Server error codes for an existing index whose options differ from the requested ones
+INDEX_CONFLICT_CODES = {85, 86}
+
+
+def cold_collection():
+    return AgentRun.get_motor_collection().database[ARCHIVE_COLLECTION]
+
+
+async def ensure_task_ttl_index() -> None:
+    """
+    Expire finished tasks TASK_TTL_SECONDS after completion. The index is
+    managed here rather than by Beanie so a changed TTL is applied in place
+    (collMod) instead of failing on the existing index.
+    """
+    if not settings.TASK_TTL_SECONDS:
+        return
+    collection = Task.get_motor_collection()
+    try:
+        await collection.create_index("completed_at", name=TASK_TTL_INDEX,
+                                      expireAfterSeconds=int(settings.TASK_TTL_SECONDS))
+    except OperationFailure as e:
+        if e.code not in INDEX_CONFLICT_CODES:
+            raise
+        await collection.database.command("collMod", collection.name, index={
+            "name": TASK_TTL_INDEX, "expireAfterSeconds": int(settings.TASK_TTL_SECONDS)})
+
+
+async def backfill_task_completion() -> int:
+    """Tasks finished before completed_at existed get their last update as completion time, so they expire too"""
+    result = await Task.get_motor_collection().update_many(
+        {"status": {"$in": [status.value for status in TERMINAL_STATUSES]}, "completed_at": None},
+        [{"$set": {"completed_at": "$updated_at"}}],
+    )
+    return result.modified_count
+
+
+def run_summary(document: Dict[str, Any], location: str) -> Dict[str, Any]:
+    """What stays in agent_runs once a run is archived: enough to list it and find the full copy"""
+    output = document.get("output") or {}
+    fit_assessment = output.get("fit_assessment") or {}
+    return {
+        "job_title": (output.get("jd_structured") or {}).get("title"),
+        "fit_score": fit_assessment.get("fit_score"),
+        "score_details": fit_assessment.get("score_details"),
+        "archive": location,
+    }
+
+
+def summary_update(document: Dict[str, Any], archived_at: datetime, location: str) -> Dict[str, Any]:
+    # Triage, metrics and the deadline fields are small and feed the stats endpoints, so they stay
+    return {"$set": {
+        "archived_at": archived_at,
+        "summary": run_summary(document, location),
+        "resume_signature": None,
+        "input.resume_text": "",
+        "input.job_description": "",
+        "output.jd_structured": None,
+        "output.resume_structured": None,
+        "output.web_structured": None,
+        "output.fit_assessment": None,
+        "output.formatted_output": None,
+    }}
+
+
+async def archive_to_collection(documents: List[Dict[str, Any]], archived_at: datetime) -> str:
+    """Compressed BSON of each run in the cold collection; upserts, so a batch interrupted midway can be redone"""
+    await cold_collection().bulk_write([
+        ReplaceOne({"_id": document["_id"]}, {
+            "_id": document["_id"],
+            "timestamp": document.get("timestamp"),
+            "archived_at": archived_at,
+            "data": bson.Binary(zlib.compress(bson.encode(document))),
+        }, upsert=True)
+        for document in documents
+    ], ordered=False)
+    return f"mongo:{ARCHIVE_COLLECTION}"
+
+
+def archive_to_jsonl(documents: List[Dict[str, Any]], archive_dir: str) -> str:
+    """Append the runs as extended JSON lines to a gzip file per month of the runs' timestamps"""
+    os.makedirs(archive_dir, exist_ok=True)
+    month = documents[0]["timestamp"].strftime("%Y-%m")
+    path = os.path.join(archive_dir, f"agent_runs-{month}.jsonl.gz")
+    with gzip.open(path, "at", encoding="utf-8") as archive:
+        for document in documents:
+            archive.write(json_util.dumps(document) + "\n")
+    return f"file:{path}"
+
+
+async def archive_runs(cutoff: datetime) -> int:
+    """
+    Move runs older than cutoff to the archive and leave a summary in their
+    place. The archive is written before the hot document is trimmed, so an
+    interrupted pass loses nothing; it is repeated on the next pass.
+    """
+    hot = AgentRun.get_motor_collection()
+    batch_size = settings.RETENTION_BATCH_SIZE
+    archived = 0
+    while True:
+        documents = await hot.find({"timestamp": {"$lt": cutoff}, "archived_at": None}) \
+            .sort("timestamp", 1).limit(batch_size).to_list(length=batch_size)
+        if not documents:
+            break
+        archived_at = datetime.utcnow()
+        if settings.RUN_ARCHIVE_PATH:
+            # One file per month, so split the batch where the month changes
+            locations = {}
+            for month in sorted({document["timestamp"].strftime("%Y-%m") for document in documents}):
+                group = [document for document in documents if document["timestamp"].strftime("%Y-%m") == month]
+                location = await asyncio.to_thread(archive_to_jsonl, group, settings.RUN_ARCHIVE_PATH)
+                locations.update({document["_id"]: location for document in group})
+        else:
+            location = await archive_to_collection(documents, archived_at)
+            locations = {document["_id"]: location for document in documents}
+
+        await hot.bulk_write([UpdateOne({"_id": document["_id"]},
+                                        summary_update(document, archived_at, locations[document["_id"]]))
+                              for document in documents], ordered=False)
+        # Archived runs no longer carry a resume, so they leave the search and duplicate indexes
+        for document in documents:
+            candidate_index.remove(str(document["_id"]))
+            duplicate_index.remove(str(document["_id"]))
+        archived += len(documents)
+
+    if archived:
+        await asyncio.to_thread(candidate_index.save_if_dirty)
+    return archived
+
+
+async def load_archived_run(agent_run_id: str) -> Optional[Dict[str, Any]]:
+    """Full document of a run archived to the cold collection (runs archived to JSONL are read from the files)"""
+    document = await cold_collection().find_one({"_id": bson.ObjectId(agent_run_id)})
+    return bson.decode(zlib.decompress(document["data"])) if document else None
+
+
+async def run_retention() -> Dict[str, Any]:
+    """One retention pass: task TTL upkeep and archival of old runs"""
+    report: Dict[str, Any] = {"tasks_backfilled": 0, "runs_archived": 0}
+    if settings.TASK_TTL_SECONDS:
+        report["tasks_backfilled"] = await backfill_task_completion()
+    if settings.RUN_RETENTION_DAYS:
+        cutoff = datetime.utcnow() - timedelta(days=settings.RUN_RETENTION_DAYS)
+        report["runs_archived"] = await archive_runs(cutoff)
+        report["cutoff"] = cutoff
+    if report["runs_archived"] or report["tasks_backfilled"]:
+        print(f"🗄️ Retention: archived {report['runs_archived']} runs, "
+              f"set completed_at on {report['tasks_backfilled']} tasks")
+    return report
+
+
+async def retention_loop() -> None:
+    """Run a retention pass at startup and then every RETENTION_INTERVAL_SECONDS"""
+    while True:
+        try:
+            await run_retention()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Warning: Retention pass failed: {str(e)}")
+        await asyncio.sleep(settings.RETENTION_INTERVAL_SECONDS)
@@ -0,0 +1,239 @@
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Set
+
+from pymongo.errors import OperationFailure
+
+from config import settings
+from models.task import Task, TaskStatusView
+
+# Only status changes (and deletions by the TTL index) are streamed, the (large) result stays in the database
+CHANGE_PIPELINE = [
+    {"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}},
+    {"$project": {"fullDocument.result": 0}},
+]
+
+# Server error codes meaning change streams will never work here (standalone server)
+UNSUPPORTED_CODES = {40573, 40324}
+
+# A stream whose resume token has fallen off the oplog must start over
+HISTORY_LOST_CODE = 286
+
+RECONNECT_SECONDS = 1.0
+
+
+class Subscription:
+    """
+    Updates for one task or one batch. Every update is a full status snapshot,
+    so when a slow consumer falls behind the oldest updates are dropped.
+    """
+
+    def __init__(self, bus: "TaskEventBus", key: str, max_pending: int):
+        self.bus = bus
+        self.key = key
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+
+    def put(self, view: TaskStatusView) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(view)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[TaskStatusView]:
+        """Next update, or None when none arrived within timeout seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.bus.unsubscribe(self)
+
+
+class TaskEventBus:
+    """
+    Fans task status changes out to the SSE streams and long-polls waiting on
+    them, so clients are pushed updates instead of each polling MongoDB.
+
+    With a replica set the bus tails a change stream on `tasks`, which delivers
+    the updates made by every API replica. On a standalone server (no change
+    streams) it falls back to publishing the saves made by this process, which
+    is complete for single-node setups. The latest status of recently changed
+    tasks is kept in memory so subscribers can be answered without a read.
+    """
+
+    def __init__(self, use_change_stream: bool, max_recent: int, max_pending: int = 100):
+        self.use_change_stream = use_change_stream
+        self.max_recent = max_recent
+        self.max_pending = max_pending
+        self.mode = "stopped"
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._recent: "OrderedDict[str, TaskStatusView]" = OrderedDict()
+        # Delete events only carry the document _id, this maps it back to the task
+        self._task_ids: "OrderedDict[Any, str]" = OrderedDict()
+        self._watcher: Optional[asyncio.Task] = None
+        self._resume_token: Optional[Dict[str, Any]] = None
+        self.published = 0
+        self.reconnects = 0
+
+    async def start(self) -> None:
+        """Open the change stream, or fall back to in-process events when the server has none"""
+        self.mode = "local"
+        if not self.use_change_stream:
+            print("ℹ️ Task events: change streams disabled, publishing in-process updates only")
+            return
+        try:
+            stream = self._open_stream()
+            # The aggregate only runs on the first read, which is where a standalone server refuses it
+            change = await stream.try_next()
+            self._resume_token = stream.resume_token
+        except OperationFailure as e:
+            if e.code not in UNSUPPORTED_CODES:
+                raise
+            print(f"ℹ️ Task events: change streams unavailable ({e.details.get('errmsg', e)}), "
+                  f"publishing in-process updates only")
+            return
+        self.mode = "change_stream"
+        if change:
+            self._on_change(change)
+        self._watcher = asyncio.create_task(self._watch(stream))
+        self._watcher.add_done_callback(self._watcher_done)
+        print("✅ Task events: tailing the tasks change stream")
+
+    async def stop(self) -> None:
+        if self._watcher:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+        self.mode = "stopped"
+
+    def _open_stream(self):
+        return Task.get_motor_collection().watch(CHANGE_PIPELINE, full_document="updateLookup",
+                                                 resume_after=self._resume_token)
+
+    async def _watch(self, stream) -> None:
+        while True:
+            try:
+                if stream is None:
+                    stream = self._open_stream()
+                async with stream:
+                    async for change in stream:
+                        self._on_change(change)
+                        self._resume_token = stream.resume_token
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code == HISTORY_LOST_CODE:
+                    # Updates were missed, so the remembered statuses may be stale
+                    print("Warning: Task events change stream history lost, restarting it")
+                    self._resume_token = None
+                    self._recent.clear()
+                else:
+                    print(f"Warning: Task events change stream interrupted, resuming: {str(e)}")
+            except Exception as e:
+                print(f"Warning: Task events change stream failed, resuming: {type(e).__name__}: {str(e)}")
+            self.reconnects += 1
+            stream = None
+            await asyncio.sleep(RECONNECT_SECONDS)
+
+    def _watcher_done(self, watcher: asyncio.Task) -> None:
+        # Should the watcher ever stop, saves must be published in-process or subscribers hear nothing
+        if not watcher.cancelled() and self.mode == "change_stream":
+            print(f"Warning: Task events watcher stopped ({watcher.exception()}), publishing in-process updates only")
+            self.mode = "local"
+
+    def _on_change(self, change: Dict[str, Any]) -> None:
+        try:
+            if change.get("operationType") == "delete":
+                task_id = self._task_ids.pop(change["documentKey"]["_id"], None)
+                if task_id:
+                    self._recent.pop(task_id, None)
+                return
+            document = change.get("fullDocument")
+            if document and document.get("task_id"):
+                self.publish(TaskStatusView(**document), document["_id"])
+        except Exception as e:
+            # One malformed document must not stop the stream for every other task
+            print(f"Warning: Task events skipped a change: {type(e).__name__}: {str(e)}")
+
+    def notify(self, task: Task) -> None:
+        """Called on every task save; publishes directly unless the change stream will deliver it"""
+        if self.mode != "change_stream":
+            self.publish(TaskStatusView(**task.dict()), task.id)
+
+    def publish(self, view: TaskStatusView, document_id: Any = None) -> None:
+        known = self._recent.get(view.task_id)
+        if known and known.updated_at > view.updated_at:
+            return
+        self._remember(view, document_id)
+        self.published += 1
+        for key in (f"task:{view.task_id}", f"batch:{view.batch_id}" if view.batch_id else None):
+            for subscription in self._subscribers.get(key, ()):
+                subscription.put(view)
+
+    def _remember(self, view: TaskStatusView, document_id: Any = None) -> None:
+        self._recent[view.task_id] = view
+        self._recent.move_to_end(view.task_id)
+        while len(self._recent) > self.max_recent:
+            self._recent.popitem(last=False)
+        if document_id is not None:
+            self._task_ids[document_id] = view.task_id
+            self._task_ids.move_to_end(document_id)
+            while len(self._task_ids) > self.max_recent:
+                self._task_ids.popitem(last=False)
+
+    @staticmethod
+    def _expired(view: TaskStatusView) -> bool:
+        """Finished past the task TTL, so the TTL monitor has deleted it or is about to"""
+        return bool(view.completed_at and settings.TASK_TTL_SECONDS
+                    and datetime.utcnow() - view.completed_at >= timedelta(seconds=settings.TASK_TTL_SECONDS))
+
+    def subscribe(self, task_id: Optional[str] = None, batch_id: Optional[str] = None) -> Subscription:
+        """Subscribe to one task or one batch; use as a context manager so it is always removed"""
+        subscription = Subscription(self, f"task:{task_id}" if task_id else f"batch:{batch_id}", self.max_pending)
+        self._subscribers.setdefault(subscription.key, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.key)
+        if subscribers:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.key]
+
+    async def current(self, task_id: str) -> Optional[TaskStatusView]:
+        """Latest known status of a task, read from MongoDB only when it has not changed recently"""
+        view = self._recent.get(task_id)
+        if view is not None and self._expired(view):
+            # Deletions are not seen in-process, so expired tasks are checked against the database
+            self._recent.pop(task_id, None)
+            view = None
+        if view is None:
+            document = await Task.get_motor_collection().find_one({"task_id": task_id}, {"result": 0})
+            if document:
+                view = TaskStatusView(**document)
+                # An update published while the read was in flight is newer, keep that one
+                known = self._recent.get(task_id)
+                if known is None or known.updated_at < view.updated_at:
+                    self._remember(view, document["_id"])
+                else:
+                    view = known
+        return view
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "subscribers": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "recent_tasks": len(self._recent),
+            "published": self.published,
+            "reconnects": self.reconnects,
+        }
+
+
+task_events = TaskEventBus(settings.TASK_EVENTS_CHANGE_STREAM, settings.TASK_EVENTS_RECENT_TASKS)
@@ -1,18 +1,70 @@
+from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, Callable, Awaitable
-from models.task import Task, TaskStatus
+from beanie import UpdateResponse
+from models.task import Task, TaskStatus, TaskPriority
+from utils.task_events import task_events
 import asyncio
 import traceback
 import logging
 
 logger = logging.getLogger(__name__)
 
+def update_time() -> datetime:
+    """updated_at for a change; MongoDB keeps milliseconds, so truncate to keep published and stored timestamps equal"""
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
 class TaskManager:
     @staticmethod
-    async def create_task() -> Task:
+    async def save(task: Task) -> Task:
+        """Save a task, bumping updated_at so clients and ETags see the change"""
+        task.updated_at = update_time()
+        await task.save()
+        task_events.notify(task)
+        return task
+
+    @staticmethod
+    async def create_task(dedupe_key: Optional[str] = None, priority: TaskPriority = TaskPriority.INTERACTIVE,
+                          batch_id: Optional[str] = None) -> Task:
         """Create a new task and save it to the database"""
-        task = Task()
+        task = Task(dedupe_key=dedupe_key, priority=priority, batch_id=batch_id)
+        await task.insert()
+        task_events.notify(task)
+        return task
+
+    @staticmethod
+    async def create_completed_task(result: Dict[str, Any], agent_run_id: Optional[str] = None,
+                                    dedupe_key: Optional[str] = None,
+                                    priority: TaskPriority = TaskPriority.INTERACTIVE,
+                                    batch_id: Optional[str] = None) -> Task:
+        """Create a task that is already completed, for submissions answered without running anything"""
+        task = Task(dedupe_key=dedupe_key, priority=priority, batch_id=batch_id, status=TaskStatus.COMPLETED,
+                    result=result, agent_run_id=agent_run_id, completed_at=datetime.utcnow())
         await task.insert()
+        task_events.notify(task)
         return task
+
+    @staticmethod
+    async def set_queue_wait(task_id: str, queue_wait_ms: float) -> Optional[Task]:
+        """Record how long the task waited for a run slot"""
+        task = await TaskManager.get_task(task_id)
+        if task:
+            task.queue_wait_ms = queue_wait_ms
+            await TaskManager.save(task)
+        return task
+
+    @staticmethod
+    async def find_inflight_task(dedupe_key: str, max_age_seconds: float) -> Optional[Task]:
+        """
+        Pending or running task for the same submission. Tasks older than
+        max_age_seconds are ignored so a task orphaned by a crash cannot
+        capture new submissions forever.
+        """
+        return await Task.find_one({
+            "dedupe_key": dedupe_key,
+            "status": {"$in": [TaskStatus.PENDING, TaskStatus.RUNNING]},
+            "created_at": {"$gte": datetime.utcnow() - timedelta(seconds=max_age_seconds)},
+        })
     
     @staticmethod
     async def get_task(task_id: str) -> Optional[Task]:
@@ -25,7 +77,7 @@ class TaskManager:
         task = await TaskManager.get_task(task_id)
         if task:
             task.status = status
-            await task.save()
+            await TaskManager.save(task)
         return task
     
     @staticmethod
@@ -35,9 +87,10 @@ class TaskManager:
         if task:
             task.status = TaskStatus.COMPLETED
             task.result = result
+            task.completed_at = datetime.utcnow()
             if agent_run_id:
                 task.agent_run_id = agent_run_id
-            await task.save()
+            await TaskManager.save(task)
         return task
     
     @staticmethod
@@ -47,7 +100,24 @@ class TaskManager:
         if task:
             task.status = TaskStatus.FAILED
             task.error = error
-            await task.save()
+            task.completed_at = datetime.utcnow()
+            await TaskManager.save(task)
+        return task
+    
+    @staticmethod
+    async def reset_task(task_id: str) -> Optional[Task]:
+        """
+        Put a failed task back to pending so it can be retried. The status check and
+        the reset are one update, so of two concurrent retries only one gets the task;
+        returns None when the task does not exist or is not failed.
+        """
+        task = await Task.find_one({"task_id": task_id, "status": TaskStatus.FAILED}).update(
+            {"$set": {"status": TaskStatus.PENDING, "error": None, "completed_at": None,
+                      "updated_at": update_time()}},
+            response_type=UpdateResponse.NEW_DOCUMENT,
+        )
+        if task:
+            task_events.notify(task)
         return task
     
     @staticmethod